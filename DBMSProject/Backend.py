@@ -1,49 +1,159 @@
 # Backend.py
-import sqlite3
+import json
+import time
+
+import Cache
+import Database
+import Dedup
+import Metrics
+import PlaylistStats
+import Search
 
-DB_PATH = "music.db"
 
 def get_connection():
-    conn = sqlite3.connect(DB_PATH)
-    return conn
+    return Database.get_connection()
 
 
-# Helper: run query
+# Helper: run query on this thread's long-lived connection. Reads run in
+# autocommit mode; writes are wrapped in a transaction, or join the
+# caller's transaction when run inside Database.transaction().
 def _run(query, params=(), fetch=False, many=False):
+    if not Metrics.ENABLED:
+        return _execute(query, params, fetch, many)
+    start = time.perf_counter()
+    result = _execute(query, params, fetch, many)
+    Metrics.record_query(Metrics.caller(), get_connection(), query, params,
+                         (time.perf_counter() - start) * 1000, len(result) if result else 0)
+    return result
+
+
+def _execute(query, params, fetch, many):
+    if fetch and not many:
+        return get_connection().execute(query, params).fetchall()
+    with Database.transaction() as conn:
+        if many:
+            conn.executemany(query, params)
+            return None
+        cur = conn.execute(query, params)
+        return cur.fetchall() if fetch else None
+
+
+# Helper: yield rows from a live cursor, fetching batch_size at a time
+def _stream(query, params=(), batch_size=500):
+    if Metrics.ENABLED:
+        return _measured_stream(Metrics.caller(), query, params, batch_size)
+    return _fetch_batches(query, params, batch_size)
+
+
+def _fetch_batches(query, params, batch_size):
+    cur = get_connection().execute(query, params)
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cur.close()
+
+
+# _fetch_batches, counting only the time spent inside SQLite, not the time
+# the consumer takes between batches
+def _measured_stream(function, query, params, batch_size):
     conn = get_connection()
-    cur = conn.cursor()
-    if many:
-        cur.executemany(query, params)
-        res = None
-    else:
-        cur.execute(query, params)
-        res = cur.fetchall() if fetch else None
-    conn.commit()
-    conn.close()
-    return res
+    elapsed = 0.0
+    count = 0
+    start = time.perf_counter()
+    cur = conn.execute(query, params)
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            elapsed += time.perf_counter() - start
+            if not rows:
+                break
+            count += len(rows)
+            yield from rows
+            start = time.perf_counter()
+    finally:
+        cur.close()
+        Metrics.record_query(function, conn, query, params, elapsed * 1000, count)
+
+
+# Helper: keyset pagination. Returns the SQL fragment restricting rows to
+# those whose key columns sort after after_id, plus its parameters. A key of
+# several columns takes a tuple.
+def _after(columns, after_id):
+    if after_id is None:
+        return "1", ()
+    if len(columns) == 1:
+        return f"{columns[0]} > ?", (after_id,)
+    return f"({', '.join(columns)}) > ({', '.join('?' * len(columns))})", tuple(after_id)
+
+
+# As _after for key columns that may hold NULLs, ordered by _nulls_last:
+# a NULL sorts after every value, so a key holding one continues with the
+# next value of the column before it. Plain comparisons with NULL are
+# unknown and would end the paging there.
+def _after_nullable(columns, after_id):
+    if after_id is None:
+        return "1", ()
+    key = tuple(after_id) if len(columns) > 1 else (after_id,)
+    terms = []
+    params = ()
+    for i, (column, value) in enumerate(zip(columns, key)):
+        if value is None:
+            continue
+        equal = [f"{c} IS ?" for c in columns[:i]]
+        terms.append("(" + " AND ".join(equal + [f"({column} > ? OR {column} IS NULL)"]) + ")")
+        params += key[:i] + (value,)
+    return ("(" + " OR ".join(terms) + ")" if terms else "0"), params
+
+
+def _nulls_last(columns):
+    return ", ".join(f"{c} IS NULL, {c}" for c in columns)
+
+
+# Group any row iterator into lists of at most size rows
+def batched(rows, size=500):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Hit/miss/eviction counters of the lookup caches (see Cache.py)
+def cache_stats():
+    return Cache.stats()
 
 
 # Playlist functions
 def create_playlist(name, created_date):
     _run("INSERT OR IGNORE INTO Playlist (Name, CreatedDate) VALUES (?, ?)", (name, created_date))
+    Cache.invalidate("Playlist")
 
 
+@Cache.cached(("Playlist",), maxsize=4)
 def get_playlist_names():
-    rows = _run("SELECT Name FROM Playlist", fetch=True)
-    return [r[0] for r in rows] if rows else []
+    return [r[0] for r in _stream("SELECT Name FROM Playlist")]
 
 
+@Cache.cached(("Playlist",), maxsize=1024)
 def get_playlist_id_by_name(name):
     r = _run("SELECT PlaylistID FROM Playlist WHERE Name=?", (name,), fetch=True)
     return r[0][0] if r else None
 
 
 # Track functions
+@Cache.cached(("Track",), maxsize=2)
 def get_track_names():
-    rows = _run("SELECT Name FROM Track", fetch=True)
-    return [r[0] for r in rows] if rows else []
+    return [r[0] for r in _stream("SELECT Name FROM Track")]
 
 
+@Cache.cached(("Track",), maxsize=1024)
 def get_track_id_by_name(name):
     r = _run("SELECT TrackID FROM Track WHERE Name=?", (name,), fetch=True)
     return r[0][0] if r else None
@@ -51,27 +161,121 @@ def get_track_id_by_name(name):
 
 def add_track_to_playlist(playlist_id, track_id):
     _run("INSERT OR IGNORE INTO TrackPlaylist (PlaylistID, TrackID) VALUES (?, ?)", (playlist_id, track_id))
+    Cache.invalidate("TrackPlaylist")
+
+
+# Batch versions of the lookups above take the whole list as one JSON
+# parameter, so a 500-name lookup is one query rather than 500.
+
+# {name: TrackID} for the names that match a track. Like
+# get_track_id_by_name, a name shared by several tracks maps to one of them.
+def get_track_ids_by_names(names):
+    query = """
+    SELECT value, (SELECT TrackID FROM Track WHERE Name = value LIMIT 1)
+    FROM json_each(?)
+    GROUP BY value
+    """
+    rows = _run(query, (json.dumps(list(names)),), fetch=True)
+    return {name: track_id for name, track_id in rows if track_id is not None}
+
+
+# The subset of track_ids that exist
+def existing_track_ids(track_ids):
+    query = "SELECT TrackID FROM Track WHERE TrackID IN (SELECT value FROM json_each(?))"
+    return {r[0] for r in _run(query, (json.dumps(list(track_ids)),), fetch=True)}
+
+
+# Add many tracks in one transaction. Returns how many were not already in
+# the playlist.
+@Metrics.timed
+def add_tracks_to_playlist(playlist_id, track_ids):
+    with Database.transaction() as conn:
+        cur = conn.executemany(
+            "INSERT OR IGNORE INTO TrackPlaylist (PlaylistID, TrackID) VALUES (?, ?)",
+            ((playlist_id, track_id) for track_id in track_ids),
+        )
+        Cache.invalidate("TrackPlaylist")
+    return cur.rowcount
+
+
+# Name search across tracks, artists and albums: [(kind, id, name), ...]
+@Metrics.timed
+def search_catalog(query, limit=20, offset=0):
+    rows = Search.search(query, limit=limit, offset=offset)
+    return [(kind, ref, name) for kind, ref, name, _score in rows]
+
+
+# Track names matching the typed words, best first
+@Metrics.timed
+def search_track_names(query, limit=20, offset=0):
+    rows = Search.search(query, kinds=("track",), limit=limit, offset=offset)
+    return [name for _kind, _ref, name, _score in rows]
+
+
+# As above, as (TrackID, Name)
+@Metrics.timed
+def search_tracks(query, limit=20, offset=0):
+    rows = Search.search(query, kinds=("track",), limit=limit, offset=offset)
+    return [(ref, name) for _kind, ref, name, _score in rows]
+
+
+# The columnar catalog snapshot if it is current, else None. Imported on
+# first use, since it brings in NumPy.
+def _snapshot():
+    import Snapshot
+    return Snapshot.current()
+
+
+# Attach Name and Genre to [(TrackID, distance)] from Similarity
+def _with_names(hits):
+    if not hits:
+        return []
+    ids = json.dumps([track_id for track_id, _distance in hits])
+    query = "SELECT TrackID, Name, Genre FROM Track WHERE TrackID IN (SELECT value FROM json_each(?))"
+    names = {row[0]: row[1:] for row in _run(query, (ids,), fetch=True)}
+    return [(track_id,) + names.get(track_id, (None, None)) + (distance,) for track_id, distance in hits]
+
+
+# Tracks that sound most like track_id, as (TrackID, Name, Genre, distance)
+@Metrics.timed
+def similar_tracks(track_id, k=20, genre=None):
+    import Similarity
+    return _with_names(Similarity.similar_tracks(track_id, k, genre))
+
+
+# Tracks to add to a playlist, closest to its average sound first
+@Metrics.timed
+def suggest_tracks_for_playlist(playlist_name, k=20, genre=None):
+    playlist_id = get_playlist_id_by_name(playlist_name)
+    if playlist_id is None:
+        return []
+    import Similarity
+    return _with_names(Similarity.suggest_for_playlist(playlist_id, k, genre))
 
 
 # Insert artist and album
 def insert_artist_with_album(artist_name, album_name):
-    _run("INSERT OR IGNORE INTO Artist (Name) VALUES (?)", (artist_name,))
-    artist_id = _run("SELECT ArtistID FROM Artist WHERE Name=?", (artist_name,), fetch=True)[0][0]
+    with Database.transaction():
+        _run("INSERT OR IGNORE INTO Artist (Name) VALUES (?)", (artist_name,))
+        artist_id = _run("SELECT ArtistID FROM Artist WHERE Name=?", (artist_name,), fetch=True)[0][0]
 
-    _run("INSERT OR IGNORE INTO Album (Name) VALUES (?)", (album_name,))
-    album_id = _run("SELECT AlbumID FROM Album WHERE Name=?", (album_name,), fetch=True)[0][0]
+        _run("INSERT OR IGNORE INTO Album (Name) VALUES (?)", (album_name,))
+        album_id = _run("SELECT AlbumID FROM Album WHERE Name=?", (album_name,), fetch=True)[0][0]
 
-    _run("INSERT OR IGNORE INTO ArtistAlbum (ArtistID, AlbumID) VALUES (?, ?)", (artist_id, album_id))
+        _run("INSERT OR IGNORE INTO ArtistAlbum (ArtistID, AlbumID) VALUES (?, ?)", (artist_id, album_id))
+        Cache.invalidate("Artist", "Album", "ArtistAlbum")
     return artist_id, album_id
 
 
 # Search album by id
+@Cache.cached(("Album",), maxsize=1024)
 def search_album_by_id(album_id):
     r = _run("SELECT Name FROM Album WHERE AlbumID=?", (album_id,), fetch=True)
     return r[0][0] if r else None
 
 
 # Playlist view: list tracks in playlist by playlist name
+@Cache.cached(("Playlist", "TrackPlaylist", "Track"), maxsize=128)
 def get_tracks_in_playlist_by_name(playlist_name):
     query = """
     SELECT Track.Name
@@ -80,11 +284,36 @@ def get_tracks_in_playlist_by_name(playlist_name):
     JOIN Playlist ON TrackPlaylist.PlaylistID = Playlist.PlaylistID
     WHERE Playlist.Name = ?
     """
-    rows = _run(query, (playlist_name,), fetch=True)
-    return [r[0] for r in rows] if rows else []
+    return [r[0] for r in _stream(query, (playlist_name,))]
+
+
+# Summary of a playlist, read from the PlaylistStats tables (see
+# PlaylistStats.py) so it costs the same for any playlist length:
+# {"tracks", "duration_ms", "genres": [(genre, tracks)] most tracks first,
+# "features": {feature: mean, or None}}, or None for an unknown playlist
+@Cache.cached(("Playlist", "TrackPlaylist", "Track"), maxsize=128)
+def get_playlist_summary(playlist_name):
+    playlist_id = get_playlist_id_by_name(playlist_name)
+    if playlist_id is None:
+        return None
+    columns = ", ".join(f"{f}Count, {f}Sum" for f in PlaylistStats.FEATURES)
+    r = _run(f"SELECT TrackCount, DurationSum, {columns} FROM PlaylistStats WHERE PlaylistID = ?",
+             (playlist_id,), fetch=True)
+    tracks, duration, *sums = r[0] if r else (0, 0) + (0, 0.0) * len(PlaylistStats.FEATURES)
+    genres = _run("""
+    SELECT Genre, TrackCount FROM PlaylistGenre
+    WHERE PlaylistID = ? AND TrackCount > 0
+    ORDER BY TrackCount DESC, Genre
+    """, (playlist_id,), fetch=True)
+    features = {
+        f: sums[2 * i + 1] / sums[2 * i] if sums[2 * i] else None
+        for i, f in enumerate(PlaylistStats.FEATURES)
+    }
+    return {"tracks": tracks, "duration_ms": duration, "genres": genres or [], "features": features}
 
 
 # Find artist by track name
+@Cache.cached(("Track", "ArtistTrack", "Artist"), maxsize=1024)
 def find_artist_by_track_name(track_name):
     query = """
     SELECT Artist.Name
@@ -99,36 +328,49 @@ def find_artist_by_track_name(track_name):
 
 
 # Tracks per genre
+# (read from the GenreStats summary table, see Stats.py)
+@Cache.cached(("Track",), maxsize=4)
 def tracks_per_genre():
-    r = _run("SELECT Genre, COUNT(*) FROM Track GROUP BY Genre", fetch=True)
+    snapshot = _snapshot()
+    if snapshot is not None:
+        return snapshot.tracks_per_genre()
+    r = _run("SELECT Genre, TrackCount FROM GenreStats WHERE TrackCount > 0 ORDER BY Genre", fetch=True)
     return r or []
 
 
 # Artists with album and track
+@Cache.cached(("Artist", "ArtistAlbum", "ArtistTrack"), maxsize=4)
 def artists_with_album_and_track():
+    snapshot = _snapshot()
+    if snapshot is not None:
+        return snapshot.artists_with_album_and_track()
     query = """
     SELECT DISTINCT Artist.Name
-    FROM Artist
-    JOIN ArtistAlbum ON Artist.ArtistID = ArtistAlbum.ArtistID
-    JOIN ArtistTrack ON Artist.ArtistID = ArtistTrack.ArtistID
+    FROM ArtistStats s
+    JOIN Artist ON Artist.ArtistID = s.ArtistID
+    WHERE s.TrackCount > 0 AND s.AlbumCount > 0
     """
-    r = _run(query, fetch=True)
-    return [x[0] for x in r] if r else []
+    return [x[0] for x in _stream(query)]
 
 
 # Playlists by date
+@Cache.cached(("Playlist",), maxsize=32)
 def get_playlists_after_date(date_str):
     r = _run("SELECT Name, CreatedDate FROM Playlist WHERE CreatedDate > ?", (date_str,), fetch=True)
     return r or []
 
 
 # Top artist (most tracks)
+@Cache.cached(("Artist", "ArtistTrack"), maxsize=4)
 def top_artist():
+    snapshot = _snapshot()
+    if snapshot is not None:
+        return snapshot.top_artist()
     query = """
     SELECT Name FROM Artist a JOIN
     (
-        SELECT ArtistID, COUNT(TrackID) AS TrackCount FROM ArtistTrack
-        GROUP BY ArtistID
+        SELECT ArtistID FROM ArtistStats
+        WHERE TrackCount > 0
         ORDER BY TrackCount DESC
         LIMIT 1
     ) s ON a.ArtistID = s.ArtistID
@@ -137,19 +379,29 @@ def top_artist():
     return r[0][0] if r else None
 
 
-# Duplicate tracks
+# Duplicate tracks (exact name and duration)
+@Cache.cached(("Track",), maxsize=4)
 def find_duplicate_tracks():
     query = """
-    SELECT t1.Name, t1.DurationMs
-    FROM Track t1
-    JOIN Track t2 ON t1.Name = t2.Name AND t1.DurationMs = t2.DurationMs AND t1.TrackID <> t2.TrackID
-    GROUP BY t1.Name, t1.DurationMs
+    SELECT Name, DurationMs
+    FROM Track
+    WHERE Name IS NOT NULL AND DurationMs IS NOT NULL
+    GROUP BY Name, DurationMs
+    HAVING COUNT(*) > 1
     """
     r = _run(query, fetch=True)
     return r or []
 
 
+# Duplicate clusters under a folded name and a duration tolerance, as
+# (name, artist ID or None, shortest, longest, [TrackID, ...]); see Dedup.py
+@Metrics.timed
+def find_duplicate_clusters(tolerance_ms=Dedup.DEFAULT_TOLERANCE_MS, by_artist=False, incremental=False):
+    return Dedup.find_clusters(tolerance_ms, by_artist, incremental)
+
+
 # Nested query: Artists with tracks of genre not in any playlist
+@Cache.cached(("Artist", "ArtistTrack", "Track", "TrackPlaylist"), maxsize=32)
 def nested_artists_not_in_playlist(genre):
     query = """
     SELECT DISTINCT a.Name, t.Name
@@ -163,15 +415,23 @@ def nested_artists_not_in_playlist(genre):
     return r or []
 
 
+# Averages from the summary tables; the overall one covers every track
+_AVG_DURATION = "CAST(s.DurationSum AS REAL) / s.DurationCount"
+_OVERALL_AVG_DURATION = "SELECT CAST(SUM(DurationSum) AS REAL) / SUM(DurationCount) FROM GenreStats"
+
+
 # Artists above average duration
+@Cache.cached(("Artist", "ArtistTrack", "Track"), maxsize=4)
 def artists_above_avg_duration():
-    query = """
-    SELECT Artist.Name, AVG(Track.DurationMs) AS AvgDuration
-    FROM Artist
-    JOIN ArtistTrack ON Artist.ArtistID = ArtistTrack.ArtistID
-    JOIN Track ON ArtistTrack.TrackID = Track.TrackID
-    GROUP BY Artist.ArtistID
-    HAVING AvgDuration > (SELECT AVG(DurationMs) FROM Track)
+    snapshot = _snapshot()
+    if snapshot is not None:
+        return snapshot.artists_above_avg_duration()
+    query = f"""
+    SELECT Artist.Name, {_AVG_DURATION} AS AvgDuration
+    FROM ArtistStats s
+    JOIN Artist ON Artist.ArtistID = s.ArtistID
+    WHERE s.DurationCount > 0 AND {_AVG_DURATION} > ({_OVERALL_AVG_DURATION})
+    ORDER BY s.ArtistID
     """
     r = _run(query, fetch=True)
     return r or []
@@ -179,6 +439,198 @@ def artists_above_avg_duration():
 
 # Delete track (and related entries)
 def delete_track_by_id(track_id):
-    _run("DELETE FROM Track WHERE TrackID=?", (track_id,))
-    _run("DELETE FROM ArtistTrack WHERE TrackID=?", (track_id,))
-    _run("DELETE FROM TrackPlaylist WHERE TrackID=?", (track_id,))
+    delete_tracks(track_ids=[track_id])
+
+
+# Delete every track matching all of the given criteria, with its playlist
+# entries and artist links, in one transaction: track_ids (a list), genre,
+# album_id, and max_popularity (popularity below it). With gc_orphans,
+# albums and artists of the deleted tracks that have no tracks left are
+# deleted too, with their ArtistAlbum links. Returns the number of rows
+# removed per kind.
+@Metrics.timed
+def delete_tracks(track_ids=None, genre=None, album_id=None, max_popularity=None, gc_orphans=False):
+    where, params = [], []
+    if track_ids is not None:
+        where.append("TrackID IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(list(track_ids)))
+    if genre is not None:
+        where.append("Genre = ?")
+        params.append(genre)
+    if album_id is not None:
+        where.append("AlbumID = ?")
+        params.append(album_id)
+    if max_popularity is not None:
+        where.append("Popularity < ?")
+        params.append(max_popularity)
+    if not where:
+        raise ValueError("delete_tracks needs at least one criterion")
+
+    counts = dict.fromkeys(("tracks", "playlist_entries", "artist_links", "album_links", "albums", "artists"), 0)
+    with Database.transaction() as conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS DeleteTrack (TrackID TEXT PRIMARY KEY)")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS DeleteArtist (ArtistID INTEGER PRIMARY KEY)")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS DeleteAlbum (AlbumID INTEGER PRIMARY KEY)")
+        for table in ("DeleteTrack", "DeleteArtist", "DeleteAlbum"):
+            conn.execute(f"DELETE FROM temp.{table}")
+
+        conn.execute(f"INSERT INTO temp.DeleteTrack SELECT TrackID FROM Track WHERE {' AND '.join(where)}", params)
+        doomed = "(SELECT TrackID FROM temp.DeleteTrack)"
+        if gc_orphans:
+            conn.execute(f"INSERT OR IGNORE INTO temp.DeleteArtist SELECT ArtistID FROM ArtistTrack WHERE TrackID IN {doomed}")
+            conn.execute(f"""INSERT OR IGNORE INTO temp.DeleteAlbum
+                             SELECT AlbumID FROM Track WHERE TrackID IN {doomed} AND AlbumID IS NOT NULL""")
+
+        counts["playlist_entries"] = conn.execute(f"DELETE FROM TrackPlaylist WHERE TrackID IN {doomed}").rowcount
+        counts["artist_links"] = conn.execute(f"DELETE FROM ArtistTrack WHERE TrackID IN {doomed}").rowcount
+        conn.execute(f"DELETE FROM TrackHash WHERE TrackID IN {doomed}")
+        counts["tracks"] = conn.execute(f"DELETE FROM Track WHERE TrackID IN {doomed}").rowcount
+
+        if gc_orphans:
+            # Keep only candidates with nothing left pointing at them
+            conn.execute("""DELETE FROM temp.DeleteAlbum
+                            WHERE EXISTS (SELECT 1 FROM Track t WHERE t.AlbumID = DeleteAlbum.AlbumID)""")
+            conn.execute("""DELETE FROM temp.DeleteArtist
+                            WHERE EXISTS (SELECT 1 FROM ArtistTrack at WHERE at.ArtistID = DeleteArtist.ArtistID)""")
+            counts["album_links"] = conn.execute(
+                "DELETE FROM ArtistAlbum WHERE AlbumID IN (SELECT AlbumID FROM temp.DeleteAlbum)").rowcount
+            counts["album_links"] += conn.execute(
+                "DELETE FROM ArtistAlbum WHERE ArtistID IN (SELECT ArtistID FROM temp.DeleteArtist)").rowcount
+            counts["albums"] = conn.execute(
+                "DELETE FROM Album WHERE AlbumID IN (SELECT AlbumID FROM temp.DeleteAlbum)").rowcount
+            counts["artists"] = conn.execute(
+                "DELETE FROM Artist WHERE ArtistID IN (SELECT ArtistID FROM temp.DeleteArtist)").rowcount
+            Cache.invalidate("Album", "Artist", "ArtistAlbum")
+        Cache.invalidate("Track", "ArtistTrack", "TrackPlaylist")
+    return counts
+
+
+
+# ----------------------------
+# Streaming API
+# ----------------------------
+# Generators over a live cursor, for callers that want to walk large
+# results in constant memory. Rows come in key order and the leading
+# column(s) are the key: pass the last row's key as after_id to continue
+# from there, and limit to bound a page (None for no limit).
+
+def iter_playlists(after_id=None, limit=None):
+    where, params = _after(["PlaylistID"], after_id)
+    query = f"SELECT PlaylistID, Name FROM Playlist WHERE {where} ORDER BY PlaylistID LIMIT ?"
+    yield from _stream(query, params + (-1 if limit is None else limit,))
+
+
+def iter_tracks(after_id=None, limit=None):
+    where, params = _after(["TrackID"], after_id)
+    query = f"SELECT TrackID, Name FROM Track WHERE {where} ORDER BY TrackID LIMIT ?"
+    yield from _stream(query, params + (-1 if limit is None else limit,))
+
+
+def iter_tracks_in_playlist(playlist_name, after_id=None, limit=None):
+    where, params = _after(["TrackPlaylist.TrackID"], after_id)
+    query = f"""
+    SELECT Track.TrackID, Track.Name
+    FROM Playlist
+    JOIN TrackPlaylist ON TrackPlaylist.PlaylistID = Playlist.PlaylistID
+    JOIN Track ON Track.TrackID = TrackPlaylist.TrackID
+    WHERE Playlist.Name = ? AND {where}
+    ORDER BY TrackPlaylist.TrackID
+    LIMIT ?
+    """
+    yield from _stream(query, (playlist_name,) + params + (-1 if limit is None else limit,))
+
+
+# (TrackID, Name, DurationMs, artist names joined with ", ") in playlist
+# order by TrackID; what playlist export writes
+def iter_playlist_entries(playlist_name, after_id=None, limit=None):
+    where, params = _after(["tp.TrackID"], after_id)
+    query = f"""
+    SELECT t.TrackID, t.Name, t.DurationMs,
+           (SELECT group_concat(a.Name, ', ') FROM ArtistTrack at JOIN Artist a ON a.ArtistID = at.ArtistID
+            WHERE at.TrackID = t.TrackID)
+    FROM Playlist p
+    JOIN TrackPlaylist tp ON tp.PlaylistID = p.PlaylistID
+    JOIN Track t ON t.TrackID = tp.TrackID
+    WHERE p.Name = ? AND {where}
+    ORDER BY tp.TrackID
+    LIMIT ?
+    """
+    yield from _stream(query, (playlist_name,) + params + (-1 if limit is None else limit,))
+
+
+# (Genre, track count); tracks without a genre come last
+def iter_tracks_per_genre(after_id=None, limit=None):
+    where, params = _after_nullable(["Genre"], after_id)
+    query = f"""SELECT Genre, TrackCount FROM GenreStats WHERE TrackCount > 0 AND {where}
+                ORDER BY {_nulls_last(["Genre"])} LIMIT ?"""
+    yield from _stream(query, params + (-1 if limit is None else limit,))
+
+
+# (ArtistID, Name)
+def iter_artists_with_album_and_track(after_id=None, limit=None):
+    where, params = _after(["s.ArtistID"], after_id)
+    query = f"""
+    SELECT s.ArtistID, a.Name
+    FROM ArtistStats s
+    JOIN Artist a ON a.ArtistID = s.ArtistID
+    WHERE {where} AND s.TrackCount > 0 AND s.AlbumCount > 0
+    ORDER BY s.ArtistID
+    LIMIT ?
+    """
+    yield from _stream(query, params + (-1 if limit is None else limit,))
+
+
+# (PlaylistID, Name, CreatedDate)
+def iter_playlists_after_date(date_str, after_id=None, limit=None):
+    where, params = _after(["PlaylistID"], after_id)
+    query = f"""
+    SELECT PlaylistID, Name, CreatedDate FROM Playlist
+    WHERE CreatedDate > ? AND {where}
+    ORDER BY PlaylistID
+    LIMIT ?
+    """
+    yield from _stream(query, (date_str,) + params + (-1 if limit is None else limit,))
+
+
+# (Name, DurationMs); the key is the (Name, DurationMs) pair
+def iter_duplicate_tracks(after_id=None, limit=None):
+    where, params = _after(["Name", "DurationMs"], after_id)
+    query = f"""
+    SELECT Name, DurationMs
+    FROM Track
+    WHERE Name IS NOT NULL AND DurationMs IS NOT NULL AND {where}
+    GROUP BY Name, DurationMs
+    HAVING COUNT(*) > 1
+    ORDER BY Name, DurationMs
+    LIMIT ?
+    """
+    yield from _stream(query, params + (-1 if limit is None else limit,))
+
+
+# (artist name, track name); the key is the pair, with missing names last
+def iter_nested_artists_not_in_playlist(genre, after_id=None, limit=None):
+    where, params = _after_nullable(["a.Name", "t.Name"], after_id)
+    query = f"""
+    SELECT DISTINCT a.Name, t.Name
+    FROM Artist a
+    JOIN ArtistTrack at ON a.ArtistID = at.ArtistID
+    JOIN Track t ON at.TrackID = t.TrackID
+    WHERE t.Genre = ? AND t.TrackID NOT IN (SELECT TrackID FROM TrackPlaylist) AND {where}
+    ORDER BY {_nulls_last(["a.Name", "t.Name"])}
+    LIMIT ?
+    """
+    yield from _stream(query, (genre,) + params + (-1 if limit is None else limit,))
+
+
+# (ArtistID, Name, average DurationMs)
+def iter_artists_above_avg_duration(after_id=None, limit=None):
+    where, params = _after(["s.ArtistID"], after_id)
+    query = f"""
+    SELECT s.ArtistID, Artist.Name, {_AVG_DURATION} AS AvgDuration
+    FROM ArtistStats s
+    JOIN Artist ON Artist.ArtistID = s.ArtistID
+    WHERE {where} AND s.DurationCount > 0 AND {_AVG_DURATION} > ({_OVERALL_AVG_DURATION})
+    ORDER BY s.ArtistID
+    LIMIT ?
+    """
+    yield from _stream(query, params + (-1 if limit is None else limit,))
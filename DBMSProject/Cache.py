@@ -0,0 +1,143 @@
+# Cache.py
+# Read-through caches for Backend lookups. Every cached function names the
+# tables it reads; each table has a generation counter that writes bump
+# once they commit. An entry remembers the generations it was computed
+# under and is discarded as soon as any of them moves on, so a write to
+# Playlist leaves cached Track lookups alone. A TTL bounds how stale an
+# entry can get when another process writes to the database.
+#
+# Cached results are shared between callers and must not be modified.
+# Calls made inside a transaction bypass the cache.
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import Database
+
+DEFAULT_TTL = 300.0
+
+_lock = threading.Lock()
+_generations = {}
+_caches = {}
+# Bumped by invalidate_all(); part of every entry's generations, so it also
+# covers tables that no write has bumped yet
+_epoch = 0
+
+
+def _snapshot(tables):
+    return (_epoch,) + tuple(_generations.get(table, 0) for table in tables)
+
+
+def _bump(tables):
+    with _lock:
+        for table in tables:
+            _generations[table] = _generations.get(table, 0) + 1
+
+
+# Mark tables as changed. Inside a transaction this waits for the commit,
+# so a reader can't cache pre-commit data under the new generation.
+def invalidate(*tables):
+    Database.on_commit(lambda: _bump(tables))
+
+
+# Drop everything, e.g. after a bulk load through another connection
+def invalidate_all():
+    global _epoch
+    with _lock:
+        for cache in _caches.values():
+            cache.entries.clear()
+        _epoch += 1
+
+
+class LRUCache:
+    def __init__(self, name, tables, maxsize=256, ttl=DEFAULT_TTL):
+        self.name = name
+        self.tables = tuple(tables)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale = 0
+
+    # (found, value)
+    def get(self, key):
+        with _lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            value, generations, expires = entry
+            if generations != _snapshot(self.tables) or (expires is not None and time.monotonic() > expires):
+                del self.entries[key]
+                self.stale += 1
+                self.misses += 1
+                return False, None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key, value, generations):
+        with _lock:
+            # A write committed while the value was being computed
+            if generations != _snapshot(self.tables):
+                return
+            expires = time.monotonic() + self.ttl if self.ttl is not None else None
+            self.entries[key] = (value, generations, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with _lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "stale": self.stale,
+            }
+
+
+# Decorator: cache fn's results by its arguments (and the database path)
+# until one of tables is written or ttl seconds pass.
+def cached(tables, maxsize=256, ttl=DEFAULT_TTL):
+    def decorate(fn):
+        cache = _caches[fn.__name__] = LRUCache(fn.__name__, tables, maxsize, ttl)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Inside a transaction reads see uncommitted writes; never cache those
+            if Database.in_transaction():
+                return fn(*args, **kwargs)
+            key = (Database.DB_PATH, args, tuple(sorted(kwargs.items())))
+            found, value = cache.get(key)
+            if found:
+                return value
+            with _lock:
+                generations = _snapshot(cache.tables)
+            value = fn(*args, **kwargs)
+            cache.put(key, value, generations)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorate
+
+
+# {function name: hit/miss/eviction counters and size}
+def stats():
+    return {name: cache.stats() for name, cache in sorted(_caches.items())}
+
+
+def reset_stats():
+    with _lock:
+        for cache in _caches.values():
+            cache.hits = cache.misses = cache.evictions = cache.stale = 0
@@ -0,0 +1,154 @@
+# Database.py
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import Metrics
+
+DB_PATH = "music.db"
+
+# PRAGMAs applied to every connection we open. WAL lets readers and the
+# writer run side by side and, with synchronous=NORMAL, commits no longer
+# fsync the main database file.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,        # negative = KiB, so ~64 MB of page cache
+    "mmap_size": 268435456,      # 256 MB
+    "temp_store": "MEMORY",
+}
+
+# Size of the per-connection prepared statement cache (sqlite3 keeps one
+# compiled statement per distinct SQL string).
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+
+# Database paths already brought up to Migrations.LATEST_VERSION
+_migrated = set()
+
+
+# Change the database path and/or PRAGMAs used by new connections
+def configure(path=None, **pragmas):
+    global DB_PATH
+    if path is not None:
+        DB_PATH = path
+    PRAGMAS.update(pragmas)
+    close_connection()
+
+
+def apply_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name}={value}")
+
+
+# Open a new connection. isolation_level=None puts the driver in autocommit
+# mode so transactions are only ever started by transaction() below. Pass
+# check_same_thread=False for connections handed between threads by a pool
+# (one thread at a time).
+def connect(path=None, pragmas=None, check_same_thread=True):
+    conn = sqlite3.connect(
+        path or DB_PATH,
+        isolation_level=None,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=check_same_thread,
+    )
+    apply_pragmas(conn, PRAGMAS if pragmas is None else pragmas)
+    return conn
+
+
+# Long-lived connection for the calling thread, opened on first use. The
+# first connection to a database in this process applies pending migrations.
+def get_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_PATH:
+        close_connection()
+        start = time.perf_counter()
+        conn = connect()
+        if DB_PATH not in _migrated:
+            import Migrations
+            Migrations.migrate(conn)
+            _migrated.add(DB_PATH)
+        if Metrics.ENABLED:
+            Metrics.record("connect", start)
+        _local.conn = conn
+        _local.path = DB_PATH
+        _local.depth = 0
+        _local.on_commit = []
+    return conn
+
+
+def close_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+    _local.conn = None
+    _local.path = None
+    _local.depth = 0
+    _local.on_commit = []
+
+
+# Make conn this thread's connection for the duration of the block, e.g. one
+# borrowed from a pool; the thread's own connection is put back afterwards
+@contextmanager
+def use_connection(conn):
+    saved = (getattr(_local, "conn", None), getattr(_local, "path", None),
+             getattr(_local, "depth", 0), getattr(_local, "on_commit", []))
+    _local.conn, _local.path, _local.depth, _local.on_commit = conn, DB_PATH, 0, []
+    try:
+        yield conn
+    finally:
+        _local.conn, _local.path, _local.depth, _local.on_commit = saved
+
+
+# Run a block of statements atomically on this thread's connection.
+# Nested blocks become savepoints inside the outer transaction, so helpers
+# that open their own transaction can be composed freely.
+@contextmanager
+def transaction():
+    conn = get_connection()
+    depth = _local.depth
+    pending = len(_local.on_commit)
+    if depth == 0:
+        conn.execute("BEGIN IMMEDIATE")
+    else:
+        conn.execute(f"SAVEPOINT sp{depth}")
+    _local.depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        if depth == 0:
+            conn.execute("ROLLBACK")
+        else:
+            conn.execute(f"ROLLBACK TO sp{depth}")
+            conn.execute(f"RELEASE sp{depth}")
+        del _local.on_commit[pending:]
+        raise
+    else:
+        if depth == 0:
+            start = time.perf_counter()
+            conn.execute("COMMIT")
+            if Metrics.ENABLED:
+                Metrics.record("commit", start)
+            callbacks, _local.on_commit = _local.on_commit, []
+            for callback in callbacks:
+                callback()
+        else:
+            conn.execute(f"RELEASE sp{depth}")
+    finally:
+        _local.depth = depth
+
+
+def in_transaction():
+    return getattr(_local, "depth", 0) > 0
+
+
+# Call fn once this thread's current transaction commits (straight away
+# outside a transaction). Dropped if the transaction or the savepoint it
+# was registered in rolls back.
+def on_commit(fn):
+    if in_transaction():
+        _local.on_commit.append(fn)
+    else:
+        fn()
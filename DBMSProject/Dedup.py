@@ -0,0 +1,216 @@
+# Dedup.py
+# Duplicate track detection by normalized key. Each track gets a key from
+# its name (case and whitespace folded), kept in DedupKey; tracks sharing a
+# key whose durations lie within a tolerance of each other form a cluster.
+# Keys are computed lazily: triggers queue new and renamed tracks in
+# DedupPending and the next find_clusters() call processes the queue. They
+# are also listed in DedupNew until an incremental find_clusters() reports
+# on them, so full runs in between do not hide them from the next one.
+#
+#   python Dedup.py [music.db] [--tolerance 2000] [--by-artist] [--incremental]
+import argparse
+import json
+import unicodedata
+
+import Database
+
+DEFAULT_TOLERANCE_MS = 2000
+BATCH_SIZE = 5000
+
+TABLES = [
+    """CREATE TABLE IF NOT EXISTS DedupKey (
+        TrackID TEXT PRIMARY KEY,
+        NameKey TEXT NOT NULL,
+        DurationMs INTEGER
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_dedupkey_name ON DedupKey (NameKey, DurationMs)",
+    "CREATE TABLE IF NOT EXISTS DedupPending (TrackID TEXT PRIMARY KEY) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS DedupNew (TrackID TEXT PRIMARY KEY) WITHOUT ROWID",
+]
+
+# ON CONFLICT rather than INSERT OR IGNORE: when the outer statement is an
+# upsert (Ingest's TRACK_UPSERT) SQLite applies its conflict handling to the
+# trigger body and an OR IGNORE there is not honoured
+TRIGGERS = {
+    "dedup_track_ai": """AFTER INSERT ON Track BEGIN
+        INSERT INTO DedupPending (TrackID) VALUES (new.TrackID) ON CONFLICT (TrackID) DO NOTHING;
+        INSERT INTO DedupNew (TrackID) VALUES (new.TrackID) ON CONFLICT (TrackID) DO NOTHING;
+    END""",
+    "dedup_track_au": """AFTER UPDATE OF Name, DurationMs ON Track BEGIN
+        INSERT INTO DedupPending (TrackID) VALUES (new.TrackID) ON CONFLICT (TrackID) DO NOTHING;
+        INSERT INTO DedupNew (TrackID) VALUES (new.TrackID) ON CONFLICT (TrackID) DO NOTHING;
+    END""",
+    "dedup_track_ad": """AFTER DELETE ON Track BEGIN
+        DELETE FROM DedupKey WHERE TrackID = old.TrackID;
+        DELETE FROM DedupPending WHERE TrackID = old.TrackID;
+        DELETE FROM DedupNew WHERE TrackID = old.TrackID;
+    END""",
+}
+
+
+# Migration step: create the key tables and queue every existing track
+def create_schema(conn):
+    for statement in TABLES:
+        conn.execute(statement)
+    create_triggers(conn)
+    reset(conn)
+
+
+def create_triggers(conn):
+    for name, body in TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+# Migration step: replace triggers created by an older version of TRIGGERS
+def recreate_triggers(conn):
+    drop_triggers(conn)
+    create_triggers(conn)
+
+
+# Migration step: add DedupNew, starting from the tracks still queued
+def add_new_tracks(conn):
+    conn.execute(TABLES[-1])
+    conn.execute("INSERT OR IGNORE INTO DedupNew (TrackID) SELECT TrackID FROM DedupPending")
+    recreate_triggers(conn)
+
+
+# Bulk loads drop the triggers, load, then reset() and create_triggers()
+# inside the same transaction instead of queueing row by row.
+def drop_triggers(conn):
+    for name in TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+# Forget every key and queue the whole catalog; the next find_clusters()
+# recomputes them
+def reset(conn=None):
+    conn = conn or Database.get_connection()
+    conn.execute("DELETE FROM DedupKey")
+    for table in ("DedupPending", "DedupNew"):
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"INSERT INTO {table} (TrackID) SELECT TrackID FROM Track")
+
+
+# "  Intro ", "INTRO" and "intro" all become "intro"
+def normalize_name(name):
+    if name is None:
+        return ""
+    if not name.isascii():
+        name = unicodedata.normalize("NFKC", name)
+    return " ".join(name.casefold().split())
+
+
+# Compute keys for every queued track. Returns {TrackID: NameKey} for the
+# tracks processed.
+def update_keys(conn):
+    processed = {}
+    after = ""
+    while True:
+        # CROSS JOIN keeps DedupPending as the outer loop
+        rows = conn.execute(
+            """SELECT p.TrackID, t.Name, t.DurationMs
+               FROM DedupPending p CROSS JOIN Track t ON t.TrackID = p.TrackID
+               WHERE p.TrackID > ?
+               ORDER BY p.TrackID
+               LIMIT ?""",
+            (after, BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            break
+        keys = [(track_id, normalize_name(name), duration) for track_id, name, duration in rows]
+        conn.executemany("INSERT OR REPLACE INTO DedupKey (TrackID, NameKey, DurationMs) VALUES (?, ?, ?)", keys)
+        processed.update((track_id, key) for track_id, key, _duration in keys)
+        after = rows[-1][0]
+    conn.execute("DELETE FROM DedupPending")
+    return processed
+
+
+# Split rows sorted by (group, duration) into runs where each duration is
+# within tolerance_ms of the previous one, keeping runs of two or more
+def _clusters(rows, tolerance_ms):
+    clusters = []
+    run = []
+    for row in rows:
+        group, duration = row[0], row[1]
+        if run and (group != run[-1][0] or duration - run[-1][1] > tolerance_ms):
+            if len(run) > 1:
+                clusters.append(run)
+            run = []
+        run.append(row)
+    if len(run) > 1:
+        clusters.append(run)
+    return clusters
+
+
+# Duplicate clusters as (name, artist ID or None, shortest and longest
+# duration, [TrackID, ...]), ordered by name. Tracks are duplicates when
+# their names fold to the same key and each duration is within tolerance_ms
+# of the next; by_artist also requires a shared artist (a track with several
+# artists can then appear once per artist). Tracks without a duration are
+# never matched. incremental only reports clusters that contain a track
+# added or renamed since the last incremental call.
+def find_clusters(tolerance_ms=DEFAULT_TOLERANCE_MS, by_artist=False, incremental=False):
+    with Database.transaction() as conn:
+        update_keys(conn)
+        new = {}
+        if incremental:
+            # CROSS JOIN keeps DedupNew as the outer loop
+            new = dict(conn.execute("""
+                SELECT n.TrackID, k.NameKey
+                FROM DedupNew n CROSS JOIN DedupKey k ON k.TrackID = n.TrackID
+            """))
+            conn.execute("DELETE FROM DedupNew")
+
+    # Only keys that occur more than once can form a cluster
+    params = ()
+    if incremental:
+        keys = "SELECT value FROM json_each(?)"
+        params = (json.dumps(sorted(set(new.values()))),)
+    else:
+        keys = "SELECT NameKey FROM DedupKey GROUP BY NameKey HAVING COUNT(*) > 1"
+    if by_artist:
+        query = f"""
+        SELECT at.ArtistID || char(31) || k.NameKey, k.DurationMs, k.TrackID, at.ArtistID
+        FROM DedupKey k
+        JOIN ArtistTrack at ON at.TrackID = k.TrackID
+        WHERE k.DurationMs IS NOT NULL AND k.NameKey IN ({keys})
+        ORDER BY at.ArtistID, k.NameKey, k.DurationMs, k.TrackID
+        """
+    else:
+        query = f"""
+        SELECT NameKey, DurationMs, TrackID, NULL
+        FROM DedupKey
+        WHERE DurationMs IS NOT NULL AND NameKey IN ({keys})
+        ORDER BY NameKey, DurationMs, TrackID
+        """
+    clusters = _clusters(conn.execute(query, params), tolerance_ms)
+    if incremental:
+        clusters = [run for run in clusters if any(row[2] in new for row in run)]
+
+    # Names only for what is reported, shown as the first member spells it
+    results = []
+    for run in clusters:
+        row = conn.execute("SELECT Name FROM Track WHERE TrackID = ?", (run[0][2],)).fetchone()
+        results.append((row[0] if row else None, run[0][3], run[0][1], run[-1][1], [row[2] for row in run]))
+
+    results.sort(key=lambda cluster: (cluster[0] or "").casefold())
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List duplicate track clusters.")
+    parser.add_argument("db", nargs="?", default=Database.DB_PATH)
+    parser.add_argument("--tolerance", type=int, default=DEFAULT_TOLERANCE_MS, help="duration tolerance in ms")
+    parser.add_argument("--by-artist", action="store_true", help="only match tracks sharing an artist")
+    parser.add_argument("--incremental", action="store_true", help="only clusters with tracks added since the last run")
+    args = parser.parse_args(argv)
+
+    Database.configure(args.db)
+    clusters = find_clusters(args.tolerance, args.by_artist, args.incremental)
+    for name, _artist_id, shortest, longest, track_ids in clusters:
+        print(f"{name} ({shortest}-{longest} ms): {', '.join(track_ids)}")
+    print(f"{len(clusters)} duplicate cluster(s)")
+
+
+if __name__ == "__main__":
+    main()
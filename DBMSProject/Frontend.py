@@ -1,16 +1,36 @@
 # Frontend.py
 
+import time
+
+# Startup timings (--startup-time) are measured from here
+_MODULE_START = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import Backend
+import Cache
+import Metrics
+import Playlists
+from Tasks import TaskRunner
+from Widgets import AutocompleteCombobox, ResultGrid
 
 class MusicDBApp:
-    def __init__(self, root):
+    # lazy=True builds each tab the first time it is selected instead of all
+    # of them up front
+    def __init__(self, root, lazy=True):
         self.root = root
         root.title("Music Database Interface")
         root.geometry("900x600")
 
-        tab_control = ttk.Notebook(root)
+        # Backend queries run on worker threads; each tab shows a busy label while one is running
+        self.busy_labels = {}
+        self.busy_counts = {}
+        self.tasks = TaskRunner(root, on_busy=self.set_busy)
+        root.protocol("WM_DELETE_WINDOW", self.close)
+        # Called with the playlist names each time the dropdown is filled
+        self.on_playlists_loaded = None
+
+        tab_control = self.tab_control = ttk.Notebook(root)
 
         # Tabs
         self.tab_create_playlist = ttk.Frame(tab_control)
@@ -28,40 +48,110 @@ class MusicDBApp:
         self.tab_delete_track = ttk.Frame(tab_control)
 
         tabs = [
-            ("Create Playlist", self.tab_create_playlist),
-            ("Insert Artist", self.tab_insert_artist),
-            ("Search Album", self.tab_search_album),
-            ("Playlist View", self.tab_playlist_view),
-            ("Artist from Track", self.tab_artist_from_track),
-            ("Tracks per Genre", self.tab_track_stats),
-            ("Artists w/ Album & Track", self.tab_artist_album_track),
-            ("Playlists by Date", self.tab_playlist_by_date),
-            ("Top Artist", self.tab_top_artist),
-            ("Duplicate Tracks", self.tab_duplicate_tracks),
-            ("Nested Query Artist", self.tab_nested_query),
-            ("Avg Track Duration", self.tab_avg_duration),
-            ("Delete Track", self.tab_delete_track)
+            ("Create Playlist", self.tab_create_playlist, self.create_create_playlist_tab),
+            ("Insert Artist", self.tab_insert_artist, self.create_insert_artist_tab),
+            ("Search Album", self.tab_search_album, self.create_search_album_tab),
+            ("Playlist View", self.tab_playlist_view, self.create_playlist_view_tab),
+            ("Artist from Track", self.tab_artist_from_track, self.create_artist_from_track_tab),
+            ("Tracks per Genre", self.tab_track_stats, self.create_track_stats_tab),
+            ("Artists w/ Album & Track", self.tab_artist_album_track, self.create_artist_album_track_tab),
+            ("Playlists by Date", self.tab_playlist_by_date, self.create_playlist_by_date_tab),
+            ("Top Artist", self.tab_top_artist, self.create_top_artist_tab),
+            ("Duplicate Tracks", self.tab_duplicate_tracks, self.create_duplicate_tracks_tab),
+            ("Nested Query Artist", self.tab_nested_query, self.create_nested_query_tab),
+            ("Avg Track Duration", self.tab_avg_duration, self.create_avg_duration_tab),
+            ("Delete Track", self.tab_delete_track, self.create_delete_track_tab)
         ]
 
-        for title, frame in tabs:
+        for title, frame, _build in tabs:
             tab_control.add(frame, text=title)
 
         tab_control.pack(expand=1, fill="both")
 
-        # Build tabs
-        self.create_create_playlist_tab()
-        self.create_insert_artist_tab()
-        self.create_search_album_tab()
-        self.create_playlist_view_tab()
-        self.create_artist_from_track_tab()
-        self.create_track_stats_tab()
-        self.create_artist_album_track_tab()
-        self.create_playlist_by_date_tab()
-        self.create_top_artist_tab()
-        self.create_duplicate_tracks_tab()
-        self.create_nested_query_tab()
-        self.create_avg_duration_tab()
-        self.create_delete_track_tab()
+        # Build tabs: all now, or just the first and the rest on first selection
+        self.unbuilt_tabs = {str(frame): build for _title, frame, build in tabs}
+        if lazy:
+            self.build_tab(self.tab_create_playlist)
+            tab_control.bind("<<NotebookTabChanged>>", lambda _event: self.build_tab(tab_control.select()))
+        else:
+            for _title, frame, _build in tabs:
+                self.build_tab(frame)
+
+        # Hidden diagnostics tab: Ctrl+Shift+D shows it and turns query metrics on
+        self.tab_diagnostics = None
+        root.bind_all("<Control-Shift-D>", lambda _event: self.show_diagnostics_tab())
+
+    def build_tab(self, frame):
+        build = self.unbuilt_tabs.pop(str(frame), None)
+        if build is not None:
+            build()
+
+    def close(self):
+        self.tasks.shutdown()
+        self.root.destroy()
+
+    # ----------------------------
+    # Background queries
+    # ----------------------------
+
+    # Run fn(*args) off the Tk thread and pass its result to on_done. A new
+    # request from the same tab replaces one still running.
+    def run_in_background(self, tab, fn, *args, on_done):
+        self.tasks.submit(tab, fn, *args, on_done=on_done, on_error=self.show_task_error)
+
+    # As above for a write (or a file export), under its own key such as
+    # (tab, "import"). A write is never superseded or timed out, since
+    # interrupting it rolls it back: while one is running, a second request
+    # for the same key is refused. Returns whether it was started.
+    def run_write_in_background(self, key, fn, *args, on_done):
+        if self.tasks.running(key):
+            messagebox.showwarning("Busy", "Still working on the previous request; please wait for it to finish.")
+            return False
+        self.tasks.submit(key, fn, *args, on_done=on_done, on_error=self.show_task_error, timeout=None)
+        return True
+
+    # Lookups for the track autocomplete; each keystroke's lookup replaces
+    # the one before
+    def run_autocomplete(self, fn, *args, on_done):
+        self.tasks.submit("autocomplete", fn, *args, on_done=on_done, on_error=self.show_task_error)
+
+    # Page source for a ResultGrid over a keyset-paged Backend iter_* call.
+    # Each page is fetched in the background; key(row) gives the after_id
+    # that continues after that row. A page that fails, times out or is
+    # superseded tells the grid, so it stops waiting for it.
+    def keyset_source(self, tab, fn, *args, key=lambda row: row[0]):
+        def fetch(after, limit):
+            rows = list(fn(*args, after_id=after, limit=limit))
+            return rows, (key(rows[-1]) if rows else None)
+
+        def failed(fail, error):
+            self.show_task_error(error)
+            fail(error)
+
+        def source(after, limit, deliver, fail):
+            self.tasks.submit(tab, fetch, after, limit, on_done=lambda page: deliver(*page),
+                              on_error=lambda error: failed(fail, error), on_cancel=fail)
+
+        return source
+
+    def show_task_error(self, error):
+        messagebox.showerror("Error", str(error))
+
+    # Keys are a tab, a (tab, operation) pair, or a name for loads that show
+    # no label; the tab's label stays up while any of its keys is busy
+    def set_busy(self, key, busy):
+        if isinstance(key, str):
+            return
+        tab = key[0] if isinstance(key, tuple) else key
+        count = self.busy_counts.get(tab, 0) + (1 if busy else -1)
+        self.busy_counts[tab] = count
+        label = self.busy_labels.get(tab)
+        if label is None:
+            label = self.busy_labels[tab] = ttk.Label(tab, text="Working...")
+        if count > 0:
+            label.place(relx=1.0, rely=1.0, x=-10, y=-10, anchor="se")
+        else:
+            label.place_forget()
 
     # ----------------------------
     # Tab Implementations
@@ -91,21 +181,55 @@ class MusicDBApp:
         self.playlist_selector.grid(row=4, column=1, padx=5, pady=5)
 
         ttk.Label(self.tab_create_playlist, text="Select Track: ").grid(row=5, column=0, padx=5, pady=5)
-        self.track_selector = ttk.Combobox(self.tab_create_playlist, width=40)
+        # Offers matching track names as the user types rather than loading the whole catalog
+        self.track_selector = AutocompleteCombobox(self.tab_create_playlist, fetch=Backend.search_track_names,
+                                                   run=self.run_autocomplete, width=40)
         self.track_selector.grid(row=5, column=1, padx=5, pady=5)
 
         ttk.Button(self.tab_create_playlist, text="Add Track to Playlist", command=self.add_track_to_playlist).grid(row=6, column=1, pady=10)
 
+        # Add many tracks at once: search, select several, add them in one transaction
+        ttk.Label(self.tab_create_playlist, text="Find Tracks: ").grid(row=7, column=0, padx=5, pady=5)
+        search_row = ttk.Frame(self.tab_create_playlist)
+        search_row.grid(row=7, column=1, padx=5, pady=5, sticky="w")
+        self.multi_track_entry = ttk.Entry(search_row, width=30)
+        self.multi_track_entry.pack(side="left")
+        self.multi_track_entry.bind("<Return>", lambda e: self.search_multi_tracks())
+        ttk.Button(search_row, text="Search", command=self.search_multi_tracks).pack(side="left", padx=5)
+
+        list_frame = ttk.Frame(self.tab_create_playlist)
+        list_frame.grid(row=8, column=1, padx=5, pady=5, sticky="w")
+        self.multi_track_list = tk.Listbox(list_frame, selectmode="extended", width=50, height=8)
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.multi_track_list.yview)
+        self.multi_track_list.config(yscrollcommand=scrollbar.set)
+        self.multi_track_list.pack(side="left")
+        scrollbar.pack(side="left", fill="y")
+        self.multi_track_ids = []
+
+        buttons = ttk.Frame(self.tab_create_playlist)
+        buttons.grid(row=9, column=1, pady=10)
+        ttk.Button(buttons, text="Add Selected to Playlist", command=self.add_selected_tracks).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Import Playlist...", command=self.import_playlist).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Export Playlist...", command=self.export_playlist).pack(side="left", padx=5)
+
         self.refresh_playlist_dropdown()
-        self.refresh_track_dropdown()
 
+    # Fill the playlist dropdown in the background; safe to call before the
+    # Create Playlist tab is built
     def refresh_playlist_dropdown(self):
-        names = Backend.get_playlist_names()
+        if str(self.tab_create_playlist) in self.unbuilt_tabs:
+            return
+        self.tasks.submit("playlist_names", Backend.get_playlist_names, on_done=self.set_playlist_names,
+                          on_error=self.show_task_error)
+
+    def set_playlist_names(self, names):
         self.playlist_selector["values"] = names
+        if self.on_playlists_loaded:
+            self.on_playlists_loaded(names)
 
     def refresh_track_dropdown(self):
-        names = Backend.get_track_names()
-        self.track_selector["values"] = names
+        if str(self.tab_create_playlist) not in self.unbuilt_tabs:
+            self.track_selector.clear_cache()
 
     def create_playlist(self):
         pname = self.new_playlist_entry.get().strip()
@@ -119,7 +243,10 @@ class MusicDBApp:
             import datetime
             pdate = str(datetime.date.today())
 
-        Backend.create_playlist(pname, pdate)
+        self.run_write_in_background((self.tab_create_playlist, "create"), Backend.create_playlist, pname, pdate,
+                                     on_done=lambda _result: self.playlist_created(pname))
+
+    def playlist_created(self, pname):
         messagebox.showinfo("Success", f"Playlist '{pname}' created successfully")
         self.refresh_playlist_dropdown()
 
@@ -131,16 +258,88 @@ class MusicDBApp:
             messagebox.showwarning("Input Error", "Please select playlist and track.")
             return
 
-        pid = Backend.get_playlist_id_by_name(playlist_name)
-        tid = Backend.get_track_id_by_name(track_name)
+        # The lookups run with the write, off the Tk thread; False when one misses
+        def add():
+            pid = Backend.get_playlist_id_by_name(playlist_name)
+            tid = Backend.get_track_id_by_name(track_name)
+            if pid is None or tid is None:
+                return False
+            Backend.add_track_to_playlist(pid, tid)
+            return True
+
+        self.run_write_in_background((self.tab_create_playlist, "add"), add,
+                                     on_done=lambda added: self.track_added(added, playlist_name, track_name))
 
-        if pid is None or tid is None:
+    def track_added(self, added, playlist_name, track_name):
+        if not added:
             messagebox.showerror("Error", "Could not find playlist or track IDs")
             return
-
-        Backend.add_track_to_playlist(pid, tid)
         messagebox.showinfo("Success", f"Added '{track_name}' to playlist '{playlist_name}'.")
 
+    def search_multi_tracks(self):
+        text = self.multi_track_entry.get().strip()
+        if not text:
+            return
+        self.run_in_background((self.tab_create_playlist, "search"), Backend.search_tracks, text, 200,
+                               on_done=self.render_multi_tracks)
+
+    def render_multi_tracks(self, tracks):
+        self.multi_track_list.delete(0, tk.END)
+        self.multi_track_ids = [track_id for track_id, _name in tracks]
+        for _track_id, name in tracks:
+            self.multi_track_list.insert(tk.END, name)
+
+    def add_selected_tracks(self):
+        playlist_name = self.playlist_selector.get()
+        track_ids = [self.multi_track_ids[i] for i in self.multi_track_list.curselection()]
+        if not playlist_name or not track_ids:
+            messagebox.showwarning("Input Error", "Please select a playlist and one or more tracks.")
+            return
+
+        # None when the playlist is gone
+        def add():
+            pid = Backend.get_playlist_id_by_name(playlist_name)
+            return None if pid is None else Backend.add_tracks_to_playlist(pid, track_ids)
+
+        self.run_write_in_background((self.tab_create_playlist, "add"), add,
+                                     on_done=lambda added: self.tracks_added(added, len(track_ids), playlist_name))
+
+    def tracks_added(self, added, selected, playlist_name):
+        if added is None:
+            messagebox.showerror("Error", "Could not find playlist ID")
+            return
+        messagebox.showinfo("Success", f"Added {added} of {selected} tracks to playlist '{playlist_name}'.")
+
+    def import_playlist(self):
+        path = filedialog.askopenfilename(filetypes=[("Playlists", "*.m3u *.m3u8 *.csv *.jsonl")])
+        if not path:
+            return
+        self.run_write_in_background((self.tab_create_playlist, "import"), Playlists.import_playlist, path,
+                                     on_done=self.playlist_imported)
+
+    def playlist_imported(self, stats):
+        self.refresh_playlist_dropdown()
+        messagebox.showinfo(
+            "Import Complete",
+            f"Imported {stats['tracks']} tracks into '{stats['playlist']}' "
+            f"({stats['already']} already there, {stats['unresolved']} not found), "
+            f"{stats['tracks_per_sec']:,.0f} tracks/sec.")
+
+    def export_playlist(self):
+        playlist_name = self.playlist_selector.get()
+        if not playlist_name:
+            messagebox.showwarning("Input Error", "Please select a playlist to export.")
+            return
+        path = filedialog.asksaveasfilename(
+            initialfile=f"{playlist_name}.m3u",
+            filetypes=[("M3U", "*.m3u"), ("CSV", "*.csv"), ("JSON lines", "*.jsonl")])
+        if not path:
+            return
+        self.run_write_in_background(
+            (self.tab_create_playlist, "export"), Playlists.export_playlist, playlist_name, path,
+            on_done=lambda stats: messagebox.showinfo(
+                "Export Complete", f"Exported {stats['tracks']} tracks, {stats['tracks_per_sec']:,.0f} tracks/sec."))
+
     # Tab 2: Insert Artist
     def create_insert_artist_tab(self):
         ttk.Label(self.tab_insert_artist, text="Artist Name:").grid(row=0, column=0, padx=5, pady=5)
@@ -161,8 +360,10 @@ class MusicDBApp:
             messagebox.showwarning("Input Error", "Please enter both artist and album name.")
             return
 
-        Backend.insert_artist_with_album(artist_name, album_name)
-        messagebox.showinfo("Success", f"Inserted artist '{artist_name}' with album '{album_name}'.")
+        self.run_write_in_background(
+            (self.tab_insert_artist, "insert"), Backend.insert_artist_with_album, artist_name, album_name,
+            on_done=lambda _result: messagebox.showinfo(
+                "Success", f"Inserted artist '{artist_name}' with album '{album_name}'."))
 
     # Tab 3: Search Album by AlbumID
     def create_search_album_tab(self):
@@ -179,7 +380,10 @@ class MusicDBApp:
         if not album_id:
             messagebox.showwarning("Input Error", "Please enter Album ID.")
             return
-        result = Backend.search_album_by_id(album_id)
+        self.run_in_background(self.tab_search_album, Backend.search_album_by_id, album_id,
+                               on_done=self.render_album)
+
+    def render_album(self, result):
         if result:
             self.album_result.config(text=f"Album Name: {result}")
         else:
@@ -193,21 +397,41 @@ class MusicDBApp:
 
         ttk.Button(self.tab_playlist_view, text="Show Tracks", command=self.show_playlist_tracks).grid(row=1, column=1,
                                                                                                        pady=10)
-        self.playlist_tracks_text = tk.Text(self.tab_playlist_view, width=80, height=20)
-        self.playlist_tracks_text.grid(row=2, column=0, columnspan=2, pady=10)
+        self.playlist_summary_label = ttk.Label(self.tab_playlist_view, text="", justify="left")
+        self.playlist_summary_label.grid(row=2, column=0, columnspan=2, padx=10, sticky="w")
+        self.playlist_tracks_grid = ResultGrid(self.tab_playlist_view, ("Track ID", "Track", "Duration", "Artists"),
+                                               formatters={2: lambda ms: "" if ms is None else self.format_duration(ms)})
+        self.playlist_tracks_grid.grid(row=3, column=0, columnspan=2, pady=10, sticky="nsew")
 
     def show_playlist_tracks(self):
         pname = self.playlist_name_entry.get().strip()
         if not pname:
             messagebox.showwarning("Input Error", "Please enter Playlist Name.")
             return
-        results = Backend.get_tracks_in_playlist_by_name(pname)
-        self.playlist_tracks_text.delete("1.0", tk.END)
-        if results:
-            for t in results:
-                self.playlist_tracks_text.insert(tk.END, f"{t}")
+        self.run_in_background(self.tab_playlist_view, Backend.get_playlist_summary, pname,
+                               on_done=lambda summary: self.render_playlist_summary(pname, summary))
+
+    # Summary first (one row read), then the tracks a page at a time
+    def render_playlist_summary(self, pname, summary):
+        if summary is None:
+            self.playlist_summary_label.config(text="No playlist with that name.")
+            self.playlist_tracks_grid.set_rows([])
+            return
+        if not summary["tracks"]:
+            self.playlist_summary_label.config(text="No tracks found in this playlist.")
         else:
-            self.playlist_tracks_text.insert(tk.END, "No tracks found in this playlist.")
+            genres = ", ".join(f"{genre or 'none'} {count}" for genre, count in summary["genres"][:5])
+            if len(summary["genres"]) > 5:
+                genres += f" and {len(summary['genres']) - 5} more"
+            features = summary["features"]
+            means = "  ".join(f"{name} {features[name]:.2f}" for name in ("Danceability", "Energy", "Valence")
+                              if features[name] is not None)
+            if features["Tempo"] is not None:
+                means += f"  Tempo {features['Tempo']:.0f} BPM"
+            self.playlist_summary_label.config(
+                text=f"{summary['tracks']} tracks, {self.format_duration(summary['duration_ms'])} total\n"
+                     f"Genres: {genres}\nAverage: {means}")
+        self.playlist_tracks_grid.load(self.keyset_source(self.tab_playlist_view, Backend.iter_playlist_entries, pname))
 
     # Tab 5: Artist from TrackName
     def create_artist_from_track_tab(self):
@@ -225,7 +449,10 @@ class MusicDBApp:
         if not tname:
             messagebox.showwarning("Input Error", "Please enter Track Name.")
             return
-        result = Backend.find_artist_by_track_name(tname)
+        self.run_in_background(self.tab_artist_from_track, Backend.find_artist_by_track_name, tname,
+                               on_done=self.render_artist_from_track)
+
+    def render_artist_from_track(self, result):
         if result:
             self.artist_result_label.config(text=f"Artist: {result}")
         else:
@@ -234,27 +461,22 @@ class MusicDBApp:
     # Tab 6: Tracks per Genre (Stats)
     def create_track_stats_tab(self):
         ttk.Button(self.tab_track_stats, text="Show Tracks per Genre", command=self.show_tracks_per_genre).pack(pady=10)
-        self.genre_text = tk.Text(self.tab_track_stats, width=80, height=25)
-        self.genre_text.pack(pady=10)
+        self.genre_grid = ResultGrid(self.tab_track_stats, ("Genre", "Tracks"))
+        self.genre_grid.pack(fill="both", expand=True, padx=10, pady=10)
 
     def show_tracks_per_genre(self):
-        results = Backend.tracks_per_genre()
-        self.genre_text.delete("1.0", tk.END)
-        for genre, count in results:
-            self.genre_text.insert(tk.END, f"{genre}: {count}\n")
+        self.genre_grid.load(self.keyset_source(self.tab_track_stats, Backend.iter_tracks_per_genre))
 
     # Tab 7: Artists with Album & Track
     def create_artist_album_track_tab(self):
         ttk.Button(self.tab_artist_album_track, text="Show Artists w/ Album & Track",
                    command=self.show_artists_album_track).pack(pady=10)
-        self.artist_album_track_text = tk.Text(self.tab_artist_album_track, width=80, height=25)
-        self.artist_album_track_text.pack(pady=10)
+        self.artist_album_track_grid = ResultGrid(self.tab_artist_album_track, ("Artist ID", "Artist"))
+        self.artist_album_track_grid.pack(fill="both", expand=True, padx=10, pady=10)
 
     def show_artists_album_track(self):
-        results = Backend.artists_with_album_and_track()
-        self.artist_album_track_text.delete("1.0", tk.END)
-        for r in results:
-            self.artist_album_track_text.insert(tk.END, f"{r}\n")
+        self.artist_album_track_grid.load(
+            self.keyset_source(self.tab_artist_album_track, Backend.iter_artists_with_album_and_track))
 
     # Tab 8: Playlists by CreatedDate
     def create_playlist_by_date_tab(self):
@@ -264,15 +486,13 @@ class MusicDBApp:
         ttk.Button(self.tab_playlist_by_date, text="Show Playlists", command=self.show_playlists_by_date).grid(row=1,
                                                                                                                column=1,
                                                                                                                pady=10)
-        self.playlist_date_text = tk.Text(self.tab_playlist_by_date, width=80, height=25)
-        self.playlist_date_text.grid(row=2, column=0, columnspan=2, pady=10)
+        self.playlist_date_grid = ResultGrid(self.tab_playlist_by_date, ("Playlist ID", "Playlist", "Created"))
+        self.playlist_date_grid.grid(row=2, column=0, columnspan=2, pady=10, sticky="nsew")
 
     def show_playlists_by_date(self):
         date = self.created_date_entry.get().strip()
-        results = Backend.get_playlists_after_date(date)
-        self.playlist_date_text.delete("1.0", tk.END)
-        for name, created in results:
-            self.playlist_date_text.insert(tk.END, f"{name} ({created})\n")
+        self.playlist_date_grid.load(
+            self.keyset_source(self.tab_playlist_by_date, Backend.iter_playlists_after_date, date))
 
     # Tab 9: Artist with Most Tracks
     def create_top_artist_tab(self):
@@ -281,7 +501,9 @@ class MusicDBApp:
         self.top_artist_text.pack(pady=10)
 
     def show_top_artist(self):
-        result = Backend.top_artist()
+        self.run_in_background(self.tab_top_artist, Backend.top_artist, on_done=self.render_top_artist)
+
+    def render_top_artist(self, result):
         self.top_artist_text.delete("1.0", tk.END)
         if result:
             self.top_artist_text.insert(tk.END, f"Top Artist: {result}")
@@ -290,16 +512,27 @@ class MusicDBApp:
 
     # Tab 10: Duplicate Tracks
     def create_duplicate_tracks_tab(self):
-        ttk.Button(self.tab_duplicate_tracks, text="Find Duplicate Tracks", command=self.show_duplicate_tracks).pack(
-            pady=10)
-        self.duplicate_text = tk.Text(self.tab_duplicate_tracks, width=80, height=25)
-        self.duplicate_text.pack(pady=10)
+        controls = ttk.Frame(self.tab_duplicate_tracks)
+        controls.pack(pady=10)
+        ttk.Button(controls, text="Find Duplicate Tracks", command=self.show_duplicate_tracks).pack(side="left")
+        self.duplicate_by_artist = tk.BooleanVar(value=False)
+        ttk.Checkbutton(controls, text="Same artist only", variable=self.duplicate_by_artist).pack(side="left", padx=10)
+        self.duplicate_grid = ResultGrid(self.tab_duplicate_tracks, ("Track", "Duration", "Copies", "Track IDs"))
+        self.duplicate_grid.pack(fill="both", expand=True, padx=10, pady=10)
 
     def show_duplicate_tracks(self):
-        results = Backend.find_duplicate_tracks()
-        self.duplicate_text.delete("1.0", tk.END)
-        for name, duration in results:
-            self.duplicate_text.insert(tk.END, f"{name} ({duration} ms)\n")
+        by_artist = self.duplicate_by_artist.get()
+        self.run_in_background(self.tab_duplicate_tracks, lambda: Backend.find_duplicate_clusters(by_artist=by_artist),
+                               on_done=self.render_duplicate_clusters)
+
+    def render_duplicate_clusters(self, clusters):
+        rows = []
+        for name, _artist_id, shortest, longest, track_ids in clusters:
+            duration = self.format_duration(shortest)
+            if self.format_duration(longest) != duration:
+                duration += " - " + self.format_duration(longest)
+            rows.append((name, duration, len(track_ids), ", ".join(track_ids)))
+        self.duplicate_grid.set_rows(rows)
 
     # Tab 11: Nested Query Artist (Tracks not in playlist)
     def create_nested_query_tab(self):
@@ -309,65 +542,163 @@ class MusicDBApp:
 
         ttk.Button(self.tab_nested_query, text="Find Artists w/ Tracks of entered genre Not in Playlist", command=self.show_nested_artists).grid(row=1, column=1, pady=10)
 
-        self.nested_text = tk.Text(self.tab_nested_query, width=80, height=25)
-        self.nested_text.grid(row=2, column=1, pady=10)
+        self.nested_grid = ResultGrid(self.tab_nested_query, ("Artist", "Track"))
+        self.nested_grid.grid(row=2, column=1, pady=10, sticky="nsew")
 
     def show_nested_artists(self):
         gname = self.nested_query_entry.get()
         if not gname:
             messagebox.showwarning("Input Error", "Please enter Genre")
             return
-        results = Backend.nested_artists_not_in_playlist(gname)
-
-        artists = {}
-
-        for artist, track in results:
-            artists.setdefault(artist, []).append(track)
-
-        self.nested_text.delete("1.0", tk.END)
-        for artist, tracks in artists.items():
-            self.nested_text.insert(tk.END, f"{artist}:\n")
-            for track in tracks:
-                self.nested_text.insert(tk.END, f"  - {track}\n")
-            self.nested_text.insert(tk.END, "")
+        self.nested_grid.load(self.keyset_source(self.tab_nested_query, Backend.iter_nested_artists_not_in_playlist,
+                                                 gname, key=lambda row: row[:2]))
 
     # Tab 12: Average Track Duration
     def create_avg_duration_tab(self):
         ttk.Button(self.tab_avg_duration, text="Show Artists Above Avg Duration", command=self.show_avg_duration).pack(
             pady=10)
-        self.avg_text = tk.Text(self.tab_avg_duration, width=80, height=25)
-        self.avg_text.pack(pady=10)
+        self.avg_grid = ResultGrid(self.tab_avg_duration, ("Artist ID", "Artist", "Average Duration"),
+                                   formatters={2: self.format_duration})
+        self.avg_grid.pack(fill="both", expand=True, padx=10, pady=10)
 
     def show_avg_duration(self):
-        results = Backend.artists_above_avg_duration()
-        self.avg_text.delete("1.0", tk.END)
+        self.avg_grid.load(self.keyset_source(self.tab_avg_duration, Backend.iter_artists_above_avg_duration))
 
-        for name, avg_duration in results:
-            minutes = int(avg_duration // 60000)
-            seconds = int((avg_duration % 60000) // 1000)
-
-            self.avg_text.insert(tk.END, f"{name} - Average Duration: {minutes}:{seconds:02d}\n")
+    @staticmethod
+    def format_duration(duration_ms):
+        minutes = int(duration_ms // 60000)
+        seconds = int((duration_ms % 60000) // 1000)
+        return f"{minutes}:{seconds:02d}"
 
     # Tab 13: Delete Track
     def create_delete_track_tab(self):
-        ttk.Label(self.tab_delete_track, text="Track ID:").grid(row=0, column=0, padx=5, pady=5)
-        self.del_track_entry = ttk.Entry(self.tab_delete_track, width=30)
+        ttk.Label(self.tab_delete_track, text="Track ID(s):").grid(row=0, column=0, padx=5, pady=5)
+        self.del_track_entry = ttk.Entry(self.tab_delete_track, width=50)
         self.del_track_entry.grid(row=0, column=1, padx=5, pady=5)
         ttk.Button(self.tab_delete_track, text="Delete Track", command=self.delete_track).grid(row=1, column=1, pady=10)
 
+        # Batch delete: every track matching all the filled-in criteria
+        ttk.Label(self.tab_delete_track, text="Delete all tracks matching").grid(row=2, column=0, columnspan=2, pady=10)
+        self.del_criteria = {}
+        for row, (key, label) in enumerate([("genre", "Genre:"), ("album_id", "Album ID:"),
+                                            ("max_popularity", "Popularity below:")], start=3):
+            ttk.Label(self.tab_delete_track, text=label).grid(row=row, column=0, padx=5, pady=5)
+            entry = ttk.Entry(self.tab_delete_track, width=30)
+            entry.grid(row=row, column=1, padx=5, pady=5, sticky="w")
+            self.del_criteria[key] = entry
+        self.del_gc_orphans = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.tab_delete_track, text="Also remove albums and artists left without tracks",
+                        variable=self.del_gc_orphans).grid(row=6, column=1, sticky="w")
+        ttk.Button(self.tab_delete_track, text="Delete Matching Tracks",
+                   command=self.delete_matching_tracks).grid(row=7, column=1, pady=10)
+
     def delete_track(self):
-        tid = self.del_track_entry.get().strip()
-        if not tid:
+        track_ids = self.del_track_entry.get().replace(",", " ").split()
+        if not track_ids:
             messagebox.showwarning("Input Error", "Please enter Track ID.")
             return
-        Backend.delete_track_by_id(tid)
-        messagebox.showinfo("Success", f"Track {tid} deleted.")
+        self.run_write_in_background((self.tab_delete_track, "delete"), Backend.delete_tracks, track_ids,
+                                     on_done=self.tracks_deleted)
+
+    def delete_matching_tracks(self):
+        criteria = {key: entry.get().strip() for key, entry in self.del_criteria.items()}
+        criteria = {key: value for key, value in criteria.items() if value}
+        if not criteria:
+            messagebox.showwarning("Input Error", "Please fill in at least one criterion.")
+            return
+        try:
+            for key in ("album_id", "max_popularity"):
+                if key in criteria:
+                    criteria[key] = int(criteria[key])
+        except ValueError:
+            messagebox.showwarning("Input Error", "Album ID and popularity must be numbers.")
+            return
+        described = ", ".join(f"{key} = {value}" for key, value in criteria.items())
+        if not messagebox.askyesno("Confirm Delete", f"Delete every track with {described}?"):
+            return
+        gc_orphans = self.del_gc_orphans.get()
+        self.run_write_in_background((self.tab_delete_track, "delete"),
+                                     lambda: Backend.delete_tracks(gc_orphans=gc_orphans, **criteria),
+                                     on_done=self.tracks_deleted)
+
+    def tracks_deleted(self, counts):
+        self.refresh_track_dropdown()
+        message = f"Deleted {counts['tracks']} track(s), {counts['playlist_entries']} playlist entries."
+        if counts["albums"] or counts["artists"]:
+            message += f" Removed {counts['albums']} orphaned album(s) and {counts['artists']} artist(s)."
+        messagebox.showinfo("Success", message)
+
+    # Hidden tab: Diagnostics (query metrics and cache statistics)
+    def show_diagnostics_tab(self):
+        if self.tab_diagnostics is None:
+            Metrics.enable()
+            self.tab_diagnostics = ttk.Frame(self.tab_control)
+            self.tab_control.add(self.tab_diagnostics, text="Diagnostics")
+            controls = ttk.Frame(self.tab_diagnostics)
+            controls.pack(pady=10)
+            ttk.Button(controls, text="Refresh", command=self.show_diagnostics).pack(side="left", padx=5)
+            ttk.Button(controls, text="Reset", command=self.reset_diagnostics).pack(side="left", padx=5)
+            ttk.Button(controls, text="Save...", command=self.save_diagnostics).pack(side="left", padx=5)
+            self.diagnostics_text = tk.Text(self.tab_diagnostics, wrap="none", font="TkFixedFont")
+            self.diagnostics_text.pack(fill="both", expand=True, padx=10, pady=10)
+        self.tab_control.select(self.tab_diagnostics)
+        self.show_diagnostics()
+
+    def show_diagnostics(self):
+        lines = [Metrics.report(), "", f"{'Cache':<38}{'size':>8}{'hits':>10}{'misses':>10}{'hit rate':>10}"]
+        for name, s in Cache.stats().items():
+            lines.append(f"{name:<38}{s['size']:>8}{s['hits']:>10}{s['misses']:>10}{s['hit_rate']:>10.0%}")
+        self.diagnostics_text.delete("1.0", tk.END)
+        self.diagnostics_text.insert(tk.END, "\n".join(lines))
+
+    def reset_diagnostics(self):
+        Metrics.reset()
+        Cache.reset_stats()
+        self.show_diagnostics()
+
+    def save_diagnostics(self):
+        path = filedialog.asksaveasfilename(initialfile="metrics.json", filetypes=[("JSON", "*.json")])
+        if path:
+            Metrics.dump(path)
 
 
 # ----------------------------
 # Run the App
 # ----------------------------
-if __name__ == "__main__":
+
+# Open the window and, with startup_time, print how long the first paint
+# and the first database-backed widget took (ms since this module started
+# loading) as JSON, then close.
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Music database GUI.")
+    parser.add_argument("--db", help="database file (default music.db)")
+    parser.add_argument("--eager", action="store_true", help="build every tab at startup")
+    parser.add_argument("--startup-time", action="store_true", help="print startup timings as JSON and exit")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        import Database
+        Database.configure(args.db)
     root = tk.Tk()
-    app = MusicDBApp(root)
+    app = MusicDBApp(root, lazy=not args.eager)
+    if args.startup_time:
+        timings = {"lazy": not args.eager}
+
+        def mark(name):
+            if "tracks" in timings:
+                return
+            timings.setdefault(name, (time.perf_counter() - _MODULE_START) * 1000)
+            if "first_paint_ms" in timings and "playlists_loaded_ms" in timings:
+                import json
+                timings["tracks"] = sum(count for _genre, count in Backend.tracks_per_genre())
+                print(json.dumps(timings), flush=True)
+                app.close()
+
+        root.bind("<Expose>", lambda _event: mark("first_paint_ms"), add="+")
+        app.on_playlists_loaded = lambda _names: mark("playlists_loaded_ms")
     root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
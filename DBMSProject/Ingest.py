@@ -0,0 +1,519 @@
+# Ingest.py
+# Loads Spotify-style CSVs into music.db in bounded chunks.
+#
+#   python Ingest.py dataset.csv [--db music.db] [--chunksize 50000]
+#   python Ingest.py weekly_delta.csv --mode incremental
+#   python Ingest.py shards/ [--workers 8]        every *.csv in a directory
+#   python Ingest.py "regions/*.csv"              or matching a glob
+#
+# "full" mode replaces the catalog rows. "incremental" mode upserts only
+# tracks whose content hash changed and keeps existing Artist/Album IDs.
+#
+# Several files are parsed and normalized in a pool of worker processes,
+# one chunk per task, while this process stays the only writer: it takes
+# the prepared batches in file and chunk order and gives out Artist/Album
+# IDs as it writes them, so the result is the same as loading the files
+# one after another, whatever the number of workers.
+import argparse
+import csv
+import glob
+import io
+import os
+import sys
+import time
+from collections import deque
+
+import Cache
+import Database
+import Dedup
+import Migrations
+import PlaylistStats
+import Search
+import Stats
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# CSV column -> Track column
+TRACK_COLUMNS = {
+    'track_id': 'TrackID',
+    'track_name': 'Name',
+    'duration_ms': 'DurationMs',
+    'explicit': 'Explicit',
+    'popularity': 'Popularity',
+    'danceability': 'Danceability',
+    'energy': 'Energy',
+    'key': 'Key',
+    'loudness': 'Loudness',
+    'mode': 'Mode',
+    'speechiness': 'Speechiness',
+    'acousticness': 'Acousticness',
+    'instrumentalness': 'Instrumentalness',
+    'liveness': 'Liveness',
+    'valence': 'Valence',
+    'tempo': 'Tempo',
+    'time_signature': 'TimeSignature',
+    'track_genre': 'Genre',
+}
+
+CSV_COLUMNS = list(TRACK_COLUMNS) + ['artists', 'album_name']
+
+TEXT_COLUMNS = {'track_id', 'track_name', 'track_genre', 'artists', 'album_name'}
+
+# pd.read_csv options for every reader. Text columns are read as str even
+# when a chunk only holds numeric-looking values (an album called "1989"),
+# so names match the ones stored by earlier loads and rows hash the same
+# whichever chunk they fall in.
+READ_CSV_OPTIONS = {
+    "usecols": lambda c: c in CSV_COLUMNS,
+    "dtype": {c: str for c in TEXT_COLUMNS},
+}
+
+# Track table columns in table order
+TRACK_FIELDS = ['TrackID', 'Name', 'AlbumID'] + list(TRACK_COLUMNS.values())[2:]
+
+DEFAULT_CHUNKSIZE = 50000
+
+# Settings for a one-off full load: no rollback journal to maintain and no
+# fsync until the final commit. They take the database away from WAL and
+# lock out every other connection, so incremental loads, which run against
+# a catalog the GUI or Server.py may have open, keep Database.PRAGMAS.
+BULK_PRAGMAS = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+    "cache_size": -256000,
+    "temp_store": "MEMORY",
+    "locking_mode": "EXCLUSIVE",
+}
+
+MODES = ("full", "incremental")
+
+# Later rows for the same TrackID win, both within a file and across loads
+TRACK_UPSERT = (
+    f"INSERT INTO Track ({', '.join(TRACK_FIELDS)}) "
+    f"VALUES ({', '.join('?' * len(TRACK_FIELDS))}) "
+    f"ON CONFLICT (TrackID) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in TRACK_FIELDS[1:])
+)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# pandas (and with it NumPy) is imported by the functions that use it, so
+# importing this module or running --help stays fast
+def read_chunks(csv_path, chunksize=DEFAULT_CHUNKSIZE):
+    import pandas as pd
+    reader = pd.read_csv(csv_path, chunksize=chunksize, **READ_CSV_OPTIONS)
+    for chunk in reader:
+        yield _clean(chunk)
+
+
+# Fill missing artist names with "Unknown Artist"
+def _clean(chunk):
+    return chunk.fillna({"artists": "Unknown Artist"})
+
+
+# Name -> ID map for Artist or Album. It only grows with the number of
+# distinct names, never with the number of rows.
+class NameIds:
+    def __init__(self, conn, table, id_column, load_existing=False):
+        self.table = table
+        self.id_column = id_column
+        self.ids = {}
+        if load_existing:
+            self.ids = dict(conn.execute(f"SELECT Name, {id_column} FROM {table}"))
+        row = conn.execute(f"SELECT MAX({id_column}) FROM {table}").fetchone()
+        self.next_id = (row[0] or 0) + 1
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Give IDs to names not seen yet, in the order given, and insert them
+    def assign(self, conn, names):
+        rows = []
+        for name in names:
+            if name is not None and name not in self.ids:
+                self.ids[name] = self.next_id
+                rows.append((self.next_id, name))
+                self.next_id += 1
+        if rows:
+            conn.executemany(f"INSERT INTO {self.table} ({self.id_column}, Name) VALUES (?, ?)", rows)
+
+
+# 64-bit hash per row over every column we load. Column dtypes are pinned
+# first so the same row hashes the same whatever pandas inferred for the
+# rest of its chunk (e.g. int vs float when a chunk has missing values).
+def row_hashes(chunk):
+    import pandas as pd
+    frame = chunk[CSV_COLUMNS].astype(
+        {c: (object if c in TEXT_COLUMNS else 'float64') for c in CSV_COLUMNS}
+    )
+    return pd.util.hash_pandas_object(frame, index=False).values.view('int64')
+
+
+# One chunk parsed and normalized into plain rows, so it can be prepared in
+# a worker process and sent to the writer. tracks are Track rows in
+# TRACK_FIELDS order with the album name where AlbumID goes; hashes and
+# artists (the artist name, or None) line up with them.
+class Batch:
+    def __init__(self, rows, tracks, hashes, artists):
+        self.rows = rows
+        self.tracks = tracks
+        self.hashes = hashes
+        self.artists = artists
+
+
+def _names(column):
+    return column.astype(object).where(column.notna(), None)
+
+
+def prepare_chunk(chunk, incremental=False):
+    rows = len(chunk)
+    if incremental:
+        chunk = chunk.drop_duplicates('track_id', keep='last')
+    hashes = row_hashes(chunk)
+    tracks = chunk.rename(columns=TRACK_COLUMNS)
+    tracks['TrackID'] = _names(chunk['track_id'])
+    tracks['AlbumID'] = _names(chunk['album_name'])
+    return Batch(
+        rows,
+        list(tracks[TRACK_FIELDS].itertuples(index=False, name=None)),
+        hashes.tolist(),
+        _names(chunk['artists']).tolist(),
+    )
+
+
+# Keep only rows whose hash differs from the stored one (or that are new).
+# A TrackID repeated in different chunks of the same file is written once
+# per differing copy, with the last copy winning as in a full load.
+def changed_rows(conn, batch):
+    conn.execute("DELETE FROM temp.Incoming")
+    conn.executemany(
+        "INSERT OR REPLACE INTO temp.Incoming (TrackID, Hash) VALUES (?, ?)",
+        zip((t[0] for t in batch.tracks), batch.hashes),
+    )
+    changed = {r[0] for r in conn.execute("""
+        SELECT i.TrackID FROM temp.Incoming i
+        LEFT JOIN TrackHash h ON h.TrackID = i.TrackID
+        WHERE h.Hash IS NULL OR h.Hash <> i.Hash
+    """)}
+    keep = [i for i, track in enumerate(batch.tracks) if track[0] in changed]
+    return Batch(batch.rows, [batch.tracks[i] for i in keep], [batch.hashes[i] for i in keep],
+                 [batch.artists[i] for i in keep])
+
+
+# Write a prepared batch. Artist and album IDs are given here, on the one
+# writer, in row order, so they do not depend on which worker prepared what.
+def write_batch(conn, batch, artists, albums, incremental=False):
+    if incremental:
+        batch = changed_rows(conn, batch)
+        if not batch.tracks:
+            return 0
+        # A changed track may have changed artists; relink it from scratch
+        conn.executemany(
+            "DELETE FROM ArtistTrack WHERE TrackID = ?",
+            dict.fromkeys((t[0],) for t in batch.tracks if t[0] is not None),
+        )
+
+    artists.assign(conn, batch.artists)
+    albums.assign(conn, (t[2] for t in batch.tracks))
+    artist_map = artists.ids
+    album_map = albums.ids
+
+    conn.executemany(
+        TRACK_UPSERT,
+        (t[:2] + (album_map.get(t[2]),) + t[3:] for t in batch.tracks),
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO TrackHash (TrackID, Hash) VALUES (?, ?)",
+        zip((t[0] for t in batch.tracks), batch.hashes),
+    )
+
+    # Skip rows with missing critical info, as before
+    links = [
+        (artist_map[artist], t[0], album_map[t[2]])
+        for t, artist in zip(batch.tracks, batch.artists)
+        if artist is not None and t[0] is not None and t[2] is not None
+    ]
+    conn.executemany(
+        "INSERT OR IGNORE INTO ArtistTrack (ArtistID, TrackID) VALUES (?, ?)",
+        dict.fromkeys((artist_id, track_id) for artist_id, track_id, _album_id in links),
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO ArtistAlbum (ArtistID, AlbumID) VALUES (?, ?)",
+        dict.fromkeys((artist_id, album_id) for artist_id, _track_id, album_id in links),
+    )
+    return len(batch.tracks)
+
+
+def write_chunk(conn, chunk, artists, albums, incremental=False):
+    return write_batch(conn, prepare_chunk(chunk, incremental), artists, albums, incremental)
+
+
+# The CSV files named by source: a file, a directory (its *.csv files) or
+# a glob pattern, in name order
+def source_files(source):
+    if os.path.isdir(source):
+        files = sorted(glob.glob(os.path.join(source, "*.csv")))
+    elif any(c in source for c in "*?["):
+        files = sorted(glob.glob(source))
+    else:
+        return [source]
+    if not files:
+        raise ValueError(f"No CSV files in {source!r}")
+    return files
+
+
+# Items of iterator, each with the seconds it took to produce
+def _timed(iterator):
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        yield item, time.perf_counter() - start
+
+
+# Offset just past the first line end at or after offset that is outside
+# a quoted field (quoted: whether offset itself is inside one), or None at
+# the end of the file. A quote toggles the state; an escaped "" toggles it
+# twice.
+def _next_row(f, offset, quoted):
+    f.seek(offset)
+    while True:
+        piece = f.read(1 << 16)
+        if not piece:
+            return None
+        i = 0
+        while True:
+            end = piece.find(b"\n", i)
+            if end < 0:
+                quoted ^= piece.count(b'"', i) & 1
+                break
+            quoted ^= piece.count(b'"', i, end) & 1
+            if not quoted:
+                return offset + end + 1
+            i = end + 1
+        offset += len(piece)
+
+
+# Split a file into (start, end) byte ranges of about chunksize data rows
+# each, cut only between rows, so workers can parse one chunk apiece
+# without reading the file up to it. Returns the header columns and a
+# generator of ranges; the file is scanned as the ranges are taken.
+def chunk_ranges(csv_path, chunksize=DEFAULT_CHUNKSIZE):
+    with open(csv_path, "rb") as f:
+        header = f.readline()
+        # Estimate the bytes per row from the first rows
+        sample = f.read(1 << 20)
+    columns = next(csv.reader([header.decode("utf-8-sig")]))
+    step = max(1, len(sample) // max(1, sample.count(b"\n")) * chunksize)
+
+    def ranges():
+        size = os.path.getsize(csv_path)
+        start = len(header)
+        with open(csv_path, "rb") as f:
+            while start < size:
+                # Quote parity between start and start + step, read in
+                # blocks so the scan holds at most one block
+                quoted = 0
+                f.seek(start)
+                remaining = step
+                while remaining > 0:
+                    block = f.read(min(remaining, 1 << 24))
+                    if not block:
+                        break
+                    quoted ^= block.count(b'"') & 1
+                    remaining -= len(block)
+                end = _next_row(f, start + step, quoted) if start + step < size else None
+                if end is None or end >= size:
+                    yield start, size
+                    return
+                yield start, end
+                start = end
+
+    return columns, ranges()
+
+
+# Parse and prepare the rows in one byte range of a file: Batch, parse
+# seconds, normalize seconds. Runs in the worker processes.
+def prepare_range(csv_path, start, end, columns, incremental=False):
+    import pandas as pd
+    began = time.perf_counter()
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    chunk = _clean(pd.read_csv(io.BytesIO(data), header=None, names=columns, **READ_CSV_OPTIONS))
+    del data
+    parsed = time.perf_counter()
+    batch = prepare_chunk(chunk, incremental)
+    return batch, parsed - began, time.perf_counter() - parsed
+
+
+# Prepared batches of every file, in file and chunk order. With more than
+# one worker each chunk is prepared in a process pool, at most two chunks
+# per worker ahead of the writer, so memory stays bounded by chunksize
+# however large the files are.
+def prepared_batches(files, chunksize, incremental, workers, stages):
+    if workers <= 1:
+        for csv_path in files:
+            for chunk, seconds in _timed(read_chunks(csv_path, chunksize)):
+                stages["parse"] += seconds
+                start = time.perf_counter()
+                batch = prepare_chunk(chunk, incremental)
+                stages["normalize"] += time.perf_counter() - start
+                yield batch
+        return
+
+    def tasks():
+        for csv_path in files:
+            columns, ranges = chunk_ranges(csv_path, chunksize)
+            for start, end in ranges:
+                yield csv_path, start, end, columns
+
+    from concurrent.futures import ProcessPoolExecutor
+    pool = ProcessPoolExecutor(workers)
+    try:
+        queued = tasks()
+        pending = deque()
+        for task in queued:
+            pending.append(pool.submit(prepare_range, *task, incremental))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            batch, parse, normalize = pending.popleft().result()
+            task = next(queued, None)
+            if task is not None:
+                pending.append(pool.submit(prepare_range, *task, incremental))
+            stages["parse"] += parse
+            stages["normalize"] += normalize
+            yield batch
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+# Load source (a CSV file, a directory of them or a glob; see source_files)
+# into the catalog tables. In "full" mode the catalog rows are replaced
+# (table definitions are kept); in "incremental" mode only new or changed
+# tracks are written. With several files and workers > 1 the files are
+# parsed in that many processes. Returns a dict of load statistics,
+# including seconds per stage: parse and normalize (summed over the
+# workers, so with several they can add up to more than the wall clock),
+# write, and finish (summary tables, search index and snapshot).
+def ingest(source, db_path=None, chunksize=DEFAULT_CHUNKSIZE, mode="full", progress=None, workers=1):
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, not {mode!r}")
+    incremental = mode == "incremental"
+
+    files = source_files(source)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files)))
+    stages = dict.fromkeys(("parse", "normalize", "write", "finish"), 0.0)
+
+    start = time.perf_counter()
+    conn = Database.connect(db_path, pragmas=None if incremental else BULK_PRAGMAS)
+    rows = 0
+    written = 0
+    try:
+        Migrations.migrate(conn)
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS Incoming (TrackID TEXT PRIMARY KEY, Hash INTEGER)")
+        # Take the write lock up front; readers carry on under WAL
+        conn.execute("BEGIN IMMEDIATE" if incremental else "BEGIN")
+        if not incremental:
+            Search.drop_triggers(conn)
+            Stats.drop_triggers(conn)
+            Dedup.drop_triggers(conn)
+            PlaylistStats.drop_triggers(conn)
+            for table in ("ArtistTrack", "ArtistAlbum", "TrackHash", "Track", "Album", "Artist"):
+                conn.execute(f"DELETE FROM {table}")
+            conn.execute("DELETE FROM sqlite_sequence WHERE name IN ('Artist', 'Album')")
+
+        artists = NameIds(conn, "Artist", "ArtistID", load_existing=incremental)
+        albums = NameIds(conn, "Album", "AlbumID", load_existing=incremental)
+        for batch in prepared_batches(files, chunksize, incremental, workers, stages):
+            write_start = time.perf_counter()
+            written += write_batch(conn, batch, artists, albums, incremental)
+            stages["write"] += time.perf_counter() - write_start
+            rows += batch.rows
+            if progress:
+                progress(rows, time.perf_counter() - start)
+        finish_start = time.perf_counter()
+        if not incremental:
+            Search.rebuild(conn)
+            Search.create_triggers(conn)
+            Stats.refresh(conn)
+            Stats.create_triggers(conn)
+            Dedup.reset(conn)
+            Dedup.create_triggers(conn)
+            PlaylistStats.refresh(conn)
+            PlaylistStats.create_triggers(conn)
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    import Similarity
+    import Snapshot
+    # Audio features may have changed without the track count changing
+    Similarity.invalidate(db_path)
+    Snapshot.write(db_path)
+    Cache.invalidate_all()
+    stages["finish"] = time.perf_counter() - finish_start
+
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "files": len(files),
+        "workers": workers,
+        "rows": rows,
+        "written": written,
+        "skipped": rows - written,
+        "artists": len(artists),
+        "albums": len(albums),
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load a Spotify CSV into the music database.")
+    parser.add_argument("csv", nargs="?", default="dataset.csv", help="a CSV file, a directory of them or a glob")
+    parser.add_argument("--db", default=Database.DB_PATH)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--mode", choices=MODES, default="full")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="processes parsing files in parallel (default: one per core)")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    def progress(rows, elapsed):
+        print(f"  {rows} rows  {rows / elapsed:,.0f} rows/sec", flush=True)
+
+    stats = ingest(args.csv, args.db, args.chunksize, args.mode, None if args.quiet else progress, args.workers)
+    rss = stats["peak_rss_mb"]
+    print(
+        f"Loaded {stats['rows']} rows, wrote {stats['written']}, skipped {stats['skipped']} unchanged "
+        f"({stats['artists']} artists, {stats['albums']} albums) "
+        f"in {stats['seconds']:.1f}s: {stats['rows_per_sec']:,.0f} rows/sec"
+        + (f", peak RSS {rss:.0f} MB" if rss is not None else "")
+    )
+    print(f"{stats['files']} file(s), {stats['workers']} worker(s); "
+          + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in stats["stages"].items()))
+    print("CSV loaded and normalized into SQLite database successfully!")
+    return stats
+
+
+if __name__ == "__main__":
+    main()
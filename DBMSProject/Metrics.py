@@ -0,0 +1,226 @@
+# Metrics.py
+# Query instrumentation for Backend. When enabled, every statement that goes
+# through Backend._run / _stream is timed and counted against the Backend
+# function that issued it, along with the rows it returned; functions that
+# bypass _run are timed whole with @timed. Database adds the time spent
+# opening connections and committing. Statements slower than SLOW_MS are
+# logged with their EXPLAIN QUERY PLAN. Disabled (the default), the only
+# cost is one flag check per call.
+#
+# Enable with enable() or by setting MUSICDB_METRICS (to 1, or to a slow
+# query threshold in ms). With MUSICDB_METRICS_DUMP=<file> the stats are
+# written there as JSON when the process exits.
+#
+#   python Metrics.py metrics.json      print a saved dump
+import argparse
+import atexit
+import bisect
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+log = logging.getLogger(__name__)
+
+ENABLED = False
+SLOW_MS = 100.0
+SLOW_LOG_SIZE = 100
+
+# Histogram bucket upper bounds in ms: 5 us to ~90 s, 25% apart
+BUCKETS = [0.005 * 1.25 ** i for i in range(76)]
+
+_lock = threading.Lock()
+_functions = {}
+_database = {}
+_slow = deque(maxlen=SLOW_LOG_SIZE)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def add(self, ms, rows=0):
+        self.counts[bisect.bisect_left(BUCKETS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.rows += rows
+        if ms > self.max:
+            self.max = ms
+
+    # Upper bound of the bucket holding the q-th quantile (never above max)
+    def percentile(self, q):
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return 0.0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "rows": self.rows,
+            "total_ms": self.total,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max,
+        }
+
+
+def enable(slow_ms=None):
+    global ENABLED, SLOW_MS
+    if slow_ms is not None:
+        SLOW_MS = float(slow_ms)
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    with _lock:
+        _functions.clear()
+        _database.clear()
+        _slow.clear()
+
+
+def _add(table, name, ms, rows=0):
+    with _lock:
+        histogram = table.get(name)
+        if histogram is None:
+            histogram = table[name] = Histogram()
+        histogram.add(ms, rows)
+
+
+# Name of the function that called the function calling this
+def caller():
+    return sys._getframe(2).f_code.co_name
+
+
+# Record one statement issued by function: ms spent executing it and the
+# rows it returned
+def record_query(function, conn, query, params, ms, rows):
+    _add(_functions, function, ms, rows)
+    if ms >= SLOW_MS:
+        _log_slow(conn, function, query, params, ms, rows)
+
+
+# Decorator for Backend functions that run their SQL through other modules
+# or straight on a connection rather than via _run: times the whole call
+def timed(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        ms = (time.perf_counter() - start) * 1000
+        rows = len(result) if isinstance(result, (list, tuple)) else 0
+        _add(_functions, fn.__name__, ms, rows)
+        if ms >= SLOW_MS:
+            _log_slow(None, fn.__name__, None, (args, kwargs), ms, rows)
+        return result
+
+    return wrapper
+
+
+# Record a connection-level event such as "connect" or "commit"
+def record(name, start):
+    _add(_database, name, (time.perf_counter() - start) * 1000)
+
+
+def _log_slow(conn, function, query, params, ms, rows):
+    plan = []
+    if query is not None:
+        try:
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+        except (sqlite3.Error, ValueError):
+            # executemany parameter lists, or a statement EXPLAIN can't take
+            pass
+    sql = " ".join(query.split()) if query is not None else "(whole call)"
+    entry = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "function": function,
+        "ms": ms,
+        "rows": rows,
+        "sql": sql,
+        "params": repr(params)[:200],
+        "plan": plan,
+    }
+    with _lock:
+        _slow.append(entry)
+    log.warning("slow query in %s: %.1f ms, %d rows: %s\n  %s", function, ms, rows, sql, "\n  ".join(plan))
+
+
+# Everything recorded so far, as plain data
+def snapshot():
+    with _lock:
+        return {
+            "enabled": ENABLED,
+            "slow_ms": SLOW_MS,
+            "functions": {name: h.summary() for name, h in sorted(_functions.items())},
+            "database": {name: h.summary() for name, h in sorted(_database.items())},
+            "slow_queries": list(_slow),
+        }
+
+
+def dump(path):
+    with open(path, "w") as f:
+        json.dump(snapshot(), f, indent=2)
+
+
+# Text table of a snapshot, slowest total time first
+def report(data=None):
+    data = data or snapshot()
+    lines = [f"{'':<38}{'calls':>8}{'rows':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'total ms':>11}"]
+    for section in ("functions", "database"):
+        items = sorted(data[section].items(), key=lambda item: -item[1]["total_ms"])
+        for name, s in items:
+            lines.append(f"{name:<38}{s['count']:>8}{s['rows']:>10}{s['p50_ms']:>10.3f}"
+                         f"{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}{s['total_ms']:>11.1f}")
+        lines.append("")
+    lines.append(f"Slow queries (>= {data['slow_ms']:g} ms): {len(data['slow_queries'])}")
+    for entry in reversed(data["slow_queries"]):
+        lines.append(f"  {entry['time']}  {entry['function']}  {entry['ms']:.1f} ms, {entry['rows']} rows")
+        lines.append(f"    {entry['sql']}")
+        lines.extend(f"    | {detail}" for detail in entry["plan"])
+    return "\n".join(lines)
+
+
+def _from_environment():
+    setting = os.environ.get("MUSICDB_METRICS")
+    if setting:
+        enable(None if setting.lower() in ("1", "true", "yes", "on") else setting)
+    path = os.environ.get("MUSICDB_METRICS_DUMP")
+    if path:
+        enable()
+        atexit.register(dump, path)
+
+
+_from_environment()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print a metrics dump written by Metrics.dump().")
+    parser.add_argument("dump")
+    args = parser.parse_args(argv)
+    with open(args.dump) as f:
+        print(report(json.load(f)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+# Migrations.py
+# Versioned schema migrations. The applied version is kept in
+# PRAGMA user_version; migrate() applies whatever is newer.
+#
+#   python Migrations.py [music.db]                 apply pending migrations
+#   python Migrations.py [music.db] --check-plans   fail if a Backend query scans
+import argparse
+import inspect
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+import Dedup
+import PlaylistStats
+import Search
+import Stats
+
+BASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Artist (
+    ArtistID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Name TEXT UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS Album (
+    AlbumID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Name TEXT UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS Track (
+    TrackID TEXT PRIMARY KEY,
+    Name TEXT,
+    AlbumID INTEGER,
+    DurationMs INTEGER,
+    Explicit INTEGER,
+    Popularity INTEGER,
+    Danceability REAL,
+    Energy REAL,
+    Key INTEGER,
+    Loudness REAL,
+    Mode INTEGER,
+    Speechiness REAL,
+    Acousticness REAL,
+    Instrumentalness REAL,
+    Liveness REAL,
+    Valence REAL,
+    Tempo REAL,
+    TimeSignature INTEGER,
+    Genre TEXT
+);
+
+CREATE TABLE IF NOT EXISTS Playlist (
+      PlaylistID INTEGER PRIMARY KEY AUTOINCREMENT,
+      Name TEXT,
+      CreatedDate DATE,
+      OwnerName TEXT
+);
+
+CREATE TABLE IF NOT EXISTS ArtistTrack (
+    ArtistID INTEGER,
+    TrackID TEXT,
+    PRIMARY KEY (ArtistID, TrackID)
+);
+
+CREATE TABLE IF NOT EXISTS ArtistAlbum (
+    ArtistID INTEGER,
+    AlbumID INTEGER,
+    PRIMARY KEY (ArtistID, AlbumID)
+);
+
+CREATE TABLE IF NOT EXISTS TrackPlaylist (
+    PlaylistID INTEGER,
+    TrackID TEXT,
+    PRIMARY KEY (PlaylistID, TrackID)
+);
+
+-- Hash of each track's source CSV row, used by incremental ingest
+CREATE TABLE IF NOT EXISTS TrackHash (
+    TrackID TEXT PRIMARY KEY,
+    Hash INTEGER
+);
+"""
+
+# Indexes for the Backend lookups. The Track and ArtistTrack ones carry the
+# columns the joins read next, so those lookups never touch the table rows.
+LOOKUP_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_track_name ON Track (Name, DurationMs, TrackID);
+CREATE INDEX IF NOT EXISTS idx_track_genre ON Track (Genre);
+CREATE INDEX IF NOT EXISTS idx_playlist_name ON Playlist (Name, PlaylistID);
+CREATE INDEX IF NOT EXISTS idx_playlist_created ON Playlist (CreatedDate, Name);
+DROP INDEX IF EXISTS idx_artisttrack_track;
+CREATE INDEX idx_artisttrack_track ON ArtistTrack (TrackID, ArtistID);
+CREATE INDEX IF NOT EXISTS idx_trackplaylist_track ON TrackPlaylist (TrackID);
+"""
+
+# Lookups by album for Backend.delete_tracks (album_id filter and orphan
+# clean-up)
+ALBUM_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_track_album ON Track (AlbumID);
+CREATE INDEX IF NOT EXISTS idx_artistalbum_album ON ArtistAlbum (AlbumID);
+"""
+
+# (version, description, SQL script or callable taking the connection)
+MIGRATIONS = [
+    (1, "base schema", BASE_SCHEMA),
+    (2, "lookup indexes", LOOKUP_INDEXES),
+    (3, "catalog search", Search.create_schema),
+    (4, "report summary tables", Stats.create_schema),
+    (5, "duplicate detection keys", Dedup.create_schema),
+    (6, "album indexes", ALBUM_INDEXES),
+    (7, "playlist summary tables", PlaylistStats.create_schema),
+    (8, "dedup queue triggers under upsert", Dedup.recreate_triggers),
+    (9, "dedup tracks new since the last incremental run", Dedup.add_new_tracks),
+    (10, "track search keyed by TrackID", Search.key_tracks_by_id),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+# Split a script into statements; complete_statement understands
+# CREATE TRIGGER ... BEGIN ...; END bodies.
+def _statements(script):
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            if statement.strip():
+                yield statement
+            statement = ""
+    if statement.strip():
+        yield statement
+
+
+# Apply pending migrations, each in its own transaction. Returns the list of
+# versions applied.
+def migrate(conn):
+    applied = []
+    if schema_version(conn) >= LATEST_VERSION:
+        return applied
+    for version, _description, step in MIGRATIONS:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-read under the write lock in case another process migrated
+            if schema_version(conn) >= version:
+                conn.execute("ROLLBACK")
+                continue
+            if callable(step):
+                step(conn)
+            else:
+                for statement in _statements(step):
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        applied.append(version)
+    return applied
+
+
+# ----------------------------
+# Query plan check
+# ----------------------------
+
+# Arguments used to exercise each public Backend function; None marks a
+# helper that issues no queries of its own
+PLAN_CHECK_ARGS = {
+    "create_playlist": ("Check", "2024-01-01"),
+    "get_playlist_names": (),
+    "get_playlist_id_by_name": ("Check",),
+    "get_track_names": (),
+    "get_track_id_by_name": ("Track",),
+    "add_track_to_playlist": (1, "t1"),
+    "insert_artist_with_album": ("Artist", "Album"),
+    "search_album_by_id": (1,),
+    "get_tracks_in_playlist_by_name": ("Check",),
+    "find_artist_by_track_name": ("Track",),
+    "tracks_per_genre": (),
+    "artists_with_album_and_track": (),
+    "get_playlists_after_date": ("2023-01-01",),
+    "top_artist": (),
+    "find_duplicate_tracks": (),
+    "find_duplicate_clusters": (),
+    "nested_artists_not_in_playlist": ("pop",),
+    "artists_above_avg_duration": (),
+    "delete_track_by_id": ("t1",),
+    "delete_tracks": (["t1"], "pop", 1, 50, True),
+    "search_catalog": ("trak",),
+    "search_track_names": ("tra",),
+    "search_tracks": ("tra",),
+    "get_track_ids_by_names": (["Track", "Other"],),
+    "existing_track_ids": (["t1", "t2"],),
+    "add_tracks_to_playlist": (1, ["t1", "t2"]),
+    "iter_playlist_entries": ("Check", "t0", 10),
+    "similar_tracks": ("t1",),
+    "suggest_tracks_for_playlist": ("Check",),
+    "get_playlist_summary": ("Check",),
+    "batched": None,
+    "cache_stats": None,
+    "iter_playlists": (1, 10),
+    "iter_tracks": ("t0", 10),
+    "iter_tracks_in_playlist": ("Check", "t0", 10),
+    "iter_tracks_per_genre": ("a", 10),
+    "iter_artists_with_album_and_track": (1, 10),
+    "iter_playlists_after_date": ("2023-01-01", 1, 10),
+    "iter_duplicate_tracks": (("Track", 1), 10),
+    "iter_nested_artists_not_in_playlist": ("pop", ("A", "T"), 10),
+    "iter_artists_above_avg_duration": (1, 10),
+}
+
+# Reports that read the whole catalog by design; a scan is expected there
+FULL_SCAN_OK = {
+    "get_playlist_names",
+    "get_track_names",
+    "artists_with_album_and_track",
+    "top_artist",
+    "find_duplicate_tracks",
+    "artists_above_avg_duration",
+    "iter_artists_with_album_and_track",
+    "iter_duplicate_tracks",
+    "iter_artists_above_avg_duration",
+    "similar_tracks",
+    "suggest_tracks_for_playlist",
+}
+
+# "SCAN t" / "SCAN Track" without an index; scans of a covering index and
+# of subquery results are fine
+_TABLE_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+def _table_scans(conn, sql):
+    scans = []
+    for _id, _parent, _unused, detail in conn.execute("EXPLAIN QUERY PLAN " + sql):
+        if _TABLE_SCAN.match(detail) and "(subquery" not in detail:
+            scans.append(detail)
+    return scans
+
+
+# Run every public Backend function against a scratch database and return
+# [(function, sql, plan detail)] for each statement that scans a table.
+def check_query_plans():
+    import Backend
+    import Database
+
+    problems = []
+    old_path = Database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        Database.configure(os.path.join(tmp, "plans.db"))
+        try:
+            conn = Database.get_connection()
+            conn.execute("INSERT INTO Track (TrackID, Name, DurationMs, Genre) VALUES ('t1', 'Track', 1000, 'pop')")
+
+            functions = [
+                (name, fn) for name, fn in inspect.getmembers(Backend, inspect.isfunction)
+                if not name.startswith("_") and fn.__module__ == "Backend" and name != "get_connection"
+            ]
+            for name, fn in functions:
+                if name not in PLAN_CHECK_ARGS:
+                    problems.append((name, None, "no PLAN_CHECK_ARGS entry"))
+                    continue
+                if PLAN_CHECK_ARGS[name] is None:
+                    continue
+                statements = []
+                conn.set_trace_callback(statements.append)
+                try:
+                    result = fn(*PLAN_CHECK_ARGS[name])
+                    if inspect.isgenerator(result):
+                        list(result)
+                finally:
+                    conn.set_trace_callback(None)
+                if name in FULL_SCAN_OK:
+                    continue
+                for sql in statements:
+                    if not re.match(r"\s*(SELECT|UPDATE|DELETE|WITH)\b", sql, re.I):
+                        continue
+                    for detail in _table_scans(conn, sql):
+                        problems.append((name, " ".join(sql.split()), detail))
+        finally:
+            Database.configure(old_path)
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply schema migrations.")
+    parser.add_argument("db", nargs="?", default="music.db")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="exit non-zero if a Backend query falls back to a table scan")
+    args = parser.parse_args(argv)
+
+    if args.check_plans:
+        problems = check_query_plans()
+        for name, sql, detail in problems:
+            print(f"{name}: {detail}" + (f"\n    {sql}" if sql else ""))
+        print("Query plans OK" if not problems else f"{len(problems)} query plan problem(s)")
+        return 1 if problems else 0
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        before = schema_version(conn)
+        applied = migrate(conn)
+    finally:
+        conn.close()
+    if applied:
+        print(f"Migrated {args.db} from version {before} to {applied[-1]}")
+    else:
+        print(f"{args.db} is up to date (version {before})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+# PlaylistStats.py
+# Per-playlist summary tables behind Backend.get_playlist_summary.
+# PlaylistStats holds one row per playlist (track count, duration and the
+# sum and count of each audio feature, for the means) and PlaylistGenre one
+# row per playlist and genre. Both are created by migration 7 and kept
+# current by triggers on TrackPlaylist and Track, so a summary reads a
+# fixed number of rows however long the playlist is.
+#
+# Like the playlist views, only entries whose track exists are counted.
+#
+#   python PlaylistStats.py [music.db]             compare with the live aggregates
+#   python PlaylistStats.py [music.db] --refresh   recompute from scratch, then compare
+import argparse
+import sys
+
+import Database
+
+# The audio features averaged per playlist (Similarity.FEATURES; listed
+# here so the schema does not depend on NumPy)
+FEATURES = [
+    "Danceability", "Energy", "Loudness", "Speechiness", "Acousticness",
+    "Instrumentalness", "Liveness", "Valence", "Tempo",
+]
+
+# Float sums drift by rounding under repeated adds and removes
+TOLERANCE = 1e-6
+
+# Per feature: how many tracks have a value, and their sum
+_FEATURE_COLUMNS = "".join(
+    f",\n        {f}Count INTEGER NOT NULL DEFAULT 0,\n        {f}Sum REAL NOT NULL DEFAULT 0" for f in FEATURES
+)
+
+TABLES = [
+    f"""CREATE TABLE IF NOT EXISTS PlaylistStats (
+        PlaylistID INTEGER PRIMARY KEY,
+        TrackCount INTEGER NOT NULL DEFAULT 0,
+        DurationCount INTEGER NOT NULL DEFAULT 0,
+        DurationSum INTEGER NOT NULL DEFAULT 0{_FEATURE_COLUMNS}
+    )""",
+    # Genre may be NULL, so rows are matched with IS as in GenreStats
+    """CREATE TABLE IF NOT EXISTS PlaylistGenre (
+        PlaylistID INTEGER NOT NULL,
+        Genre TEXT,
+        TrackCount INTEGER NOT NULL DEFAULT 0
+    )""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_playlistgenre ON PlaylistGenre (PlaylistID, Genre)",
+]
+
+COLUMNS = ["TrackCount", "DurationCount", "DurationSum"] + [f"{f}{kind}" for f in FEATURES for kind in ("Count", "Sum")]
+
+
+# SET clause adding (or removing) one track, read from the columns of row
+def _set(sign, row):
+    terms = [
+        f"TrackCount = TrackCount {sign} 1",
+        f"DurationCount = DurationCount {sign} ({row}.DurationMs IS NOT NULL)",
+        f"DurationSum = DurationSum {sign} IFNULL({row}.DurationMs, 0)",
+    ]
+    for f in FEATURES:
+        terms.append(f"{f}Count = {f}Count {sign} ({row}.{f} IS NOT NULL)")
+        terms.append(f"{f}Sum = {f}Sum {sign} IFNULL({row}.{f}, 0)")
+    return ",\n            ".join(terms)
+
+
+# A TrackPlaylist entry added or removed: count its track, if it exists
+def _add_entry(sign, row):
+    return f"""
+        INSERT INTO PlaylistStats (PlaylistID) VALUES ({row}.PlaylistID) ON CONFLICT (PlaylistID) DO NOTHING;
+        UPDATE PlaylistStats SET
+            {_set(sign, "t")}
+        FROM Track t
+        WHERE t.TrackID = {row}.TrackID AND PlaylistStats.PlaylistID = {row}.PlaylistID;
+        INSERT INTO PlaylistGenre (PlaylistID, Genre)
+        SELECT {row}.PlaylistID, t.Genre FROM Track t
+        WHERE t.TrackID = {row}.TrackID AND NOT EXISTS (
+            SELECT 1 FROM PlaylistGenre g WHERE g.PlaylistID = {row}.PlaylistID AND g.Genre IS t.Genre);
+        UPDATE PlaylistGenre SET TrackCount = TrackCount {sign} 1
+        FROM Track t
+        WHERE t.TrackID = {row}.TrackID AND PlaylistGenre.PlaylistID = {row}.PlaylistID
+          AND PlaylistGenre.Genre IS t.Genre;"""
+
+
+# A track added, removed or changed: adjust every playlist holding it
+def _add_track(sign, row):
+    playlists = f"(SELECT PlaylistID FROM TrackPlaylist WHERE TrackID = {row}.TrackID)"
+    return f"""
+        INSERT INTO PlaylistStats (PlaylistID)
+        SELECT PlaylistID FROM TrackPlaylist WHERE TrackID = {row}.TrackID
+        ON CONFLICT (PlaylistID) DO NOTHING;
+        UPDATE PlaylistStats SET
+            {_set(sign, row)}
+        WHERE PlaylistID IN {playlists};
+        INSERT INTO PlaylistGenre (PlaylistID, Genre)
+        SELECT tp.PlaylistID, {row}.Genre FROM TrackPlaylist tp
+        WHERE tp.TrackID = {row}.TrackID AND NOT EXISTS (
+            SELECT 1 FROM PlaylistGenre g WHERE g.PlaylistID = tp.PlaylistID AND g.Genre IS {row}.Genre);
+        UPDATE PlaylistGenre SET TrackCount = TrackCount {sign} 1
+        WHERE Genre IS {row}.Genre AND PlaylistID IN {playlists};"""
+
+
+TRIGGERS = {
+    "playlist_stats_entry_ai": "AFTER INSERT ON TrackPlaylist BEGIN" + _add_entry("+", "new"),
+    "playlist_stats_entry_ad": "AFTER DELETE ON TrackPlaylist BEGIN" + _add_entry("-", "old"),
+    "playlist_stats_track_ai": "AFTER INSERT ON Track BEGIN" + _add_track("+", "new"),
+    "playlist_stats_track_ad": "AFTER DELETE ON Track BEGIN" + _add_track("-", "old"),
+    "playlist_stats_track_au": (
+        f"AFTER UPDATE OF Genre, DurationMs, {', '.join(FEATURES)} ON Track BEGIN"
+        + _add_track("-", "old") + _add_track("+", "new")
+    ),
+}
+
+# The same aggregates computed from the catalog tables
+LIVE_PLAYLIST_STATS = f"""
+    SELECT tp.PlaylistID, COUNT(*), COUNT(t.DurationMs), IFNULL(SUM(t.DurationMs), 0),
+           {", ".join(f"COUNT(t.{f}), TOTAL(t.{f})" for f in FEATURES)}
+    FROM TrackPlaylist tp JOIN Track t ON t.TrackID = tp.TrackID
+    GROUP BY tp.PlaylistID
+"""
+
+LIVE_PLAYLIST_GENRES = """
+    SELECT tp.PlaylistID, t.Genre, COUNT(*)
+    FROM TrackPlaylist tp JOIN Track t ON t.TrackID = tp.TrackID
+    GROUP BY tp.PlaylistID, t.Genre
+"""
+
+
+# Migration step: create the summary tables and triggers and fill them
+def create_schema(conn):
+    for statement in TABLES:
+        conn.execute(statement)
+    create_triggers(conn)
+    refresh(conn)
+
+
+def create_triggers(conn):
+    for name, body in TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}\nEND")
+
+
+# Bulk loads drop the triggers, load, then refresh() and create_triggers()
+# inside the same transaction instead of updating row by row.
+def drop_triggers(conn):
+    for name in TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+# Recompute every summary row from the catalog tables
+def refresh(conn=None):
+    conn = conn or Database.get_connection()
+    conn.execute("DELETE FROM PlaylistStats")
+    conn.execute(f"INSERT INTO PlaylistStats (PlaylistID, {', '.join(COLUMNS)}) " + LIVE_PLAYLIST_STATS)
+    conn.execute("DELETE FROM PlaylistGenre")
+    conn.execute("INSERT INTO PlaylistGenre (PlaylistID, Genre, TrackCount) " + LIVE_PLAYLIST_GENRES)
+
+
+def _same(stored, live):
+    if stored is None or live is None:
+        return stored == live
+    return all(a == b if isinstance(a, (int, str)) or a is None else abs(a - b) <= TOLERANCE * max(1.0, abs(b))
+               for a, b in zip(stored, live))
+
+
+# Compare the summary tables with the live aggregates. Returns a list of
+# (table, key, stored row, live row) for every difference.
+def check(conn=None):
+    conn = conn or Database.get_connection()
+    problems = []
+    comparisons = [
+        ("PlaylistStats", f"SELECT PlaylistID, {', '.join(COLUMNS)} FROM PlaylistStats WHERE TrackCount <> 0",
+         LIVE_PLAYLIST_STATS, 1),
+        ("PlaylistGenre", "SELECT PlaylistID, Genre, TrackCount FROM PlaylistGenre WHERE TrackCount <> 0",
+         LIVE_PLAYLIST_GENRES, 2),
+    ]
+    for table, stored_sql, live_sql, key_columns in comparisons:
+        stored = {row[:key_columns]: row for row in conn.execute(stored_sql)}
+        live = {row[:key_columns]: row for row in conn.execute(live_sql)}
+        for key in stored.keys() | live.keys():
+            if not _same(stored.get(key), live.get(key)):
+                problems.append((table, key, stored.get(key), live.get(key)))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check or rebuild the playlist summary tables.")
+    parser.add_argument("db", nargs="?", default=Database.DB_PATH)
+    parser.add_argument("--refresh", action="store_true")
+    args = parser.parse_args(argv)
+
+    Database.configure(args.db)
+    if args.refresh:
+        with Database.transaction() as conn:
+            refresh(conn)
+        print("Playlist summary tables rebuilt")
+    problems = check()
+    for table, key, stored, live in problems[:50]:
+        print(f"{table} {key!r}: stored {stored}, live {live}")
+    print("Playlist summary tables consistent" if not problems else f"{len(problems)} inconsistent row(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
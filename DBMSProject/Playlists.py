@@ -0,0 +1,191 @@
+# Playlists.py
+# Playlist import and export. Files are read and written a batch at a time,
+# so playlists of any length use constant memory. Formats, by extension:
+#   .m3u / .m3u8   #EXTINF:<seconds>,<artists> - <name> then the TrackID
+#   .csv           TrackID,Name,Artists,DurationMs
+#   .jsonl         one {"TrackID", "Name", "Artists", "DurationMs"} per line
+# On import a row is matched by TrackID, or by track name when the ID is
+# missing or unknown.
+#
+#   python Playlists.py export <playlist> <file>
+#   python Playlists.py import <file> [--name NAME] [--date YYYY-MM-DD]
+import argparse
+import csv
+import datetime
+import json
+import os
+import time
+
+import Backend
+import Database
+
+FORMATS = {".m3u": "m3u", ".m3u8": "m3u", ".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+FIELDS = ["TrackID", "Name", "Artists", "DurationMs"]
+BATCH_SIZE = 1000
+
+
+def file_format(path, fmt=None):
+    fmt = fmt or FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt not in FORMATS.values():
+        raise ValueError(f"Unknown playlist format for {path!r}; use .m3u, .csv or .jsonl")
+    return fmt
+
+
+# Playlist rows a page at a time, as dicts keyed by FIELDS
+def _entries(playlist_name):
+    after = None
+    while True:
+        page = list(Backend.iter_playlist_entries(playlist_name, after_id=after, limit=BATCH_SIZE))
+        for track_id, name, duration, artists in page:
+            yield {"TrackID": track_id, "Name": name, "Artists": artists, "DurationMs": duration}
+        if len(page) < BATCH_SIZE:
+            return
+        after = page[-1][0]
+
+
+def _write_m3u(f, entries):
+    f.write("#EXTM3U\n")
+    for entry in entries:
+        seconds = entry["DurationMs"] // 1000 if entry["DurationMs"] is not None else -1
+        title = f"{entry['Artists']} - {entry['Name']}" if entry["Artists"] else (entry["Name"] or "")
+        f.write(f"#EXTINF:{seconds},{title}\n{entry['TrackID']}\n")
+        yield entry
+
+
+def _write_csv(f, entries):
+    writer = csv.DictWriter(f, fieldnames=FIELDS)
+    writer.writeheader()
+    for entry in entries:
+        writer.writerow(entry)
+        yield entry
+
+
+def _write_jsonl(f, entries):
+    for entry in entries:
+        f.write(json.dumps(entry) + "\n")
+        yield entry
+
+
+_WRITERS = {"m3u": _write_m3u, "csv": _write_csv, "jsonl": _write_jsonl}
+
+
+# Write a playlist to path. Returns {"tracks", "seconds", "tracks_per_sec"}.
+def export_playlist(playlist_name, path, fmt=None):
+    fmt = file_format(path, fmt)
+    if Backend.get_playlist_id_by_name(playlist_name) is None:
+        raise ValueError(f"No playlist named {playlist_name!r}")
+    start = time.perf_counter()
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for _entry in _WRITERS[fmt](f, _entries(playlist_name)):
+            count += 1
+    return _timing({"playlist": playlist_name, "tracks": count}, start)
+
+
+# (TrackID or None, Name or None) for each track in the file
+def _read_m3u(f):
+    title = None
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#EXTINF:"):
+            title = line.partition(",")[2]
+        elif not line.startswith("#"):
+            track_id = line.rsplit(":", 1)[-1] if line.startswith("spotify:") else line
+            # "<artists> - <name>"; track names often contain " - " too
+            # ("Song - 2011 Remaster"), so split at the first one
+            name = None
+            if title:
+                _artists, sep, name = title.partition(" - ")
+                name = name if sep else title
+            yield track_id, name
+            title = None
+
+
+def _read_csv(f):
+    for row in csv.DictReader(f):
+        yield row.get("TrackID") or None, row.get("Name") or None
+
+
+def _read_jsonl(f):
+    for line in f:
+        if line.strip():
+            row = json.loads(line)
+            yield row.get("TrackID") or None, row.get("Name") or None
+
+
+_READERS = {"m3u": _read_m3u, "csv": _read_csv, "jsonl": _read_jsonl}
+
+
+# Resolve one batch of (TrackID, Name) to existing TrackIDs, in file order
+def _resolve(batch):
+    known = Backend.existing_track_ids([t for t, _name in batch if t])
+    missing = [name for t, name in batch if t not in known and name]
+    by_name = Backend.get_track_ids_by_names(missing) if missing else {}
+    resolved = []
+    for track_id, name in batch:
+        if track_id in known:
+            resolved.append(track_id)
+        elif name in by_name:
+            resolved.append(by_name[name])
+    return resolved
+
+
+# Add the tracks listed in path to a playlist, creating it if needed (named
+# after the file unless playlist_name is given). Everything happens in one
+# transaction. Returns counts of rows read, tracks added, rows already in
+# the playlist and rows matching no track, plus timing.
+def import_playlist(path, playlist_name=None, created_date=None, fmt=None):
+    fmt = file_format(path, fmt)
+    playlist_name = playlist_name or os.path.splitext(os.path.basename(path))[0]
+    start = time.perf_counter()
+    stats = {"playlist": playlist_name, "read": 0, "tracks": 0, "already": 0, "unresolved": 0}
+    with open(path, newline="", encoding="utf-8") as f, Database.transaction():
+        playlist_id = Backend.get_playlist_id_by_name(playlist_name)
+        if playlist_id is None:
+            Backend.create_playlist(playlist_name, created_date or str(datetime.date.today()))
+            playlist_id = Backend.get_playlist_id_by_name(playlist_name)
+        for batch in Backend.batched(_READERS[fmt](f), BATCH_SIZE):
+            track_ids = _resolve(batch)
+            added = Backend.add_tracks_to_playlist(playlist_id, track_ids)
+            stats["read"] += len(batch)
+            stats["tracks"] += added
+            stats["already"] += len(track_ids) - added
+            stats["unresolved"] += len(batch) - len(track_ids)
+    return _timing(stats, start)
+
+
+def _timing(stats, start):
+    stats["seconds"] = time.perf_counter() - start
+    stats["tracks_per_sec"] = stats["tracks"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import or export playlists.")
+    parser.add_argument("--db", default=Database.DB_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export")
+    export.add_argument("playlist")
+    export.add_argument("file")
+    load = commands.add_parser("import")
+    load.add_argument("file")
+    load.add_argument("--name")
+    load.add_argument("--date")
+    args = parser.parse_args(argv)
+
+    Database.configure(args.db)
+    if args.command == "export":
+        stats = export_playlist(args.playlist, args.file)
+        print(f"Exported {stats['tracks']} tracks to {args.file} "
+              f"in {stats['seconds']:.2f}s: {stats['tracks_per_sec']:,.0f} tracks/sec")
+    else:
+        stats = import_playlist(args.file, args.name, args.date)
+        print(f"Imported {stats['tracks']} tracks into '{stats['playlist']}' "
+              f"({stats['already']} already there, {stats['unresolved']} not found) "
+              f"in {stats['seconds']:.2f}s: {stats['tracks_per_sec']:,.0f} tracks/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# Search.py
+# Ranked prefix search over Track, Artist and Album names using SQLite FTS5.
+# The *Search tables are created by migration 3 and kept in sync by triggers
+# on the catalog tables.
+import re
+
+import Database
+
+# kind -> (FTS table, vocabulary table, ID column stored in the FTS table)
+KINDS = {
+    "track": ("TrackSearch", "TrackSearchVocab", "TrackID"),
+    "artist": ("ArtistSearch", "ArtistSearchVocab", "ArtistID"),
+    "album": ("AlbumSearch", "AlbumSearchVocab", "AlbumID"),
+}
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+# kind -> source table. Artist and album search rows use the integer ID as
+# their rowid. Track has a TEXT key and an implicit rowid that VACUUM may
+# renumber, so TrackSearchKey gives every TrackID a stable integer and the
+# track search rows are found through it.
+_SOURCES = {
+    "track": "Track",
+    "artist": "Artist",
+    "album": "Album",
+}
+
+KEY_TABLE = """CREATE TABLE IF NOT EXISTS TrackSearchKey (
+    SearchRowid INTEGER PRIMARY KEY,
+    TrackID TEXT NOT NULL UNIQUE
+)"""
+
+
+# The search rowid of the source row row ("new" or "old")
+def _rowid(kind, row):
+    id_column = KINDS[kind][2]
+    if kind == "track":
+        return f"(SELECT SearchRowid FROM TrackSearchKey WHERE TrackID = {row}.TrackID)"
+    return f"{row}.{id_column}"
+
+
+def _tables(kind):
+    table, vocab, id_column = KINDS[kind]
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+            Name, {id_column} UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3 4'
+        )""",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {vocab} USING fts5vocab({table}, 'row')",
+    ]
+
+
+# Rows without an ID are not indexed: a search hit could not name them.
+# The key insert uses ON CONFLICT rather than OR IGNORE, which an outer
+# upsert (Ingest's TRACK_UPSERT) would override.
+def _triggers(kind):
+    table, _vocab, id_column = KINDS[kind]
+    source = _SOURCES[kind]
+    key = unkey = ""
+    if kind == "track":
+        key = """INSERT INTO TrackSearchKey (TrackID) SELECT new.TrackID WHERE new.TrackID IS NOT NULL
+            ON CONFLICT (TrackID) DO NOTHING;
+            """
+        unkey = """
+            DELETE FROM TrackSearchKey WHERE TrackID = old.TrackID;"""
+    return {
+        f"{table}_ai": f"""CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {source} BEGIN
+            {key}INSERT OR REPLACE INTO {table} (rowid, Name, {id_column})
+            SELECT {_rowid(kind, "new")}, new.Name, new.{id_column} WHERE new.{id_column} IS NOT NULL;
+        END""",
+        f"{table}_ad": f"""CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {source} BEGIN
+            DELETE FROM {table} WHERE rowid = {_rowid(kind, "old")};{unkey}
+        END""",
+        f"{table}_au": f"""CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF Name ON {source} BEGIN
+            UPDATE {table} SET Name = new.Name WHERE rowid = {_rowid(kind, "old")};
+        END""",
+    }
+
+
+# Migration step: create and fill the search tables and their triggers
+def create_schema(conn):
+    for kind in KINDS:
+        for statement in _tables(kind):
+            conn.execute(statement)
+    conn.execute(KEY_TABLE)
+    create_triggers(conn)
+    rebuild(conn)
+
+
+# Migration step: key the track search rows by TrackID through
+# TrackSearchKey instead of by Track's implicit rowid
+def key_tracks_by_id(conn):
+    conn.execute(KEY_TABLE)
+    drop_triggers(conn)
+    create_triggers(conn)
+    rebuild(conn)
+
+
+def create_triggers(conn):
+    for kind in KINDS:
+        for statement in _triggers(kind).values():
+            conn.execute(statement)
+
+
+# Bulk loads drop the triggers, load, then rebuild() and create_triggers()
+# inside the same transaction instead of syncing row by row.
+def drop_triggers(conn):
+    for kind in KINDS:
+        for name in _triggers(kind):
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+# Repopulate every search table (and TrackSearchKey) from the catalog
+# tables
+def rebuild(conn=None):
+    conn = conn or Database.get_connection()
+    conn.execute("DELETE FROM TrackSearchKey")
+    conn.execute("INSERT INTO TrackSearchKey (TrackID) SELECT TrackID FROM Track WHERE TrackID IS NOT NULL")
+    for kind, (table, _vocab, id_column) in KINDS.items():
+        conn.execute(f"DELETE FROM {table}")
+        if kind == "track":
+            select = """SELECT k.SearchRowid, t.Name, t.TrackID
+                        FROM TrackSearchKey k JOIN Track t ON t.TrackID = k.TrackID"""
+        else:
+            select = f"SELECT {id_column}, Name, {id_column} FROM {_SOURCES[kind]} WHERE {id_column} IS NOT NULL"
+        conn.execute(f"INSERT INTO {table} (rowid, Name, {id_column}) {select}")
+
+
+def tokenize(query):
+    return [t.lower() for t in _TOKEN.findall(query or "")]
+
+
+# Every token must match the start of a word: "black sab" -> "black"* "sab"*
+def _prefix_expression(tokens):
+    return " AND ".join(f'"{t}"*' for t in tokens)
+
+
+# Every string one edit away from word: a letter deleted, inserted,
+# replaced, or two adjacent letters swapped
+def _edits(word, alphabet):
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    edits = {a + b[1:] for a, b in splits if b}
+    edits |= {a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1}
+    edits |= {a + c + b[1:] for a, b in splits if b for c in alphabet}
+    edits |= {a + c + b for a, b in splits for c in alphabet}
+    return edits
+
+
+# Indexed terms within one edit of token. Candidates are limited to terms
+# sharing the first letter and of a close length, which the vocab table
+# can range-scan, and then checked against the token's edit set.
+def _near_terms(conn, vocab, token):
+    first = token[0]
+    rows = conn.execute(
+        f"SELECT term FROM {vocab} WHERE term >= ? AND term < ? AND length(term) BETWEEN ? AND ?",
+        (first, first + "\U0010ffff", len(token) - 1, len(token) + 1),
+    ).fetchall()
+    alphabet = {c for (term,) in rows for c in term}
+    edits = _edits(token, alphabet)
+    edits.add(token)
+    return [term for (term,) in rows if term in edits]
+
+
+# Short words are too ambiguous to correct and stay plain prefixes
+def _fuzzy_expression(conn, vocab, tokens):
+    groups = []
+    corrected = False
+    for token in tokens:
+        if len(token) <= 2:
+            groups.append(f'"{token}"*')
+            continue
+        terms = _near_terms(conn, vocab, token)
+        if not terms:
+            return None
+        corrected = corrected or terms != [token]
+        groups.append("(" + " OR ".join(f'"{t}"' for t in terms) + ")")
+    return " AND ".join(groups) if corrected else None
+
+
+# Scoring every match costs time in proportion to the number of matches, so
+# an expression matching more than this many names is returned unranked.
+RANK_LIMIT = 2000
+
+
+def _is_broad(conn, table, expression):
+    row = conn.execute(
+        f"SELECT 1 FROM {table} WHERE {table} MATCH ? LIMIT 1 OFFSET ?",
+        (expression, RANK_LIMIT),
+    ).fetchone()
+    return row is not None
+
+
+# Each kind contributes its own best limit + offset rows, so the outer sort
+# only ever sees a bounded number of rows.
+def _query(conn, kinds, expressions, limit, offset):
+    parts = []
+    params = []
+    for kind in kinds:
+        expression = expressions.get(kind)
+        if expression is None:
+            continue
+        table, _vocab, id_column = KINDS[kind]
+        if _is_broad(conn, table, expression):
+            score, order = "0.0", ""
+        else:
+            score, order = f"bm25({table})", "ORDER BY score"
+        parts.append(
+            f"SELECT * FROM (SELECT '{kind}' AS kind, {id_column}, Name, {score} AS score "
+            f"FROM {table} WHERE {table} MATCH ? {order} LIMIT ?)"
+        )
+        params += [expression, limit + offset]
+    if not parts:
+        return []
+    sql = " UNION ALL ".join(parts) + " ORDER BY score LIMIT ? OFFSET ?"
+    return conn.execute(sql, params + [limit, offset]).fetchall()
+
+
+# Ranked search. Returns up to limit (kind, id, name, score) tuples, best
+# first (lower bm25 score is better). Prefix matches come first; after them,
+# when fuzzy is set, names matching terms within a small edit distance of
+# the query words. offset pages through that combined list.
+def search(query, kinds=tuple(KINDS), limit=20, offset=0, fuzzy=True, conn=None):
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    conn = conn or Database.get_connection()
+    exact = _prefix_expression(tokens)
+    results = _query(conn, kinds, {kind: exact for kind in kinds}, limit, offset)
+    if not fuzzy or len(results) >= limit:
+        return results
+
+    exact_total = offset + len(results) if results or offset == 0 else _count(conn, kinds, exact)
+    expressions = {}
+    for kind in kinds:
+        near = _fuzzy_expression(conn, KINDS[kind][1], tokens)
+        expressions[kind] = f"({near}) NOT ({exact})" if near else None
+    results += _query(conn, kinds, expressions, limit - len(results), max(offset - exact_total, 0))
+    return results
+
+
+def _count(conn, kinds, expression):
+    total = 0
+    for kind in kinds:
+        table = KINDS[kind][0]
+        total += conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {table} MATCH ?", (expression,)).fetchone()[0]
+    return total
@@ -0,0 +1,286 @@
+# Server.py
+# HTTP/JSON service over the Backend functions, for clients other than the
+# Tk GUI. Requests are handled on threads; reads borrow one of a pool of
+# query_only connections, so they run side by side under WAL, while writes
+# queue for the single writer connection.
+#
+#   GET  /api/<function>?name=value...    call a read, e.g. /api/find_artist_by_track_name?track_name=Hello
+#   POST /api/<function>                   JSON object of arguments; required for writes
+#   POST /api/batch                        [{"call": <function>, "args": {...}}, ...] in one round trip
+#   GET  /health, /metrics
+#
+# Paged functions (iter_*) take after (JSON, the "next" of the previous
+# page) and limit, and answer {"rows": [...], "next": key or null}. Other
+# calls answer {"result": ...}; errors answer {"error": message}. In a
+# batch each failed call's entry also carries the status it would have had.
+# Connections are kept alive, so a client can pipeline requests.
+#
+#   python Server.py [--db music.db] [--host 127.0.0.1] [--port 8080] [--readers 8]
+import argparse
+import inspect
+import json
+import queue
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import Backend
+import Cache
+import Database
+import Metrics
+
+DEFAULT_PAGE = 100
+MAX_PAGE = 1000
+MAX_BATCH = 100
+
+READS = {
+    "get_playlist_names", "get_playlist_id_by_name", "get_track_names", "get_track_id_by_name",
+    "get_track_ids_by_names", "existing_track_ids", "search_catalog", "search_track_names", "search_tracks",
+    "similar_tracks", "suggest_tracks_for_playlist", "search_album_by_id", "get_tracks_in_playlist_by_name",
+    "get_playlist_summary", "find_artist_by_track_name", "tracks_per_genre", "artists_with_album_and_track",
+    "get_playlists_after_date", "top_artist", "find_duplicate_tracks", "nested_artists_not_in_playlist",
+    "artists_above_avg_duration",
+}
+
+# Paged reads and how to get the after_id that continues after a row
+PAGES = {
+    "iter_playlists": lambda row: row[0],
+    "iter_tracks": lambda row: row[0],
+    "iter_tracks_in_playlist": lambda row: row[0],
+    "iter_playlist_entries": lambda row: row[0],
+    "iter_tracks_per_genre": lambda row: row[0],
+    "iter_artists_with_album_and_track": lambda row: row[0],
+    "iter_playlists_after_date": lambda row: row[0],
+    "iter_duplicate_tracks": lambda row: row[:2],
+    "iter_nested_artists_not_in_playlist": lambda row: row[:2],
+    "iter_artists_above_avg_duration": lambda row: row[0],
+}
+
+# find_duplicate_clusters updates its key table, so it counts as a write
+WRITES = {
+    "create_playlist", "add_track_to_playlist", "add_tracks_to_playlist", "insert_artist_with_album",
+    "delete_track_by_id", "delete_tracks", "find_duplicate_clusters",
+}
+
+# Query string values are text; these parameters are converted
+INT_PARAMS = {"limit", "offset", "k", "album_id", "playlist_id", "max_popularity", "tolerance_ms"}
+BOOL_PARAMS = {"by_artist", "incremental", "gc_orphans"}
+JSON_PARAMS = {"after", "names", "track_ids"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Connections for the server's request threads: readers query_only
+# connections handed out from a queue, and one writer behind a lock
+class ConnectionPool:
+    def __init__(self, readers=8):
+        # Opening a connection through Database applies pending migrations
+        # and puts the file in WAL mode before the readers open it
+        Database.get_connection()
+        Database.close_connection()
+        self.writer = Database.connect(check_same_thread=False)
+        self.write_lock = threading.Lock()
+        self.idle = queue.Queue()
+        for _ in range(readers):
+            conn = Database.connect(pragmas=dict(Database.PRAGMAS, query_only="ON"), check_same_thread=False)
+            self.idle.put(conn)
+
+    @contextmanager
+    def reader(self):
+        conn = self.idle.get()
+        try:
+            with Database.use_connection(conn):
+                yield conn
+        finally:
+            self.idle.put(conn)
+
+    @contextmanager
+    def writer_connection(self):
+        with self.write_lock, Database.use_connection(self.writer):
+            yield self.writer
+
+    def close(self):
+        self.writer.close()
+        while not self.idle.empty():
+            self.idle.get().close()
+
+
+def _convert(name, value):
+    try:
+        if name in INT_PARAMS:
+            return int(value)
+        if name in BOOL_PARAMS:
+            return value.lower() in ("1", "true", "yes", "on")
+        if name in JSON_PARAMS:
+            return json.loads(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"Bad value for {name}: {value!r}")
+    return value
+
+
+def _jsonable(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# Run one API call and return its JSON-ready answer
+def call(pool, name, args):
+    if name in PAGES:
+        after = args.pop("after", None)
+        if isinstance(after, list):
+            after = tuple(after)
+        limit = max(1, min(_convert("limit", args.pop("limit", DEFAULT_PAGE)), MAX_PAGE))
+        with pool.reader():
+            rows = list(_invoke(name, args, after_id=after, limit=limit))
+        return {"rows": rows, "next": PAGES[name](rows[-1]) if len(rows) == limit else None}
+    if name in READS:
+        with pool.reader():
+            return {"result": _invoke(name, args)}
+    if name in WRITES:
+        with pool.writer_connection():
+            return {"result": _invoke(name, args)}
+    raise ApiError(404, f"No such function: {name}")
+
+
+def _invoke(name, args, **extra):
+    fn = getattr(Backend, name)
+    try:
+        inspect.signature(fn).bind(**args, **extra)
+    except TypeError as e:
+        raise ApiError(400, str(e))
+    try:
+        return fn(**args, **extra)
+    except ValueError as e:
+        raise ApiError(400, str(e))
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MusicDB/1.0"
+    # Headers and body go out in separate writes; without this, Nagle's
+    # algorithm holds the body back ~40 ms on kept-alive connections
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            return self._send(200, {"status": "ok"})
+        if url.path == "/metrics":
+            return self._send(200, {"metrics": Metrics.snapshot(), "cache": Cache.stats()})
+        name = self._function(url.path)
+        if name in WRITES:
+            return self._send(405, {"error": f"{name} changes data; use POST"})
+        try:
+            args = {key: _convert(key, value) for key, value in parse_qsl(url.query)}
+        except ApiError as e:
+            return self._send(e.status, {"error": str(e)})
+        self._answer(name, args)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send(400, {"error": "Body must be JSON"})
+        if url.path == "/api/batch":
+            return self._batch(body)
+        if not isinstance(body, dict):
+            return self._send(400, {"error": "Body must be a JSON object of arguments"})
+        self._answer(self._function(url.path), body)
+
+    def _function(self, path):
+        prefix, _, name = path.partition("/api/")
+        return name if not prefix else ""
+
+    def _answer(self, name, args):
+        try:
+            self._send(200, call(self.server.pool, name, args))
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+        except sqlite3.Error as e:
+            self._send(500, {"error": f"Database error: {e}"})
+        except Exception as e:
+            self.log_error("%s failed: %r", name, e)
+            self._send(500, {"error": f"Internal error: {e}"})
+
+    def _batch(self, calls):
+        if not isinstance(calls, list) or len(calls) > MAX_BATCH:
+            return self._send(400, {"error": f"Batch must be a list of at most {MAX_BATCH} calls"})
+        results = []
+        for item in calls:
+            try:
+                results.append(call(self.server.pool, item["call"], dict(item.get("args") or {})))
+            except ApiError as e:
+                results.append({"error": str(e), "status": e.status})
+            except (KeyError, TypeError):
+                results.append({"error": 'Each call needs "call" and optional "args"', "status": 400})
+            except sqlite3.Error as e:
+                results.append({"error": f"Database error: {e}", "status": 500})
+            except Exception as e:
+                # One failing call must not cost the whole batch its answers
+                self.log_error("%s failed: %r", item.get("call"), e)
+                results.append({"error": f"Internal error: {e}", "status": 500})
+        self._send(200, {"results": results})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, default=_jsonable).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, readers=8, verbose=False):
+        super().__init__(address, Handler)
+        self.pool = ConnectionPool(readers)
+        self.verbose = verbose
+
+    # Clients closing kept-alive connections are not errors
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Backend functions as HTTP/JSON.")
+    parser.add_argument("--db", default=Database.DB_PATH)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--readers", type=int, default=8, help="read-only connections in the pool")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    Database.configure(args.db)
+    server = Server((args.host, args.port), args.readers, args.verbose)
+    print(f"Serving {args.db} on http://{args.host}:{server.server_address[1]}/", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
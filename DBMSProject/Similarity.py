@@ -0,0 +1,263 @@
+# Similarity.py
+# "More like this" over the audio features stored on Track. The features
+# are standardized (zero mean, unit variance per column) into a float32
+# matrix cached next to the database as .npy files, which later runs
+# memory-map instead of re-reading Track. Nearest neighbours are found by
+# squared Euclidean distance computed with one matrix product per block.
+#
+#   python Similarity.py [music.db] [--rebuild] [--track ID] [--k 20]
+import argparse
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+import Database
+
+FEATURES = [
+    "Danceability", "Energy", "Loudness", "Speechiness", "Acousticness",
+    "Instrumentalness", "Liveness", "Valence", "Tempo",
+]
+
+# Rows scored per matrix product; bounds the temporary distance array
+BLOCK_SIZE = 65536
+
+_FILES = ("matrix", "norms", "ids", "genres")
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def cache_dir(db_path=None):
+    return (db_path or Database.DB_PATH) + ".features"
+
+
+# Changes whenever tracks are added or removed. Feature edits on existing
+# tracks are not seen; Ingest calls invalidate() after every load.
+def fingerprint(conn):
+    count, duration = conn.execute(
+        "SELECT IFNULL(SUM(TrackCount), 0), IFNULL(SUM(DurationSum), 0) FROM GenreStats"
+    ).fetchone()
+    last = conn.execute("SELECT IFNULL(MAX(rowid), 0) FROM Track").fetchone()[0]
+    return f"{count}:{duration}:{last}"
+
+
+# Drop the cached matrix so the next query rebuilds it
+def invalidate(db_path=None):
+    global _index
+    with _index_lock:
+        _index = None
+    shutil.rmtree(cache_dir(db_path), ignore_errors=True)
+
+
+class FeatureIndex:
+    def __init__(self, ids, matrix, norms, genres, genre_names, mean, scale, fingerprint):
+        self.ids = ids
+        self.matrix = matrix
+        self.norms = norms
+        self.genres = genres
+        self.genre_names = genre_names
+        self.mean = mean
+        self.scale = scale
+        self.fingerprint = fingerprint
+        self.path = None
+        self._rows = None
+        self._genre_rows = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Read every track's features; missing values become the column mean
+    @classmethod
+    def build(cls, conn):
+        fp = fingerprint(conn)
+        columns = ", ".join(FEATURES)
+        rows = conn.execute(f"SELECT TrackID, Genre, {columns} FROM Track ORDER BY rowid").fetchall()
+        ids = np.array([row[0] for row in rows], dtype=str)
+        genre_names = sorted({row[1] for row in rows if row[1] is not None})
+        codes = {name: i for i, name in enumerate(genre_names)}
+        genres = np.array([codes.get(row[1], -1) for row in rows], dtype=np.int32)
+
+        values = np.array([row[2:] for row in rows], dtype=np.float64).reshape(len(rows), len(FEATURES))
+        present = ~np.isnan(values)
+        counts = present.sum(axis=0)
+        mean = np.divide(np.nansum(values, axis=0), counts, out=np.zeros(len(FEATURES)), where=counts > 0)
+        values = np.where(present, values, mean)
+        scale = np.sqrt(((values - mean) ** 2).mean(axis=0)) if len(rows) else np.ones(len(FEATURES))
+        scale[scale == 0] = 1.0
+        matrix = ((values - mean) / scale).astype(np.float32)
+        norms = np.einsum("ij,ij->i", matrix, matrix)
+        return cls(ids, matrix, norms, genres, genre_names, mean, scale, fp)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        meta = os.path.join(path, "meta.json")
+        if os.path.exists(meta):
+            os.remove(meta)
+        for name in _FILES:
+            tmp = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp, getattr(self, name))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+        # Written last: a directory without it is never loaded
+        with open(meta + ".tmp", "w") as f:
+            json.dump({
+                "fingerprint": self.fingerprint,
+                "features": FEATURES,
+                "rows": len(self.ids),
+                "genre_names": self.genre_names,
+                "mean": self.mean.tolist(),
+                "scale": self.scale.tolist(),
+            }, f)
+        os.replace(meta + ".tmp", meta)
+
+    # Memory-map a saved index; None when missing or from another catalog
+    @classmethod
+    def load(cls, path, expected_fingerprint=None):
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in _FILES}
+        except (OSError, ValueError):
+            return None
+        if meta["features"] != FEATURES or any(len(a) != meta["rows"] for a in arrays.values()):
+            return None
+        if expected_fingerprint is not None and meta["fingerprint"] != expected_fingerprint:
+            return None
+        return cls(arrays["ids"], arrays["matrix"], arrays["norms"], arrays["genres"], meta["genre_names"],
+                   np.array(meta["mean"]), np.array(meta["scale"]), meta["fingerprint"])
+
+    # Standardize raw feature values: a dict by feature name or a sequence
+    # in FEATURES order. Missing features count as average.
+    def vector(self, features):
+        if isinstance(features, dict):
+            features = [features.get(name) for name in FEATURES]
+        raw = np.array([np.nan if v is None else v for v in features], dtype=np.float64)
+        raw = np.where(np.isnan(raw), self.mean, raw)
+        return ((raw - self.mean) / self.scale).astype(np.float32)
+
+    def rows_for(self, track_ids):
+        if self._rows is None:
+            self._rows = {track_id: i for i, track_id in enumerate(self.ids.tolist())}
+        return [self._rows[t] for t in track_ids if t in self._rows]
+
+    def _candidates(self, genre):
+        if genre is None:
+            return None
+        if genre not in self._genre_rows:
+            code = self.genre_names.index(genre) if genre in self.genre_names else -2
+            self._genre_rows[genre] = np.flatnonzero(np.asarray(self.genres) == code)
+        return self._genre_rows[genre]
+
+    # k nearest tracks to each query vector, as one [(TrackID, distance)]
+    # list per query, closest first. exclude holds TrackIDs to leave out.
+    def nearest(self, vectors, k=20, genre=None, exclude=()):
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        candidates = self._candidates(genre)
+        total = len(self.ids) if candidates is None else len(candidates)
+        excluded = set(self.rows_for(exclude))
+        want = min(k + len(excluded), total)
+        if want == 0:
+            return [[] for _ in queries]
+
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_dist = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, total, BLOCK_SIZE):
+            if candidates is None:
+                rows = np.arange(start, min(start + BLOCK_SIZE, total))
+                block, norms = self.matrix[start:start + BLOCK_SIZE], self.norms[start:start + BLOCK_SIZE]
+            else:
+                rows = candidates[start:start + BLOCK_SIZE]
+                block, norms = self.matrix[rows], self.norms[rows]
+            dist = norms[None, :] - 2.0 * (queries @ block.T) + query_norms[:, None]
+            # Keep the running best `want` per query
+            dist = np.concatenate([best_dist, dist], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(rows, (len(queries), len(rows)))], axis=1)
+            if dist.shape[1] > want:
+                top = np.argpartition(dist, want - 1, axis=1)[:, :want]
+                dist = np.take_along_axis(dist, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_dist, best_rows = dist, rows
+
+        results = []
+        for dist, rows in zip(best_dist, best_rows):
+            order = np.argsort(dist, kind="stable")
+            hits = [(str(self.ids[r]), float(max(d, 0.0))) for r, d in zip(rows[order], dist[order])
+                    if int(r) not in excluded]
+            results.append(hits[:k])
+        return results
+
+
+# The index for the current database: the in-memory one while the catalog
+# is unchanged, else the cached files, else a fresh build that is saved.
+def get_index(conn=None):
+    global _index
+    conn = conn or Database.get_connection()
+    fp = fingerprint(conn)
+    with _index_lock:
+        if _index is not None and _index.fingerprint == fp and _index.path == Database.DB_PATH:
+            return _index
+        path = cache_dir()
+        index = FeatureIndex.load(path, fp)
+        if index is None:
+            index = FeatureIndex.build(conn)
+            try:
+                index.save(path)
+            except OSError:
+                pass
+        index.path = Database.DB_PATH
+        _index = index
+        return index
+
+
+# Tracks closest to track_id, not including itself
+def similar_tracks(track_id, k=20, genre=None):
+    index = get_index()
+    rows = index.rows_for([track_id])
+    if not rows:
+        return []
+    return index.nearest(index.matrix[rows[0]], k, genre, exclude=[track_id])[0]
+
+
+def similar_to_features(features, k=20, genre=None):
+    index = get_index()
+    return index.nearest(index.vector(features), k, genre)[0]
+
+
+# Tracks closest to the average of the playlist's tracks, leaving out the
+# ones already in it
+def suggest_for_playlist(playlist_id, k=20, genre=None):
+    conn = Database.get_connection()
+    index = get_index(conn)
+    members = [row[0] for row in conn.execute("SELECT TrackID FROM TrackPlaylist WHERE PlaylistID = ?",
+                                              (playlist_id,))]
+    rows = index.rows_for(members)
+    if not rows:
+        return []
+    centroid = np.asarray(index.matrix[rows]).mean(axis=0)
+    return index.nearest(centroid, k, genre, exclude=members)[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the feature cache or query similar tracks.")
+    parser.add_argument("db", nargs="?", default=Database.DB_PATH)
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--track", help="TrackID to find similar tracks for")
+    parser.add_argument("--genre")
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    Database.configure(args.db)
+    if args.rebuild:
+        invalidate(args.db)
+    index = get_index()
+    print(f"{len(index)} tracks indexed in {cache_dir(args.db)}")
+    if args.track:
+        for track_id, distance in similar_tracks(args.track, args.k, args.genre):
+            print(f"{track_id}\t{distance:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+# Snapshot.py
+# Columnar copy of the catalog for the aggregate reports. Ingest writes it
+# next to the database after every load as .npy files, which are memory-
+# mapped on first use (no copy, no parse), and Backend answers
+# tracks_per_genre, top_artist, artists_with_album_and_track and
+# artists_above_avg_duration from it with NumPy instead of SQL.
+#
+# Per track, in rowid order: genre code (into the genre names in
+# meta.json, -1 for none), AlbumID, DurationMs (-1 for none) and
+# Popularity as int32, and the audio features as a float32 matrix. Per
+# artist, by ArtistID: name, album count, and a CSR index into the track
+# arrays (artist_offsets[i]:artist_offsets[i + 1] slices artist_tracks).
+#
+# A snapshot carries a fingerprint of the summary tables and of the
+# newest Track, Artist and ArtistAlbum rows; once a Backend write changes
+# them the snapshot is ignored and the reports read SQLite while a
+# background thread builds a new one (or until the next load or
+# `python Snapshot.py --rebuild`).
+#
+#   python Snapshot.py [music.db] [--rebuild]
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+
+import Database
+import Similarity
+
+FEATURES = Similarity.FEATURES
+
+_FILES = ("track_ids", "genres", "albums", "durations", "popularity", "features", "genre_tracks",
+          "artist_ids", "artist_names", "artist_albums", "artist_offsets", "artist_tracks",
+          "artist_track_counts", "artist_duration_sums", "artist_duration_counts")
+
+log = logging.getLogger(__name__)
+
+FETCH_ROWS = 100000
+
+_snapshot = None
+_lock = threading.Lock()
+# Held while a snapshot is built and saved, so this process writes one at a time
+_write_lock = threading.Lock()
+# Databases whose snapshot is being rebuilt in the background
+_rebuilding = set()
+
+
+def snapshot_dir(db_path=None):
+    return (db_path or Database.DB_PATH) + ".snapshot"
+
+
+# Changes with every track added, removed or moved to another genre or
+# duration (through the GenreStats totals, weighted by row so moves between
+# genres show), and with every new artist or artist-album link
+def fingerprint(conn):
+    row = conn.execute("""
+        SELECT COUNT(*), TOTAL(TrackCount), TOTAL(DurationSum), TOTAL(rowid * TrackCount), TOTAL(rowid * DurationSum),
+               (SELECT MAX(rowid) FROM Track), (SELECT MAX(rowid) FROM Artist), (SELECT MAX(rowid) FROM ArtistAlbum)
+        FROM GenreStats
+    """).fetchone()
+    return ":".join(map(str, row))
+
+
+def _fill(conn, query, columns, count):
+    out = [np.empty(count, dtype=dtype) for dtype in columns]
+    cur = conn.execute(query)
+    start = 0
+    while True:
+        rows = cur.fetchmany(FETCH_ROWS)
+        if not rows:
+            break
+        block = list(zip(*rows))
+        for array, values in zip(out, block):
+            array[start:start + len(rows)] = values
+        start += len(rows)
+    return [array[:start] for array in out]
+
+
+# As _fill for a float32 matrix of width columns; NULLs become NaN
+def _fill_matrix(conn, query, width, count):
+    out = np.empty((count, width), dtype=np.float32)
+    cur = conn.execute(query)
+    start = 0
+    while True:
+        rows = cur.fetchmany(FETCH_ROWS)
+        if not rows:
+            break
+        out[start:start + len(rows)] = np.array(rows, dtype=np.float32).reshape(len(rows), width)
+        start += len(rows)
+    return out[:start]
+
+
+# Index of each value in the sorted array keys, and whether it is there
+def _positions(keys, values):
+    pos = np.searchsorted(keys, values)
+    if not len(keys):
+        return pos, np.zeros(len(values), dtype=bool)
+    return pos, (pos < len(keys)) & (keys[np.minimum(pos, len(keys) - 1)] == values)
+
+
+class Snapshot:
+    def __init__(self, arrays, genre_names, totals, fingerprint):
+        for name in _FILES:
+            setattr(self, name, arrays[name])
+        self.genre_names = genre_names
+        self.totals = totals
+        self.fingerprint = fingerprint
+        self.path = None
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    # Read the catalog in one read transaction so the fingerprint matches
+    @classmethod
+    def build(cls, conn):
+        conn.execute("BEGIN")
+        try:
+            fp = fingerprint(conn)
+            count = conn.execute("SELECT COUNT(*) FROM Track").fetchone()[0]
+            rowids, track_ids, genres, albums, durations, popularity = _fill(
+                conn,
+                "SELECT rowid, TrackID, Genre, IFNULL(AlbumID, -1), IFNULL(DurationMs, -1), IFNULL(Popularity, -1) "
+                "FROM Track ORDER BY rowid",
+                (np.int64, object, object, np.int32, np.int32, np.int32), count)
+            features = _fill_matrix(conn, f"SELECT {', '.join(FEATURES)} FROM Track ORDER BY rowid",
+                                    len(FEATURES), count)
+
+            artist_count = conn.execute("SELECT COUNT(*) FROM Artist").fetchone()[0]
+            artist_ids, artist_names = _fill(conn, "SELECT ArtistID, Name FROM Artist ORDER BY ArtistID",
+                                             (np.int64, object), artist_count)
+            link_count = conn.execute("SELECT COUNT(*) FROM ArtistTrack").fetchone()[0]
+            link_artists, link_rowids = _fill(
+                conn,
+                "SELECT at.ArtistID, t.rowid FROM ArtistTrack at JOIN Track t ON t.TrackID = at.TrackID "
+                "ORDER BY at.ArtistID",
+                (np.int64, np.int64), link_count)
+            album_rows = conn.execute("SELECT ArtistID, COUNT(*) FROM ArtistAlbum GROUP BY ArtistID").fetchall()
+        finally:
+            conn.execute("COMMIT")
+
+        genre_names = sorted({g for g in genres if g is not None})
+        codes = {name: i for i, name in enumerate(genre_names)}
+        artist_pos, known = _positions(artist_ids, link_artists)
+        artist_albums = np.zeros(len(artist_ids), dtype=np.int32)
+        if album_rows:
+            album_artists, album_counts = np.array(album_rows, dtype=np.int64).T
+            pos, ok = _positions(artist_ids, album_artists)
+            artist_albums[pos[ok]] = album_counts[ok]
+
+        genre_codes = np.array([codes.get(g, -1) for g in genres], dtype=np.int32)
+        track_counts = np.bincount(artist_pos[known], minlength=len(artist_ids))
+        artist_tracks = np.searchsorted(rowids, link_rowids[known]).astype(np.int32)
+        # Per-artist duration totals over the artist's tracks, for the averages
+        owners = np.repeat(np.arange(len(artist_ids)), track_counts)
+        linked = durations[artist_tracks]
+        valid = linked >= 0
+        known_durations = durations[durations >= 0]
+
+        arrays = {
+            "track_ids": track_ids.astype(str),
+            "genres": genre_codes,
+            "albums": albums,
+            "durations": durations,
+            "popularity": popularity,
+            "features": features,
+            # Tracks per genre code + 1, so [0] counts tracks without one
+            "genre_tracks": np.bincount(genre_codes + 1, minlength=len(genre_names) + 1).astype(np.int64),
+            "artist_ids": artist_ids.astype(np.int32),
+            "artist_names": artist_names.astype(str),
+            "artist_albums": artist_albums,
+            "artist_offsets": np.concatenate([[0], np.cumsum(track_counts)]).astype(np.int64),
+            "artist_tracks": artist_tracks,
+            "artist_track_counts": track_counts.astype(np.int32),
+            "artist_duration_sums": np.bincount(owners, weights=np.where(valid, linked, 0),
+                                                minlength=len(artist_ids)).astype(np.int64),
+            "artist_duration_counts": np.bincount(owners, weights=valid, minlength=len(artist_ids)).astype(np.int32),
+        }
+        totals = {"duration_sum": int(known_durations.sum(dtype=np.int64)), "duration_count": len(known_durations)}
+        return cls(arrays, genre_names, totals, fp)
+
+    # The arrays go into a new version directory and meta.json is switched
+    # to it last, so files a loaded snapshot still has memory-mapped are
+    # never overwritten (Windows refuses to replace those)
+    def save(self, path):
+        version = f"v{time.time_ns()}"
+        os.makedirs(os.path.join(path, version))
+        for name in _FILES:
+            np.save(os.path.join(path, version, f"{name}.npy"), getattr(self, name))
+        meta = os.path.join(path, "meta.json")
+        with open(meta + ".tmp", "w") as f:
+            json.dump({
+                "version": version,
+                "fingerprint": self.fingerprint,
+                "features": FEATURES,
+                "tracks": len(self.track_ids),
+                "artists": len(self.artist_ids),
+                "genre_names": self.genre_names,
+                "totals": self.totals,
+            }, f)
+        os.replace(meta + ".tmp", meta)
+        _remove_old_versions(path, version)
+
+    # Memory-map a saved snapshot; None when missing or not for this catalog
+    @classmethod
+    def load(cls, path, expected_fingerprint=None):
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            if expected_fingerprint is not None and meta["fingerprint"] != expected_fingerprint:
+                return None
+            # Snapshots saved before versioning keep their arrays in path
+            directory = os.path.join(path, meta.get("version", ""))
+            arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in _FILES}
+        except (OSError, ValueError, KeyError):
+            return None
+        if meta["features"] != FEATURES or len(arrays["genres"]) != meta["tracks"]:
+            return None
+        snapshot = cls(arrays, meta["genre_names"], meta["totals"], meta["fingerprint"])
+        snapshot.path = path
+        return snapshot
+
+    # ----------------------------
+    # Reports, matching the Backend functions of the same name
+    # ----------------------------
+
+    def tracks_per_genre(self):
+        counts = self.genre_tracks.tolist()
+        rows = [(None, counts[0])] if counts[0] else []
+        return rows + [(name, n) for name, n in zip(self.genre_names, counts[1:]) if n]
+
+    # Ties go to the highest ArtistID, as with the ArtistStats index
+    def top_artist(self):
+        counts = np.asarray(self.artist_track_counts)
+        if not len(counts) or counts.max() == 0:
+            return None
+        return str(self.artist_names[len(counts) - 1 - int(np.argmax(counts[::-1]))])
+
+    def artists_with_album_and_track(self):
+        keep = (np.asarray(self.artist_track_counts) > 0) & (np.asarray(self.artist_albums) > 0)
+        return self.artist_names[keep].tolist()
+
+    # [(name, average DurationMs)] for artists above the overall average,
+    # by ArtistID
+    def artists_above_avg_duration(self):
+        if not self.totals["duration_count"]:
+            return []
+        overall = self.totals["duration_sum"] / self.totals["duration_count"]
+        sums = np.asarray(self.artist_duration_sums, dtype=np.float64)
+        counts = np.asarray(self.artist_duration_counts)
+        averages = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        above = (counts > 0) & (averages > overall)
+        return list(zip(self.artist_names[above].tolist(), averages[above].tolist()))
+
+
+# Delete the arrays of versions older than keep (a newer one may be being
+# written by another process). Ones still memory-mapped by a loaded
+# snapshot cannot be removed on Windows; a later save retries them.
+def _remove_old_versions(path, keep):
+    for entry in os.listdir(path):
+        full = os.path.join(path, entry)
+        if entry.startswith("v") and os.path.isdir(full):
+            if entry[1:].isdigit() and int(entry[1:]) < int(keep[1:]):
+                shutil.rmtree(full, ignore_errors=True)
+        elif entry.endswith(".npy"):
+            try:
+                os.remove(full)
+            except OSError:
+                pass
+
+
+# Build and save the snapshot for db_path; called by Ingest after a load
+def write(db_path=None):
+    with _write_lock:
+        conn = Database.connect(db_path)
+        try:
+            snapshot = Snapshot.build(conn)
+        finally:
+            conn.close()
+        snapshot.save(snapshot_dir(db_path))
+    invalidate()
+    return snapshot
+
+
+# Forget the loaded snapshot (the files stay)
+def invalidate():
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+# Rebuild the snapshot for db_path in a background thread, unless one is
+# already running for it. Returns whether a rebuild was started.
+def rebuild_in_background(db_path=None):
+    db_path = db_path or Database.DB_PATH
+    with _lock:
+        if db_path in _rebuilding:
+            return False
+        _rebuilding.add(db_path)
+
+    def run():
+        try:
+            write(db_path)
+        except Exception:
+            log.exception("Rebuilding the snapshot %s failed", snapshot_dir(db_path))
+        finally:
+            with _lock:
+                _rebuilding.discard(db_path)
+
+    threading.Thread(target=run, name="snapshot-rebuild", daemon=True).start()
+    return True
+
+
+# The snapshot for the current database if it still matches the catalog,
+# else None. A snapshot left behind by a write is rebuilt in the
+# background; the caller reads SQLite meanwhile.
+def current(conn=None):
+    global _snapshot
+    path = snapshot_dir()
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    fp = fingerprint(conn or Database.get_connection())
+    with _lock:
+        if _snapshot is not None and _snapshot.path == path and _snapshot.fingerprint == fp:
+            return _snapshot
+        loaded = Snapshot.load(path, fp)
+        if loaded is not None:
+            _snapshot = loaded
+            return loaded
+    if rebuild_in_background():
+        log.info("Snapshot %s is out of date; reports read SQLite until it is rebuilt", path)
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the columnar catalog snapshot.")
+    parser.add_argument("db", nargs="?", default=Database.DB_PATH)
+    parser.add_argument("--rebuild", action="store_true", help="rebuild even if the snapshot is current")
+    args = parser.parse_args(argv)
+
+    Database.configure(args.db)
+    # Not current(), which would start a rebuild of its own
+    conn = Database.get_connection()
+    if args.rebuild or Snapshot.load(snapshot_dir(args.db), fingerprint(conn)) is None:
+        start = time.perf_counter()
+        write(args.db)
+        print(f"Wrote {snapshot_dir(args.db)} in {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    snapshot = Snapshot.load(snapshot_dir(args.db))
+    if snapshot is None:
+        print(f"Could not load {snapshot_dir(args.db)}", file=sys.stderr)
+        return 1
+    print(f"{len(snapshot)} tracks, {len(snapshot.artist_ids)} artists, {len(snapshot.genre_names)} genres; "
+          f"loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
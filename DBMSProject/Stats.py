@@ -0,0 +1,182 @@
+# Stats.py
+# Summary tables behind the report queries. GenreStats and ArtistStats are
+# created by migration 4 and kept current by triggers on Track, ArtistTrack
+# and ArtistAlbum, so reports read one row per genre/artist instead of
+# aggregating every track.
+#
+#   python Stats.py [music.db]             compare with the live aggregates
+#   python Stats.py [music.db] --refresh   recompute from scratch, then compare
+import argparse
+import sys
+
+import Database
+
+TABLES = [
+    # Genre may be NULL, so it is a unique index rather than a primary key
+    # and rows are matched with IS
+    """CREATE TABLE IF NOT EXISTS GenreStats (
+        Genre TEXT,
+        TrackCount INTEGER NOT NULL DEFAULT 0,
+        DurationCount INTEGER NOT NULL DEFAULT 0,
+        DurationSum INTEGER NOT NULL DEFAULT 0
+    )""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_genrestats_genre ON GenreStats (Genre)",
+    # TrackCount counts ArtistTrack links (as top_artist always has);
+    # DurationCount/DurationSum cover linked tracks that exist and have a
+    # duration (as AVG over the ArtistTrack/Track join does)
+    """CREATE TABLE IF NOT EXISTS ArtistStats (
+        ArtistID INTEGER PRIMARY KEY,
+        TrackCount INTEGER NOT NULL DEFAULT 0,
+        AlbumCount INTEGER NOT NULL DEFAULT 0,
+        DurationCount INTEGER NOT NULL DEFAULT 0,
+        DurationSum INTEGER NOT NULL DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_artiststats_tracks ON ArtistStats (TrackCount)",
+]
+
+
+def _add_genre(sign, row):
+    return f"""
+        INSERT INTO GenreStats (Genre)
+        SELECT {row}.Genre WHERE NOT EXISTS (SELECT 1 FROM GenreStats WHERE Genre IS {row}.Genre);
+        UPDATE GenreStats SET
+            TrackCount = TrackCount {sign} 1,
+            DurationCount = DurationCount {sign} ({row}.DurationMs IS NOT NULL),
+            DurationSum = DurationSum {sign} IFNULL({row}.DurationMs, 0)
+        WHERE Genre IS {row}.Genre;"""
+
+
+def _add_artist_duration(sign, row):
+    return f"""
+        UPDATE ArtistStats SET
+            DurationCount = DurationCount {sign} ({row}.DurationMs IS NOT NULL),
+            DurationSum = DurationSum {sign} IFNULL({row}.DurationMs, 0)
+        WHERE ArtistID IN (SELECT ArtistID FROM ArtistTrack WHERE TrackID = {row}.TrackID);"""
+
+
+def _add_link(sign, row):
+    return f"""
+        INSERT INTO ArtistStats (ArtistID) VALUES ({row}.ArtistID) ON CONFLICT (ArtistID) DO NOTHING;
+        UPDATE ArtistStats SET
+            TrackCount = TrackCount {sign} 1,
+            DurationCount = DurationCount {sign}
+                IFNULL((SELECT DurationMs IS NOT NULL FROM Track WHERE TrackID = {row}.TrackID), 0),
+            DurationSum = DurationSum {sign}
+                IFNULL((SELECT DurationMs FROM Track WHERE TrackID = {row}.TrackID), 0)
+        WHERE ArtistID = {row}.ArtistID;"""
+
+
+def _add_album(sign, row):
+    return f"""
+        INSERT INTO ArtistStats (ArtistID) VALUES ({row}.ArtistID) ON CONFLICT (ArtistID) DO NOTHING;
+        UPDATE ArtistStats SET AlbumCount = AlbumCount {sign} 1 WHERE ArtistID = {row}.ArtistID;"""
+
+
+TRIGGERS = {
+    "stats_track_ai": "AFTER INSERT ON Track BEGIN" + _add_genre("+", "new") + _add_artist_duration("+", "new"),
+    "stats_track_ad": "AFTER DELETE ON Track BEGIN" + _add_genre("-", "old") + _add_artist_duration("-", "old"),
+    "stats_track_au": (
+        "AFTER UPDATE OF Genre, DurationMs ON Track BEGIN"
+        + _add_genre("-", "old") + _add_artist_duration("-", "old")
+        + _add_genre("+", "new") + _add_artist_duration("+", "new")
+    ),
+    "stats_artisttrack_ai": "AFTER INSERT ON ArtistTrack BEGIN" + _add_link("+", "new"),
+    "stats_artisttrack_ad": "AFTER DELETE ON ArtistTrack BEGIN" + _add_link("-", "old"),
+    "stats_artistalbum_ai": "AFTER INSERT ON ArtistAlbum BEGIN" + _add_album("+", "new"),
+    "stats_artistalbum_ad": "AFTER DELETE ON ArtistAlbum BEGIN" + _add_album("-", "old"),
+}
+
+# The same aggregates computed from the catalog tables
+LIVE_GENRE_STATS = """
+    SELECT Genre, COUNT(*), COUNT(DurationMs), IFNULL(SUM(DurationMs), 0)
+    FROM Track GROUP BY Genre
+"""
+
+LIVE_ARTIST_STATS = """
+    SELECT a.ArtistID,
+           (SELECT COUNT(*) FROM ArtistTrack at WHERE at.ArtistID = a.ArtistID),
+           (SELECT COUNT(*) FROM ArtistAlbum aa WHERE aa.ArtistID = a.ArtistID),
+           (SELECT COUNT(t.DurationMs) FROM ArtistTrack at JOIN Track t ON t.TrackID = at.TrackID
+            WHERE at.ArtistID = a.ArtistID),
+           (SELECT IFNULL(SUM(t.DurationMs), 0) FROM ArtistTrack at JOIN Track t ON t.TrackID = at.TrackID
+            WHERE at.ArtistID = a.ArtistID)
+    FROM (SELECT ArtistID FROM ArtistTrack UNION SELECT ArtistID FROM ArtistAlbum) a
+"""
+
+
+# Migration step: create the summary tables and triggers and fill them
+def create_schema(conn):
+    for statement in TABLES:
+        conn.execute(statement)
+    create_triggers(conn)
+    refresh(conn)
+
+
+def create_triggers(conn):
+    for name, body in TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}\nEND")
+
+
+# Bulk loads drop the triggers, load, then refresh() and create_triggers()
+# inside the same transaction instead of updating row by row.
+def drop_triggers(conn):
+    for name in TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+# Recompute every summary row from the catalog tables
+def refresh(conn=None):
+    conn = conn or Database.get_connection()
+    conn.execute("DELETE FROM GenreStats")
+    conn.execute(
+        "INSERT INTO GenreStats (Genre, TrackCount, DurationCount, DurationSum) " + LIVE_GENRE_STATS
+    )
+    conn.execute("DELETE FROM ArtistStats")
+    conn.execute(
+        "INSERT INTO ArtistStats (ArtistID, TrackCount, AlbumCount, DurationCount, DurationSum) "
+        + LIVE_ARTIST_STATS
+    )
+
+
+# Compare the summary tables with the live aggregates. Returns a list of
+# (table, key, stored row, live row) for every difference.
+def check(conn=None):
+    conn = conn or Database.get_connection()
+    problems = []
+    comparisons = [
+        ("GenreStats", "SELECT Genre, TrackCount, DurationCount, DurationSum FROM GenreStats WHERE TrackCount <> 0",
+         LIVE_GENRE_STATS),
+        ("ArtistStats",
+         "SELECT ArtistID, TrackCount, AlbumCount, DurationCount, DurationSum FROM ArtistStats "
+         "WHERE TrackCount <> 0 OR AlbumCount <> 0",
+         LIVE_ARTIST_STATS + " WHERE 1"),
+    ]
+    for table, stored_sql, live_sql in comparisons:
+        stored = {row[0]: row for row in conn.execute(stored_sql)}
+        live = {row[0]: row for row in conn.execute(live_sql) if any(row[1:3])}
+        for key in stored.keys() | live.keys():
+            if stored.get(key) != live.get(key):
+                problems.append((table, key, stored.get(key), live.get(key)))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check or rebuild the report summary tables.")
+    parser.add_argument("db", nargs="?", default=Database.DB_PATH)
+    parser.add_argument("--refresh", action="store_true")
+    args = parser.parse_args(argv)
+
+    Database.configure(args.db)
+    if args.refresh:
+        with Database.transaction() as conn:
+            refresh(conn)
+        print("Summary tables rebuilt")
+    problems = check()
+    for table, key, stored, live in problems[:50]:
+        print(f"{table} {key!r}: stored {stored}, live {live}")
+    print("Summary tables consistent" if not problems else f"{len(problems)} inconsistent row(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# Tasks.py
+# Runs Backend calls on a small thread pool so the Tk event loop never
+# waits on SQLite. Results are handed back on the Tk thread by polling a
+# queue with root.after, since Tk widgets must only be touched from there.
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import Database
+
+DEFAULT_TIMEOUT = 30.0
+
+
+class TaskTimeout(Exception):
+    pass
+
+
+class _Task:
+    def __init__(self, key, fn, args, on_done, on_error, on_cancel, timeout):
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.cancelled = False
+        self.conn = None
+        self.future = None
+
+
+class TaskRunner:
+    # on_busy(key, busy) is called on the Tk thread when the first task for
+    # key starts and when the last one finishes
+    def __init__(self, root, max_workers=4, poll_ms=30, on_busy=None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="backend")
+        self._results = queue.Queue()
+        self._current = {}
+        self._conn_lock = threading.Lock()
+        self._after_id = root.after(poll_ms, self._poll)
+
+    # Run fn(*args) on a worker. A newer task with the same key supersedes
+    # this one: its result is dropped, its running query interrupted and its
+    # on_cancel() called.
+    def submit(self, key, fn, *args, on_done=None, on_error=None, on_cancel=None, timeout=DEFAULT_TIMEOUT):
+        previous = self._current.get(key)
+        if previous is not None:
+            self._cancel(previous)
+        elif self.on_busy:
+            self.on_busy(key, True)
+        task = _Task(key, fn, args, on_done, on_error, on_cancel, timeout)
+        self._current[key] = task
+        task.future = self._executor.submit(self._run, task)
+        if previous is not None and previous.on_cancel:
+            previous.on_cancel()
+        return task
+
+    # Whether a task for key is queued or running
+    def running(self, key):
+        return key in self._current
+
+    def cancel(self, key):
+        task = self._current.pop(key, None)
+        if task is not None:
+            self._cancel(task)
+            self._finished(task)
+            if task.on_cancel:
+                task.on_cancel()
+
+    def shutdown(self):
+        for key in list(self._current):
+            self.cancel(key)
+        self.root.after_cancel(self._after_id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # Worker thread
+    def _run(self, task):
+        if task.cancelled:
+            return
+        with self._conn_lock:
+            task.conn = Database.get_connection()
+        try:
+            result, error = task.fn(*task.args), None
+        except Exception as e:
+            result, error = None, e
+        finally:
+            with self._conn_lock:
+                task.conn = None
+        self._results.put((task, result, error))
+
+    def _cancel(self, task):
+        task.cancelled = True
+        task.future.cancel()
+        with self._conn_lock:
+            if task.conn is not None:
+                task.conn.interrupt()
+
+    def _finished(self, task):
+        if self.on_busy and task.key not in self._current:
+            self.on_busy(task.key, False)
+
+    # Tk thread
+    def _poll(self):
+        while True:
+            try:
+                task, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if task.cancelled or self._current.get(task.key) is not task:
+                continue
+            del self._current[task.key]
+            self._finished(task)
+            if error is None:
+                if task.on_done:
+                    task.on_done(result)
+            elif task.on_error:
+                task.on_error(error)
+
+        now = time.monotonic()
+        for task in list(self._current.values()):
+            if task.deadline is not None and now > task.deadline:
+                del self._current[task.key]
+                self._cancel(task)
+                self._finished(task)
+                if task.on_error:
+                    task.on_error(TaskTimeout(f"Timed out after {task.timeout:g}s"))
+
+        self._after_id = self.root.after(self.poll_ms, self._poll)
@@ -0,0 +1,243 @@
+# Widgets.py
+from collections import OrderedDict
+from tkinter import ttk
+
+
+# Call fn(*args) here and pass the result to on_done
+def _run_now(fn, *args, on_done):
+    on_done(fn(*args))
+
+
+# Combobox that looks up a bounded page of matches as the user types,
+# instead of holding every possible value. fetch(text, limit) returns the
+# list of values to offer. run(fn, *args, on_done) decides where fetch
+# runs, e.g. on a background task whose on_done comes back on the Tk
+# thread; by default it runs in place.
+class AutocompleteCombobox(ttk.Combobox):
+    IGNORED_KEYS = {"Up", "Down", "Left", "Right", "Return", "Escape", "Tab",
+                    "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R"}
+
+    def __init__(self, master, fetch, page_size=50, delay_ms=200, min_chars=2, cache_size=64, run=_run_now,
+                 **kwargs):
+        super().__init__(master, **kwargs)
+        self.fetch = fetch
+        self.run = run
+        self.page_size = page_size
+        self.delay_ms = delay_ms
+        self.min_chars = min_chars
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._after_id = None
+        # Text of the lookup whose answer is still wanted
+        self._wanted = None
+        self.bind("<KeyRelease>", self._on_key)
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    # Debounce: only query once typing pauses for delay_ms
+    def _on_key(self, event):
+        if event.keysym in self.IGNORED_KEYS:
+            return
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+        self._after_id = self.after(self.delay_ms, self._refresh)
+
+    # Small LRU of recent prefixes so backspacing and retyping is free
+    def _refresh(self):
+        self._after_id = None
+        text = self.get().strip()
+        if len(text) < self.min_chars:
+            self._wanted = None
+            self["values"] = ()
+            return
+        key = text.casefold()
+        if key in self._cache:
+            self._wanted = None
+            self._cache.move_to_end(key)
+            self["values"] = self._cache[key]
+            return
+        self._wanted = text
+        self.run(self.fetch, text, self.page_size, on_done=lambda values: self._fetched(text, values))
+
+    def _fetched(self, text, values):
+        self._cache[text.casefold()] = values
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        # Answers for text that has since been edited are only cached
+        if text == self._wanted and self.get().strip() == text:
+            self._wanted = None
+            self["values"] = values
+
+
+# None first, then numbers, then everything else by its text
+def _sort_key(value):
+    if value is None:
+        return (0, 0, "")
+    if isinstance(value, (int, float)):
+        return (1, value, "")
+    return (2, 0, str(value))
+
+
+# Treeview-backed result list that only ever holds the visible rows as Tk
+# items. Rows are kept in a Python list and pulled from a page source as the
+# user scrolls towards the end of what has been loaded.
+#
+# A page source is called as source(after, limit, deliver, fail); it fetches
+# up to limit rows following the position `after` (None for the first page)
+# and calls deliver(rows, next_after), possibly later from the Tk event loop,
+# or fail(error) if the page could not be fetched (error is None when the
+# fetch was cancelled). Scrolling after a failure asks for the page again.
+class ResultGrid(ttk.Frame):
+    def __init__(self, master, columns, height=20, page_size=500, formatters=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.columns = list(columns)
+        self.page_size = page_size
+        self.formatters = formatters or {}
+        self.rows = []
+        self.offset = 0
+        self.sort_column = None
+        self.sort_reverse = False
+        self._source = None
+        self._next_after = None
+        self._exhausted = True
+        self._loading = False
+        self._failed = False
+        self._generation = 0
+
+        ids = [f"c{i}" for i in range(len(self.columns))]
+        self.tree = ttk.Treeview(self, columns=ids, show="headings", height=height, selectmode="browse")
+        for i, (column_id, title) in enumerate(zip(ids, self.columns)):
+            self.tree.heading(column_id, text=title, command=lambda i=i: self.sort_by(i))
+            self.tree.column(column_id, stretch=True, width=150)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.status = ttk.Label(self, text="")
+
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.status.grid(row=1, column=0, columnspan=2, sticky="w")
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_to(self.offset - 3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_to(self.offset + 3))
+        self.tree.bind("<Next>", lambda e: self.scroll_to(self.offset + self.visible_rows))
+        self.tree.bind("<Prior>", lambda e: self.scroll_to(self.offset - self.visible_rows))
+
+    @property
+    def visible_rows(self):
+        return int(self.tree.cget("height"))
+
+    # Show rows from a new page source, dropping whatever was shown before
+    def load(self, source):
+        self._generation += 1
+        self.rows = []
+        self.offset = 0
+        self._source = source
+        self._next_after = None
+        self._exhausted = False
+        self._loading = False
+        self._failed = False
+        self._render()
+        self._request_page()
+
+    # Show a fixed list of rows
+    def set_rows(self, rows):
+        self.load(lambda after, limit, deliver, fail: deliver(rows, None))
+
+    def scroll_to(self, offset):
+        last = max(len(self.rows) - self.visible_rows, 0)
+        self.offset = min(max(int(offset), 0), last)
+        self._render()
+        if not self._exhausted and self.offset + 2 * self.visible_rows >= len(self.rows):
+            self._request_page()
+        return "break"
+
+    # Sort what has been loaded so far; pages arriving later are merged in
+    def sort_by(self, index):
+        if self.sort_column == index:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column, self.sort_reverse = index, False
+        self._sort()
+        for i, title in enumerate(self.columns):
+            arrow = (" ▼" if self.sort_reverse else " ▲") if i == index else ""
+            self.tree.heading(f"c{i}", text=title + arrow)
+        self.scroll_to(0)
+
+    def _sort(self):
+        if self.sort_column is None:
+            return
+        index = self.sort_column
+        self.rows.sort(key=lambda row: _sort_key(row[index]), reverse=self.sort_reverse)
+
+    def _request_page(self):
+        if self._loading or self._exhausted or self._source is None:
+            return
+        self._loading = True
+        self._failed = False
+        generation = self._generation
+        self._update_status()
+        self._source(self._next_after, self.page_size,
+                     lambda rows, next_after: self._deliver(generation, rows, next_after),
+                     lambda error=None: self._fail(generation, error))
+
+    # The page was not fetched; the rows loaded so far stay
+    def _fail(self, generation, error):
+        if generation != self._generation:
+            return
+        self._loading = False
+        self._failed = True
+        self._update_status()
+
+    def _deliver(self, generation, rows, next_after):
+        if generation != self._generation:
+            return
+        rows = list(rows)
+        self._loading = False
+        self._next_after = next_after
+        self._exhausted = next_after is None or len(rows) < self.page_size
+        self.rows.extend(rows)
+        self._sort()
+        self._render()
+        # Keep filling until the view has a screenful of look-ahead
+        if not self._exhausted and self.offset + 2 * self.visible_rows >= len(self.rows):
+            self._request_page()
+
+    def _render(self):
+        self.tree.delete(*self.tree.get_children())
+        for row in self.rows[self.offset:self.offset + self.visible_rows]:
+            self.tree.insert("", "end", values=[self._format(i, v) for i, v in enumerate(row)])
+        total = len(self.rows) + (0 if self._exhausted else self.visible_rows)
+        if total:
+            self.scrollbar.set(self.offset / total, min((self.offset + self.visible_rows) / total, 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self._update_status()
+
+    def _format(self, index, value):
+        formatter = self.formatters.get(index)
+        return formatter(value) if formatter else ("" if value is None else value)
+
+    def _update_status(self):
+        count = f"{len(self.rows)} rows"
+        if self._loading:
+            count += " (loading...)"
+        elif self._failed:
+            count += " (loading stopped; scroll to retry)"
+        elif not self._exhausted:
+            count += " (more when scrolled)"
+        self.status.config(text=count)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            total = len(self.rows) + (0 if self._exhausted else self.visible_rows)
+            return self.scroll_to(float(amount) * total)
+        step = self.visible_rows if unit == "pages" else 1
+        return self.scroll_to(self.offset + int(amount) * step)
+
+    def _on_wheel(self, event):
+        # delta is a multiple of 120 on Windows and small values on macOS
+        steps = int(event.delta / 120) or (1 if event.delta > 0 else -1)
+        return self.scroll_to(self.offset - steps * 3)
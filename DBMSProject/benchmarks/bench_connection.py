@@ -0,0 +1,95 @@
+# bench_connection.py
+# Compares Backend throughput with the old connect/commit/close-per-query
+# _run against the pooled Database connection layer.
+#
+#   python benchmarks/bench_connection.py [--ops 2000]
+import argparse
+import contextlib
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Backend
+import Database
+import Migrations
+
+
+# The original per-call helper, kept here as the baseline
+def legacy_run(query, params=(), fetch=False, many=False):
+    conn = sqlite3.connect(Database.DB_PATH)
+    cur = conn.cursor()
+    if many:
+        cur.executemany(query, params)
+        res = None
+    else:
+        cur.execute(query, params)
+        res = cur.fetchall() if fetch else None
+    conn.commit()
+    conn.close()
+    return res
+
+
+def seed(path, tracks=1000):
+    conn = sqlite3.connect(path, isolation_level=None)
+    Migrations.migrate(conn)
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO Track (TrackID, Name, DurationMs, Genre) VALUES (?, ?, ?, ?)",
+        [(f"t{i}", f"Track {i}", 180000 + i, "pop") for i in range(tracks)],
+    )
+    conn.execute("INSERT INTO Playlist (Name, CreatedDate) VALUES ('bench', '2024-01-01')")
+    conn.commit()
+    conn.close()
+
+
+def workload(ops):
+    pid = Backend.get_playlist_id_by_name("bench")
+    for i in range(ops):
+        step = i % 4
+        if step == 0:
+            Backend.get_track_id_by_name(f"Track {i % 1000}")
+        elif step == 1:
+            Backend.add_track_to_playlist(pid, f"t{i % 1000}")
+        elif step == 2:
+            Backend.insert_artist_with_album(f"Artist {i}", f"Album {i}")
+        else:
+            Backend.get_playlist_names()
+
+
+def measure(label, ops):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path)
+        Database.configure(path)
+        start = time.perf_counter()
+        workload(ops)
+        elapsed = time.perf_counter() - start
+        Database.close_connection()
+    print(f"{label:<8} {ops / elapsed:>10.0f} ops/sec  ({elapsed:.2f}s for {ops} ops)")
+    return ops / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    pooled_run = Backend._run
+    pooled_transaction = Database.transaction
+    Backend._run = legacy_run
+    Database.transaction = contextlib.nullcontext
+    try:
+        before = measure("before", args.ops)
+    finally:
+        Backend._run = pooled_run
+        Database.transaction = pooled_transaction
+    after = measure("after", args.ops)
+    print(f"speedup  {after / before:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# bench_dedup.py
+# Duplicate detection on a synthetic catalog: the old Track self-join, the
+# exact GROUP BY that replaced it, and the clustering in Dedup.py (first run,
+# repeat run, and an incremental run after a small load).
+#
+# Names are skewed the way real catalogs are: a handful of titles such as
+# "Intro" recur thousands of times, often with the same duration and in
+# different case/spacing, while most titles are unique.
+#
+#   python benchmarks/bench_dedup.py [--tracks 1000000] [--seed 1]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Database
+import Dedup
+import Search
+import Stats
+
+COMMON_TITLES = ["Intro", "Outro", "Interlude", "Home", "Untitled", "Skit", "Forever", "Hold On"]
+
+SELF_JOIN = """
+    SELECT t1.Name, t1.DurationMs
+    FROM Track t1
+    JOIN Track t2 ON t1.Name = t2.Name AND t1.DurationMs = t2.DurationMs AND t1.TrackID <> t2.TrackID
+    GROUP BY t1.Name, t1.DurationMs
+"""
+
+GROUP_BY = """
+    SELECT Name, DurationMs FROM Track
+    WHERE Name IS NOT NULL AND DurationMs IS NOT NULL
+    GROUP BY Name, DurationMs HAVING COUNT(*) > 1
+"""
+
+
+def variant(rng, title):
+    return rng.choice([title, title.upper(), title.lower(), f" {title}", f"{title}  "])
+
+
+def tracks(rng, count, start=0, common_share=0.03):
+    durations = [rng.randint(60, 120) * 1000 for _ in range(20)]
+    for i in range(start, start + count):
+        if rng.random() < common_share:
+            name = variant(rng, rng.choice(COMMON_TITLES))
+            duration = rng.choice(durations) + rng.choice((0, 0, 0, 250, 900))
+        elif rng.random() < 0.05:
+            # A re-release of an earlier track, sometimes re-mastered a little longer
+            n = rng.randint(0, max(i - 1, 0))
+            name, duration = f"Song {n}", 180000 + (n * 7919) % 120000 + rng.choice((0, 0, 1500))
+        else:
+            name, duration = f"Song {i}", 180000 + (i * 7919) % 120000
+        yield f"t{i}", name, duration, rng.randint(1, 50000)
+
+
+def load(conn, rows):
+    for track_id, name, duration, artist_id in rows:
+        conn.execute("INSERT INTO Track (TrackID, Name, DurationMs) VALUES (?, ?, ?)", (track_id, name, duration))
+        conn.execute("INSERT INTO ArtistTrack (ArtistID, TrackID) VALUES (?, ?)", (artist_id, track_id))
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<34} {time.perf_counter() - start:8.2f} s   {len(result)} group(s)")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skip-self-join", action="store_true")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        Database.configure(os.path.join(tmp, "dedup.db"))
+        try:
+            conn = Database.get_connection()
+            with Database.transaction():
+                # Load the way full ingest does: no per-row trigger work
+                Search.drop_triggers(conn)
+                Stats.drop_triggers(conn)
+                Dedup.drop_triggers(conn)
+                load(conn, tracks(rng, args.tracks))
+                Dedup.reset(conn)
+                Dedup.create_triggers(conn)
+            print(f"{args.tracks} tracks")
+
+            if not args.skip_self_join:
+                timed("self-join (old)", lambda: conn.execute(SELF_JOIN).fetchall())
+            timed("GROUP BY exact", lambda: conn.execute(GROUP_BY).fetchall())
+            timed("Dedup first run (computes keys)", Dedup.find_clusters)
+            timed("Dedup repeat run", Dedup.find_clusters)
+            timed("Dedup by artist", lambda: Dedup.find_clusters(by_artist=True))
+
+            with Database.transaction():
+                load(conn, tracks(rng, 1000, start=args.tracks, common_share=0.2))
+            timed("Dedup incremental (+1000 tracks)", lambda: Dedup.find_clusters(incremental=True))
+        finally:
+            Database.close_connection()
+            Database.configure(Database.DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
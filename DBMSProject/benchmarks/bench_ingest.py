@@ -0,0 +1,89 @@
+# bench_ingest.py
+# Sharded ingest: generates a synthetic catalog, splits it into shard
+# files, then loads the shard directory with 1, 2, 4, ... worker processes
+# (up to the core count) into fresh databases. Prints the wall clock and
+# the per-stage seconds of each load, and checks that every load wrote the
+# same rows and IDs.
+#
+#   python benchmarks/bench_ingest.py [--rows 1m] [--shards 16] [--max-workers 8] [--out ingest.json]
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+import Ingest
+import generate_catalog
+
+TABLES = ("Track", "Artist", "Album", "ArtistTrack", "ArtistAlbum")
+
+
+def write_shards(directory, rows, shards, seed):
+    import pandas as pd
+    catalog = os.path.join(directory, "catalog.csv")
+    generate_catalog.generate(catalog, rows, seed)
+    shard_dir = os.path.join(directory, "shards")
+    os.makedirs(shard_dir)
+    per_shard = -(-rows // shards)
+    for i, frame in enumerate(pd.read_csv(catalog, chunksize=per_shard)):
+        frame.to_csv(os.path.join(shard_dir, f"region_{i:03d}.csv"), index=False)
+    os.remove(catalog)
+    return shard_dir
+
+
+# Digest of the catalog tables, to compare loads
+def digest(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        h = hashlib.sha1()
+        for table in TABLES:
+            for row in conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2"):
+                h.update(repr(row).encode())
+        return h.hexdigest()
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark sharded ingest across worker counts.")
+    parser.add_argument("--rows", default="200k", help="row count, e.g. 100k, 1m")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the results here as JSON")
+    args = parser.parse_args(argv)
+
+    rows = generate_catalog.parse_rows(args.rows)
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= args.max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != args.max_workers:
+        worker_counts.append(args.max_workers)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        shard_dir = write_shards(tmp, rows, args.shards, args.seed)
+        print(f"{rows} rows in {args.shards} shards; {os.cpu_count()} cores")
+        digests = set()
+        for workers in worker_counts:
+            db_path = os.path.join(tmp, f"ingest_{workers}.db")
+            stats = Ingest.ingest(shard_dir, db_path, workers=workers)
+            digests.add(digest(db_path))
+            results.append(stats)
+            stages = "  ".join(f"{stage} {seconds:6.2f}s" for stage, seconds in stats["stages"].items())
+            print(f"  {workers:>3} workers  {stats['seconds']:7.2f}s  {stats['rows_per_sec']:>10,.0f} rows/sec  {stages}")
+    print("All loads identical" if len(digests) == 1 else f"Loads differ: {len(digests)} distinct results")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"rows": rows, "shards": args.shards, "cores": os.cpu_count(), "runs": results}, f, indent=2)
+    return 0 if len(digests) == 1 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# bench_search.py
+# Compares name lookups on an existing catalog: exact match, LIKE
+# substring scan, and the FTS5 search in Search.py.
+#
+#   python benchmarks/bench_search.py [--db music.db] [--queries 200]
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Database
+import Search
+
+
+def timed(fn, queries):
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.95) - 1]
+
+
+# Swap two adjacent letters in the longest word
+def typo(query):
+    word = max(query.split(), key=len)
+    if len(word) < 4:
+        return query
+    i = len(word) // 2
+    return query.replace(word, word[:i - 1] + word[i] + word[i - 1] + word[i + 1:], 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=Database.DB_PATH)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    Database.configure(args.db)
+    conn = Database.get_connection()
+    total = conn.execute("SELECT MAX(rowid) FROM Track").fetchone()[0] or 0
+    if not total:
+        sys.exit("No tracks to search; run Ingest.py first")
+    rng = random.Random(args.seed)
+    names = []
+    while len(names) < args.queries:
+        row = conn.execute("SELECT Name FROM Track WHERE rowid = ?", (rng.randint(1, total),)).fetchone()
+        if row and row[0] and Search.tokenize(row[0]):
+            names.append(row[0])
+    # What a user types: the first word or two, last one cut short
+    prefixes = []
+    for name in names:
+        words = name.split()[:2]
+        words[-1] = words[-1][:max(3, len(words[-1]) // 2)]
+        prefixes.append(" ".join(words))
+
+    cases = [
+        ("equality (Name = ?)", names,
+         lambda q: conn.execute("SELECT TrackID FROM Track WHERE Name = ?", (q,)).fetchall()),
+        ("LIKE '%q%' LIMIT 20", prefixes,
+         lambda q: conn.execute("SELECT TrackID, Name FROM Track WHERE Name LIKE ? LIMIT 20",
+                                (f"%{q}%",)).fetchall()),
+        ("FTS prefix, ranked", prefixes,
+         lambda q: Search.search(q, kinds=("track",), fuzzy=False)),
+        ("FTS all kinds", prefixes,
+         lambda q: Search.search(q, fuzzy=False)),
+        ("FTS with typo", [typo(p) for p in prefixes],
+         lambda q: Search.search(q, kinds=("track",))),
+    ]
+    print(f"{total} tracks, {args.queries} queries")
+    for label, queries, fn in cases:
+        median, p95 = timed(fn, queries)
+        print(f"{label:<22} median {median:7.2f} ms   p95 {p95:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bench_similarity.py
+# Times the feature index in Similarity.py on an existing catalog: building
+# it from Track, memory-mapping the cached copy, and top-k queries with and
+# without a genre filter.
+#
+#   python benchmarks/bench_similarity.py [--db music.db] [--queries 200] [--k 20]
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Database
+import Similarity
+
+
+def timed(fn, items):
+    times = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.95) - 1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=Database.DB_PATH)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    Database.configure(args.db)
+    conn = Database.get_connection()
+
+    Similarity.invalidate(args.db)
+    start = time.perf_counter()
+    index = Similarity.get_index(conn)
+    print(f"{len(index)} tracks; build and save {time.perf_counter() - start:.2f} s")
+    if not len(index):
+        sys.exit("No tracks; run Ingest.py first")
+    Similarity._index = None
+    start = time.perf_counter()
+    index = Similarity.get_index(conn)
+    print(f"load cached (mmap) {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rng = random.Random(args.seed)
+    rows = [rng.randrange(len(index)) for _ in range(args.queries)]
+    track_ids = [str(index.ids[r]) for r in rows]
+    genres = {str(index.ids[r]): index.genre_names[index.genres[r]] if index.genres[r] >= 0 else None for r in rows}
+    vectors = [index.matrix[r] for r in rows]
+
+    cases = [
+        (f"similar_tracks k={args.k}", track_ids, lambda t: Similarity.similar_tracks(t, args.k)),
+        ("same genre only", track_ids, lambda t: Similarity.similar_tracks(t, args.k, genres[t])),
+        ("index.nearest (no lookup)", vectors, lambda v: index.nearest(v, args.k)),
+    ]
+    for label, items, fn in cases:
+        median, p95 = timed(fn, items)
+        print(f"{label:<26} median {median:7.2f} ms   p95 {p95:7.2f} ms")
+
+    start = time.perf_counter()
+    index.nearest(vectors, args.k)
+    per_query = (time.perf_counter() - start) * 1000 / len(vectors)
+    print(f"{'batched, per query':<26} {per_query:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# bench_startup.py
+# Time-to-first-paint of the GUI against catalog size. Starts Frontend.py
+# --startup-time in a fresh process per run, with lazy tabs (the default)
+# and with --eager, and prints the median time to the first paint and to
+# the playlist dropdown being filled. Needs a display (e.g. xvfb-run).
+#
+#   python benchmarks/bench_startup.py small.db large.db [--repeat 5]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+FRONTEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Frontend.py")
+
+
+def startup(db, eager):
+    command = [sys.executable, FRONTEND, "--db", db, "--startup-time"] + (["--eager"] if eager else [])
+    out = subprocess.run(command, capture_output=True, text=True, check=True, timeout=120)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("db", nargs="+")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'database':<30}{'mode':<7}{'tracks':>9}{'first paint ms':>16}{'playlists ms':>14}")
+    for db in args.db:
+        for eager in (False, True):
+            runs = [startup(db, eager) for _ in range(args.repeat)]
+            paint = statistics.median(r["first_paint_ms"] for r in runs)
+            loaded = statistics.median(r["playlists_loaded_ms"] for r in runs)
+            print(f"{os.path.basename(db):<30}{'eager' if eager else 'lazy':<7}{runs[0]['tracks']:>9}"
+                  f"{paint:>16.1f}{loaded:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
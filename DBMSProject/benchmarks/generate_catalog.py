@@ -0,0 +1,124 @@
+# generate_catalog.py
+# Writes a synthetic Spotify-schema CSV for Ingest.py, with the same
+# columns as the Kaggle dataset.csv. The same --rows and --seed always give
+# the same file. Artists, albums and genres follow Zipf-like distributions
+# so a few artists and genres own most tracks, as in the real catalog; a
+# small share of rows repeat an earlier title and duration and a few have
+# no artist.
+#
+#   python benchmarks/generate_catalog.py --rows 100k --out catalog_100k.csv [--seed 1]
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    "track_id", "artists", "album_name", "track_name", "popularity", "duration_ms", "explicit",
+    "danceability", "energy", "key", "loudness", "mode", "speechiness", "acousticness",
+    "instrumentalness", "liveness", "valence", "tempo", "time_signature", "track_genre",
+]
+
+GENRES = 114
+CHUNK_ROWS = 100000
+_ID_ALPHABET = np.frombuffer(b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz", dtype="S1")
+_WORDS = np.array("love night heart time day life world dream fire rain light home baby girl way "
+                  "summer blue gold wild river sky road city moon star sun shadow dance run fall".split())
+
+
+# "10k" -> 10000, "1m" -> 1000000
+def parse_rows(text):
+    text = text.strip().lower()
+    scale = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+# Index in [0, n) drawn with probability proportional to 1 / (rank + 1)^s
+def _zipf(rng, n, s, size):
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    return rng.choice(n, size=size, p=weights / weights.sum())
+
+
+# 22 base-62 characters, like Spotify track IDs
+def _track_ids(rng, size):
+    chars = _ID_ALPHABET[rng.integers(0, len(_ID_ALPHABET), (size, 22))]
+    return np.ascontiguousarray(chars).view("S22").ravel().astype(str)
+
+
+# One to three words; most titles also get a number so they stay distinct
+def _titles(rng, start, size):
+    words = _WORDS[rng.integers(0, len(_WORDS), (size, 3))]
+    lengths = rng.integers(1, 4, size)
+    numbered = rng.random(size) < 0.7
+    return [" ".join(w[:n]).title() + (f" {start + i}" if numbered[i] else "")
+            for i, (w, n) in enumerate(zip(words, lengths))]
+
+
+def _chunk(rng, start, size, artists, previous):
+    artist = _zipf(rng, artists, 1.1, size)
+    # Each artist has a handful of albums; early ones get most tracks
+    album = rng.geometric(0.45, size).clip(max=12)
+    genre = _zipf(rng, GENRES, 0.9, size)
+    frame = pd.DataFrame({
+        "track_id": _track_ids(rng, size),
+        "artists": [f"Artist {a}" for a in artist],
+        "album_name": [f"Album {a}-{b}" for a, b in zip(artist, album)],
+        "track_name": _titles(rng, start, size),
+        "popularity": np.clip(rng.gamma(2.0, 12.0, size), 0, 100).astype(int),
+        "duration_ms": np.clip(rng.normal(215000, 55000, size), 30000, 900000).astype(int),
+        "explicit": rng.random(size) < 0.09,
+        "danceability": rng.beta(5, 3, size).round(3),
+        "energy": rng.beta(4, 2.5, size).round(3),
+        "key": rng.integers(0, 12, size),
+        "loudness": np.clip(rng.normal(-8, 4, size), -45, 2).round(3),
+        "mode": (rng.random(size) < 0.64).astype(int),
+        "speechiness": rng.beta(1, 12, size).round(4),
+        "acousticness": rng.beta(0.7, 1.6, size).round(4),
+        "instrumentalness": np.where(rng.random(size) < 0.7, 0.0, rng.beta(0.5, 1, size)).round(4),
+        "liveness": rng.beta(1.5, 6, size).round(4),
+        "valence": rng.beta(2.2, 2.2, size).round(3),
+        "tempo": np.clip(rng.normal(122, 29, size), 40, 220).round(3),
+        "time_signature": rng.choice([3, 4, 4, 4, 4, 4, 5], size),
+        "track_genre": [f"genre-{g}" for g in genre],
+    })
+
+    # Re-releases: a title and duration from the previous chunk (or this
+    # one, for the first) under another album
+    repeat = np.flatnonzero(rng.random(size) < 0.05)
+    pool = frame if previous is None else previous
+    source = rng.integers(0, len(pool), len(repeat))
+    names, durations = pool["track_name"].to_numpy()[source], pool["duration_ms"].to_numpy()[source]
+    frame.loc[repeat, "track_name"] = names
+    frame.loc[repeat, "duration_ms"] = durations
+    frame.loc[rng.random(size) < 0.001, "artists"] = None
+    frame.index = np.arange(start, start + size)
+    return frame
+
+
+# Write rows rows to out (a path or file object) a chunk at a time
+def generate(out, rows, seed=1):
+    rng = np.random.default_rng(seed)
+    artists = max(rows // 25, 10)
+    previous = None
+    for start in range(0, rows, CHUNK_ROWS):
+        frame = _chunk(rng, start, min(CHUNK_ROWS, rows - start), artists, previous)
+        frame.to_csv(out, mode="w" if start == 0 else "a", header=start == 0, columns=COLUMNS)
+        previous = frame
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Spotify-schema catalog CSV.")
+    parser.add_argument("--rows", default="10k", help="row count, e.g. 10k, 100k, 1m")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="-", help="output path (default stdout)")
+    args = parser.parse_args(argv)
+
+    rows = parse_rows(args.rows)
+    generate(sys.stdout if args.out == "-" else args.out, rows, args.seed)
+    if args.out != "-":
+        print(f"Wrote {rows} rows to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
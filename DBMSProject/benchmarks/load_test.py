@@ -0,0 +1,212 @@
+# load_test.py
+# Load test for Server.py: a number of client threads each keep one HTTP
+# connection open and send a weighted mix of catalog queries for a fixed
+# time, optionally pipelining several requests before reading the answers.
+# Prints requests/sec and latency percentiles overall and per endpoint.
+#
+#   python benchmarks/load_test.py --url http://127.0.0.1:8080 [--concurrency 16] [--duration 10]
+#   python benchmarks/load_test.py --db music.db      start a server on a free port first
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# (weight, endpoint, function of the sampled values returning the path)
+READ_MIX = [
+    (20, "get_tracks_in_playlist_by_name", lambda s, r: f"/api/get_tracks_in_playlist_by_name?playlist_name={quote(r.choice(s['playlists']))}"),
+    (20, "find_artist_by_track_name", lambda s, r: f"/api/find_artist_by_track_name?track_name={quote(r.choice(s['names']))}"),
+    (15, "search_tracks", lambda s, r: f"/api/search_tracks?query={quote(r.choice(s['words']))}"),
+    (10, "tracks_per_genre", lambda s, r: "/api/tracks_per_genre"),
+    (10, "iter_tracks", lambda s, r: f"/api/iter_tracks?limit=50&after={quote(json.dumps(r.choice(s['ids'])))}"),
+    (10, "get_track_id_by_name", lambda s, r: f"/api/get_track_id_by_name?name={quote(r.choice(s['names']))}"),
+    (10, "iter_tracks_per_genre", lambda s, r: "/api/iter_tracks_per_genre?limit=20"),
+    (5, "similar_tracks", lambda s, r: f"/api/similar_tracks?track_id={quote(r.choice(s['ids']))}&k=10"),
+]
+
+# Added to the mix by --writes: one track added to the load test playlist
+WRITE_MIX = [
+    (5, "add_track_to_playlist", lambda s, r: ("/api/add_track_to_playlist",
+                                               {"playlist_id": s["playlist_id"], "track_id": r.choice(s["ids"])})),
+]
+
+
+class Client:
+    def __init__(self, host, port):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile = self.sock.makefile("rb")
+        self.host = host
+
+    def send(self, path, body=None):
+        if body is None:
+            request = f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode()
+        else:
+            data = json.dumps(body).encode()
+            request = (f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                       f"Content-Length: {len(data)}\r\n\r\n").encode() + data
+        self.sock.sendall(request)
+
+    # (status, body bytes) of the next response on the connection
+    def receive(self):
+        status = int(self.rfile.readline().split()[1])
+        length = 0
+        while True:
+            line = self.rfile.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, self.rfile.read(length)
+
+    def request(self, path, body=None):
+        self.send(path, body)
+        status, data = self.receive()
+        return status, json.loads(data)
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+
+# Values to build requests from, read through the server itself
+def sample(host, port, writes):
+    client = Client(host, port)
+    try:
+        tracks = client.request("/api/iter_tracks?limit=1000")[1]["rows"]
+        if not tracks:
+            raise SystemExit("The catalog is empty; run Ingest.py first")
+        playlists = client.request("/api/get_playlist_names")[1]["result"]
+        values = {
+            "ids": [track_id for track_id, _name in tracks],
+            "names": [name for _id, name in tracks if name],
+            "words": sorted({name.split()[0][:4].lower() for _id, name in tracks if name}),
+            "playlists": playlists or ["Load Test"],
+        }
+        if writes:
+            client.request("/api/create_playlist", {"name": "Load Test", "created_date": "2024-01-01"})
+            values["playlist_id"] = client.request("/api/get_playlist_id_by_name?name=Load%20Test")[1]["result"]
+        return values
+    finally:
+        client.close()
+
+
+def worker(host, port, mix, values, deadline, pipeline, seed, results):
+    rng = random.Random(seed)
+    weights = [weight for weight, _name, _make in mix]
+    client = Client(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            batch = rng.choices(mix, weights, k=pipeline)
+            start = time.perf_counter()
+            for _weight, _name, make in batch:
+                request = make(values, rng)
+                if isinstance(request, tuple):
+                    client.send(*request)
+                else:
+                    client.send(request)
+            for _weight, name, _make in batch:
+                status, _body = client.receive()
+                results.append((name, (time.perf_counter() - start) * 1000, status))
+    finally:
+        client.close()
+
+
+def percentiles(times):
+    times = sorted(times)
+    pick = lambda q: times[min(int(len(times) * q), len(times) - 1)]
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": times[-1],
+            "mean_ms": statistics.fmean(times)}
+
+
+def start_server(db):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen([sys.executable, os.path.join(HERE, "..", "Server.py"), "--db", db, "--port", str(port)],
+                              stdout=subprocess.PIPE, text=True)
+    server.stdout.readline()
+    return server, port
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the HTTP/JSON server.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--db", help="start Server.py on this database instead of using --url")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--pipeline", type=int, default=1, help="requests sent before reading the answers")
+    parser.add_argument("--writes", action="store_true", help="mix in playlist writes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the results here as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.db:
+        server, port = start_server(args.db)
+        host = "127.0.0.1"
+    else:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    try:
+        values = sample(host, port, args.writes)
+        mix = READ_MIX + (WRITE_MIX if args.writes else [])
+        results = []
+        deadline = time.perf_counter() + args.duration
+        threads = [
+            threading.Thread(target=worker, args=(host, port, mix, values, deadline, args.pipeline,
+                                                  args.seed + i, results))
+            for i in range(args.concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if not results:
+        raise SystemExit("No requests completed")
+    errors = sum(1 for _name, _ms, status in results if status != 200)
+    report = {
+        "concurrency": args.concurrency,
+        "pipeline": args.pipeline,
+        "seconds": elapsed,
+        "requests": len(results),
+        "errors": errors,
+        "requests_per_sec": len(results) / elapsed,
+        "latency": percentiles([ms for _name, ms, _status in results]),
+        "endpoints": {},
+    }
+    for _weight, name, _make in mix:
+        times = [ms for n, ms, _status in results if n == name]
+        if times:
+            report["endpoints"][name] = {"requests": len(times), **percentiles(times)}
+
+    latency = report["latency"]
+    print(f"{report['requests']} requests in {elapsed:.1f}s with {args.concurrency} clients "
+          f"(pipeline {args.pipeline}): {report['requests_per_sec']:,.0f} req/sec, {errors} errors")
+    print(f"latency p50 {latency['p50_ms']:.2f} ms  p95 {latency['p95_ms']:.2f} ms  "
+          f"p99 {latency['p99_ms']:.2f} ms  max {latency['max_ms']:.2f} ms")
+    for name, s in report["endpoints"].items():
+        print(f"  {name:<34}{s['requests']:>8}  p50 {s['p50_ms']:7.2f}  p99 {s['p99_ms']:7.2f} ms")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+# run_benchmarks.py
+# End-to-end benchmark: generates a synthetic catalog (generate_catalog.py),
+# times a full and an incremental Ingest.ingest of it (and an incremental
+# load of changed rows, the weekly-delta case), then times every
+# public Backend function against the loaded database and writes the
+# results to a JSON report. Reads are timed cold (caches dropped before each
+# call) and warm (repeat calls); writes run last, on their own sample rows.
+# Pass --compare with an earlier report to print the change per function.
+#
+#   python benchmarks/run_benchmarks.py --rows 100k --out report.json [--compare base.json]
+#   python benchmarks/run_benchmarks.py --csv dataset.csv [--db bench.db]
+#
+# The database is reloaded and written to, so --db must be a new file.
+import argparse
+import inspect
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+import Backend
+import Cache
+import Database
+import Ingest
+import generate_catalog
+
+BENCH_PLAYLIST = "Benchmark"
+PLAYLIST_TRACKS = 200
+DELTA_ROWS = 1000
+
+# Arguments for each read, given the sampled values s
+READ_ARGS = {
+    "get_playlist_names": lambda s: (),
+    "get_playlist_id_by_name": lambda s: (BENCH_PLAYLIST,),
+    "get_track_names": lambda s: (),
+    "get_track_id_by_name": lambda s: (s["track_name"],),
+    "get_track_ids_by_names": lambda s: (s["track_names"],),
+    "existing_track_ids": lambda s: (s["track_ids"],),
+    "search_catalog": lambda s: (s["word"],),
+    "search_track_names": lambda s: (s["word"][:3],),
+    "search_tracks": lambda s: (s["word"],),
+    "similar_tracks": lambda s: (s["track_id"],),
+    "suggest_tracks_for_playlist": lambda s: (BENCH_PLAYLIST,),
+    "search_album_by_id": lambda s: (s["album_id"],),
+    "get_tracks_in_playlist_by_name": lambda s: (BENCH_PLAYLIST,),
+    "get_playlist_summary": lambda s: (BENCH_PLAYLIST,),
+    "find_artist_by_track_name": lambda s: (s["track_name"],),
+    "tracks_per_genre": lambda s: (),
+    "artists_with_album_and_track": lambda s: (),
+    "get_playlists_after_date": lambda s: ("2000-01-01",),
+    "top_artist": lambda s: (),
+    "find_duplicate_tracks": lambda s: (),
+    "find_duplicate_clusters": lambda s: (),
+    "nested_artists_not_in_playlist": lambda s: (s["genre"],),
+    "artists_above_avg_duration": lambda s: (),
+    "iter_playlists": lambda s: (),
+    "iter_tracks": lambda s: (None, 1000),
+    "iter_tracks_in_playlist": lambda s: (BENCH_PLAYLIST,),
+    "iter_playlist_entries": lambda s: (BENCH_PLAYLIST,),
+    "iter_tracks_per_genre": lambda s: (),
+    "iter_artists_with_album_and_track": lambda s: (None, 1000),
+    "iter_playlists_after_date": lambda s: ("2000-01-01",),
+    "iter_duplicate_tracks": lambda s: (None, 1000),
+    "iter_nested_artists_not_in_playlist": lambda s: (s["genre"], None, 1000),
+    "iter_artists_above_avg_duration": lambda s: (None, 1000),
+}
+
+# Arguments for each write, given the sampled values and the repetition i
+WRITE_ARGS = {
+    "create_playlist": lambda s, i: (f"Bench {i}", "2024-01-01"),
+    "add_track_to_playlist": lambda s, i: (s["playlist_id"], s["spare_ids"][i]),
+    "add_tracks_to_playlist": lambda s, i: (s["playlist_id"], s["spare_ids"][100 * (i + 1):100 * (i + 2)]),
+    "insert_artist_with_album": lambda s, i: (f"Bench Artist {i}", f"Bench Album {i}"),
+    "delete_track_by_id": lambda s, i: (s["victims"][i],),
+    "delete_tracks": lambda s, i: (s["victims"][100 * (i + 1):100 * (i + 2)],),
+}
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _summary(times):
+    times = sorted(times)
+    return {
+        "median_ms": statistics.median(times),
+        "min_ms": times[0],
+        "p95_ms": times[max(int(len(times) * 0.95) - 1, 0)],
+    }
+
+
+# (milliseconds, result size); generators are drained
+def _call(fn, args):
+    start = time.perf_counter()
+    result = fn(*args)
+    if inspect.isgenerator(result):
+        result = list(result)
+    elapsed = (time.perf_counter() - start) * 1000
+    return elapsed, len(result) if hasattr(result, "__len__") else None
+
+
+# A delta file: the first rows of csv_path with a new duration and
+# popularity, so an incremental load updates existing tracks
+def write_delta(csv_path, out, rows=DELTA_ROWS):
+    import pandas as pd
+    delta = pd.read_csv(csv_path, nrows=rows)
+    delta["duration_ms"] += 1000
+    delta["popularity"] = (delta["popularity"] + 1) % 101
+    delta.to_csv(out, index=False)
+    return len(delta)
+
+
+# Realistic arguments drawn from the loaded catalog; also creates the
+# benchmark playlist the playlist functions read
+def sample(conn, repeat, seed):
+    rng = random.Random(seed)
+    count = conn.execute("SELECT MAX(rowid) FROM Track").fetchone()[0] or 0
+    if count < PLAYLIST_TRACKS + 200 * (repeat + 2):
+        raise SystemExit(f"Catalog too small to benchmark ({count} tracks)")
+    rowids = rng.sample(range(1, count + 1), PLAYLIST_TRACKS + 200 * (repeat + 2))
+    rows = conn.execute(
+        "SELECT TrackID, Name FROM Track WHERE rowid IN (SELECT value FROM json_each(?))", (json.dumps(rowids),)
+    ).fetchall()
+    rng.shuffle(rows)
+    ids = [track_id for track_id, _name in rows]
+    track_id, track_name = rows[0]
+    Backend.create_playlist(BENCH_PLAYLIST, "2024-01-01")
+    playlist_id = Backend.get_playlist_id_by_name(BENCH_PLAYLIST)
+    Backend.add_tracks_to_playlist(playlist_id, ids[:PLAYLIST_TRACKS])
+    rest = ids[PLAYLIST_TRACKS:]
+    return {
+        "track_id": track_id,
+        "track_name": track_name,
+        "track_ids": ids[:100],
+        "track_names": [name for _id, name in rows[:100]],
+        "word": (track_name or "love").split()[0].lower(),
+        "genre": conn.execute("SELECT Genre FROM GenreStats ORDER BY TrackCount DESC LIMIT 1").fetchone()[0],
+        "album_id": conn.execute("SELECT AlbumID FROM Track WHERE TrackID = ?", (track_id,)).fetchone()[0],
+        "playlist_id": playlist_id,
+        "spare_ids": rest[:len(rest) // 2],
+        "victims": rest[len(rest) // 2:],
+    }
+
+
+def bench_read(fn, args, repeat):
+    cold, warm = [], []
+    size = None
+    for _ in range(repeat):
+        Cache.invalidate_all()
+        elapsed, size = _call(fn, args)
+        cold.append(elapsed)
+        warm.append(_call(fn, args)[0])
+    return {"kind": "read", "cold": _summary(cold), "warm": _summary(warm), "result_size": size}
+
+
+def bench_write(fn, make_args, repeat):
+    times = [_call(fn, make_args(i))[0] for i in range(repeat)]
+    return {"kind": "write", **_summary(times)}
+
+
+def bench_functions(sampled, repeat):
+    functions = {
+        name: fn for name, fn in inspect.getmembers(Backend, inspect.isfunction)
+        if not name.startswith("_") and fn.__module__ == "Backend" and name != "get_connection"
+    }
+    results = {}
+    for name in sorted(functions):
+        if name in READ_ARGS:
+            results[name] = bench_read(functions[name], READ_ARGS[name](sampled), repeat)
+        elif name not in WRITE_ARGS:
+            results[name] = {"kind": "skipped"}
+    # Writes last, so they don't change what the reads see
+    for name in WRITE_ARGS:
+        results[name] = bench_write(functions[name], lambda i, name=name: WRITE_ARGS[name](sampled, i), repeat)
+    return results
+
+
+# Typical time of a function in a report: warm median for reads
+def _headline(result):
+    if result.get("kind") == "read":
+        return result["warm"]["median_ms"], result["cold"]["median_ms"]
+    if result.get("kind") == "write":
+        return result["median_ms"], None
+    return None, None
+
+
+def compare(report, baseline):
+    print(f"\n{'function':<38}{'base ms':>10}{'now ms':>10}{'change':>9}")
+    old = baseline.get("functions", {})
+    for name, result in sorted(report["functions"].items()):
+        now, now_cold = _headline(result)
+        before, before_cold = _headline(old.get(name, {}))
+        if now is None or before is None:
+            continue
+        change = f"{(now - before) / before * 100:+.0f}%" if before else ""
+        print(f"{name:<38}{before:>10.3f}{now:>10.3f}{change:>9}")
+        if now_cold is not None and before_cold:
+            print(f"{'  cold':<38}{before_cold:>10.3f}{now_cold:>10.3f}"
+                  f"{(now_cold - before_cold) / before_cold * 100:>+8.0f}%")
+    for stage in ("full", "incremental", "delta"):
+        now, before = report["ingest"].get(stage), baseline.get("ingest", {}).get(stage)
+        if now and before:
+            print(f"{'ingest ' + stage:<38}{before['seconds']:>9.2f}s{now['seconds']:>9.2f}s"
+                  f"{(now['seconds'] - before['seconds']) / before['seconds'] * 100:>+8.0f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ingest and every public Backend function.")
+    parser.add_argument("--rows", default="10k", help="catalog size to generate, e.g. 10k, 100k, 1m")
+    parser.add_argument("--csv", help="benchmark this CSV instead of a generated one")
+    parser.add_argument("--db", help="new database file to keep (default: a temporary file)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default="benchmark.json")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    args = parser.parse_args(argv)
+    if args.db and os.path.exists(args.db):
+        parser.error(f"{args.db} already exists; the benchmark reloads the catalog and adds and deletes "
+                     "rows, so give a new path or leave out --db")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "bench.db")
+        report = {"meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        }}
+
+        csv_path = args.csv
+        if csv_path is None:
+            csv_path = os.path.join(tmp, "catalog.csv")
+            rows = generate_catalog.parse_rows(args.rows)
+            start = time.perf_counter()
+            generate_catalog.generate(csv_path, rows, args.seed)
+            report["generate"] = {"rows": rows, "seconds": time.perf_counter() - start}
+            print(f"Generated {rows} rows in {report['generate']['seconds']:.1f}s")
+        report["meta"]["csv"] = args.csv
+
+        report["ingest"] = {}
+        for mode in ("full", "incremental"):
+            stats = Ingest.ingest(csv_path, db_path, mode=mode)
+            report["ingest"][mode] = stats
+            print(f"Ingest {mode}: {stats['rows']} rows in {stats['seconds']:.2f}s "
+                  f"({stats['rows_per_sec']:,.0f} rows/sec)")
+        report["meta"]["rows"] = report["ingest"]["full"]["rows"]
+        delta_path = os.path.join(tmp, "delta.csv")
+        write_delta(csv_path, delta_path)
+        stats = Ingest.ingest(delta_path, db_path, mode="incremental")
+        report["ingest"]["delta"] = stats
+        print(f"Ingest delta: {stats['written']} of {stats['rows']} rows changed in {stats['seconds']:.2f}s")
+
+        Database.configure(db_path)
+        try:
+            sampled = sample(Database.get_connection(), args.repeat, args.seed)
+            report["functions"] = bench_functions(sampled, args.repeat)
+        finally:
+            Database.close_connection()
+
+    for name, result in sorted(report["functions"].items()):
+        now, cold = _headline(result)
+        if now is None:
+            print(f"  {name:<38} skipped")
+        else:
+            print(f"  {name:<38} {now:9.3f} ms" + (f"   cold {cold:9.3f} ms" if cold is not None else ""))
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return report
+
+
+if __name__ == "__main__":
+    main()
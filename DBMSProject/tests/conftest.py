@@ -0,0 +1,61 @@
+# conftest.py
+# Shared fixtures: a scratch database per test and a writer for small
+# Spotify-style catalog CSVs.
+import csv
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Cache
+import Database
+import Ingest
+
+# Values for the columns a test row does not set
+DEFAULTS = {
+    "track_id": None,
+    "artists": "Artist",
+    "album_name": "Album",
+    "track_name": "Track",
+    "popularity": 50,
+    "duration_ms": 200000,
+    "explicit": False,
+    "danceability": 0.5,
+    "energy": 0.5,
+    "key": 5,
+    "loudness": -8.0,
+    "mode": 1,
+    "speechiness": 0.05,
+    "acousticness": 0.3,
+    "instrumentalness": 0.0,
+    "liveness": 0.1,
+    "valence": 0.4,
+    "tempo": 120.0,
+    "time_signature": 4,
+    "track_genre": "pop",
+}
+
+
+# Write rows (dicts overriding DEFAULTS) to path as a catalog CSV
+def write_catalog(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=Ingest.CSV_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            values = dict(DEFAULTS, **row)
+            writer.writerow({c: "" if values[c] is None else values[c] for c in Ingest.CSV_COLUMNS})
+    return str(path)
+
+
+# Path of a fresh database, made this thread's database for the test
+@pytest.fixture
+def db_path(tmp_path):
+    saved = Database.DB_PATH
+    path = str(tmp_path / "music.db")
+    Database.configure(path)
+    Cache.invalidate_all()
+    yield path
+    Database.configure(saved)
+    Cache.invalidate_all()
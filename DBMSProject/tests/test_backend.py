@@ -0,0 +1,54 @@
+# test_backend.py
+import Backend
+import Database
+
+
+# Every row of an iter_* function, fetched limit rows at a time by keyset
+def _paged(fn, *args, limit, key):
+    rows = []
+    after = None
+    while True:
+        page = list(fn(*args, after_id=after, limit=limit))
+        rows += page
+        if len(page) < limit:
+            return rows
+        after = key(page[-1])
+        if after is None:
+            return rows
+
+
+def _catalog():
+    with Database.transaction() as conn:
+        conn.executemany("INSERT INTO Artist (ArtistID, Name) VALUES (?, ?)",
+                         [(1, "Alpha"), (2, "Beta"), (3, None)])
+        tracks = [
+            ("t1", "One", "pop", 1), ("t2", None, "pop", 1), ("t3", "Three", "pop", 1),
+            ("t4", None, "pop", 2), ("t5", "Five", "pop", 2), ("t6", "Six", "pop", 3),
+            ("t7", "Seven", None, 1), ("t8", "Eight", "rock", 2), ("t9", "Nine", None, 3),
+        ]
+        conn.executemany("INSERT INTO Track (TrackID, Name, Genre, DurationMs) VALUES (?, ?, ?, 1000)",
+                         [t[:3] for t in tracks])
+        conn.executemany("INSERT INTO ArtistTrack (ArtistID, TrackID) VALUES (?, ?)",
+                         [(t[3], t[0]) for t in tracks])
+
+
+# Paging one row at a time walks past NULL keys instead of stopping there
+def test_keyset_paging_with_null_keys(db_path):
+    _catalog()
+    genres = list(Backend.iter_tracks_per_genre())
+    assert genres == [("pop", 6), ("rock", 1), (None, 2)]
+    for limit in (1, 2):
+        assert _paged(Backend.iter_tracks_per_genre, limit=limit, key=lambda row: row[0]) == genres
+
+    nested = list(Backend.iter_nested_artists_not_in_playlist("pop"))
+    assert nested == [("Alpha", "One"), ("Alpha", "Three"), ("Alpha", None),
+                      ("Beta", "Five"), ("Beta", None), (None, "Six")]
+    for limit in (1, 2, 4):
+        assert _paged(Backend.iter_nested_artists_not_in_playlist, "pop", limit=limit,
+                      key=lambda row: row[:2]) == nested
+
+
+def test_limit_zero_is_an_empty_page(db_path):
+    _catalog()
+    assert list(Backend.iter_tracks(limit=0)) == []
+    assert len(list(Backend.iter_tracks())) == 9
@@ -0,0 +1,56 @@
+# test_cache.py
+import pytest
+
+import Backend
+import Cache
+import Database
+
+
+# A write inside a transaction only invalidates once it commits; until then
+# readers outside it keep the cached answer and reads inside bypass it
+def test_invalidation_waits_for_commit(db_path):
+    Backend.create_playlist("Road", "2024-01-01")
+    assert Backend.get_playlist_names() == ["Road"]
+
+    with Database.transaction():
+        Backend.create_playlist("Gym", "2024-01-02")
+        assert sorted(Backend.get_playlist_names()) == ["Gym", "Road"]
+        assert Backend.get_playlist_names.cache.get((Database.DB_PATH, (), ()))[1] == ["Road"]
+    assert sorted(Backend.get_playlist_names()) == ["Gym", "Road"]
+
+
+# A rolled-back write leaves the cached answer valid
+def test_rollback_keeps_cache(db_path):
+    Backend.create_playlist("Road", "2024-01-01")
+    assert Backend.get_playlist_id_by_name("Road") is not None
+    hits = Backend.get_playlist_id_by_name.cache.hits
+    with pytest.raises(RuntimeError):
+        with Database.transaction():
+            Backend.create_playlist("Gym", "2024-01-02")
+            raise RuntimeError("abandon")
+    assert Backend.get_playlist_id_by_name("Road") is not None
+    assert Backend.get_playlist_id_by_name.cache.hits == hits + 1
+    assert Backend.get_playlist_names() == ["Road"]
+
+
+# A value computed before invalidate_all() is not cached after it, even for
+# tables no write has bumped yet
+def test_invalidate_all_covers_every_table(db_path):
+    @Cache.cached(("NeverWritten",))
+    def lookup(x):
+        return x
+
+    try:
+        key = (Database.DB_PATH, (1,), ())
+        with Cache._lock:
+            generations = Cache._snapshot(lookup.cache.tables)
+        Cache.invalidate_all()
+        lookup.cache.put(key, "stale", generations)
+        assert lookup.cache.get(key) == (False, None)
+
+        assert lookup(1) == 1
+        assert lookup.cache.get(key) == (True, 1)
+        Cache.invalidate_all()
+        assert lookup.cache.get(key) == (False, None)
+    finally:
+        del Cache._caches["lookup"]
@@ -0,0 +1,64 @@
+# test_ingest.py
+import sqlite3
+
+import Ingest
+from conftest import write_catalog
+
+
+def _rows(db_path, query):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(query).fetchall()
+    finally:
+        conn.close()
+
+
+# Names that look like numbers stay text and match across loads
+def test_incremental_load_with_numeric_names(tmp_path, db_path):
+    full = write_catalog(tmp_path / "full.csv", [
+        {"track_id": "t1", "artists": "311", "album_name": "1989", "track_name": "1979"},
+        {"track_id": "t2", "artists": "Blink", "album_name": "Enema", "track_name": "Adam"},
+    ])
+    Ingest.ingest(full, db_path)
+
+    delta = write_catalog(tmp_path / "delta.csv", [
+        {"track_id": "t1", "artists": "311", "album_name": "1989", "track_name": "1979"},
+        {"track_id": "t3", "artists": "311", "album_name": "1989", "track_name": "2020", "popularity": 7},
+    ])
+    stats = Ingest.ingest(delta, db_path, mode="incremental")
+
+    assert stats["written"] == 1
+    assert _rows(db_path, "SELECT typeof(Name), Name FROM Album WHERE Name = '1989'") == [("text", "1989")]
+    assert _rows(db_path, "SELECT COUNT(*) FROM Artist WHERE Name = '311'") == [(1,)]
+    assert _rows(db_path, "SELECT TrackID, Name FROM Track ORDER BY TrackID") == [
+        ("t1", "1979"), ("t2", "Adam"), ("t3", "2020"),
+    ]
+
+
+def _digest(db_path):
+    return [_rows(db_path, f"SELECT * FROM {table} ORDER BY 1, 2")
+            for table in ("Track", "Artist", "Album", "ArtistTrack", "ArtistAlbum", "TrackHash")]
+
+
+# A shard whose names are all digits loads the same in the worker pool as
+# in this process, and chunk boundaries inside quoted fields are respected
+def test_parallel_load_matches_serial(tmp_path):
+    shards = tmp_path / "shards"
+    shards.mkdir()
+    write_catalog(shards / "a.csv", [
+        {"track_id": f"a{i}", "artists": str(300 + i % 3), "album_name": "1989", "track_name": str(i)}
+        for i in range(40)
+    ])
+    write_catalog(shards / "b.csv", [
+        {"track_id": f"b{i}", "artists": f"Band {i % 4}", "album_name": "1989" if i % 2 else "Red",
+         "track_name": f'Song {i}\n"live", take {i}'}
+        for i in range(40)
+    ])
+    serial = str(tmp_path / "serial.db")
+    parallel = str(tmp_path / "parallel.db")
+    Ingest.ingest(str(shards), serial, chunksize=7, workers=1)
+    stats = Ingest.ingest(str(shards), parallel, chunksize=7, workers=2)
+
+    assert stats["workers"] == 2
+    assert _digest(serial) == _digest(parallel)
+    assert _rows(parallel, "SELECT COUNT(*) FROM Album WHERE Name = '1989'") == [(1,)]
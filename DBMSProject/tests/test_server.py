@@ -0,0 +1,65 @@
+# test_server.py
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import Database
+import Server
+
+
+@pytest.fixture
+def server(db_path):
+    with Database.transaction() as conn:
+        conn.executemany("INSERT INTO Track (TrackID, Name, Genre) VALUES (?, ?, 'pop')",
+                         [(f"t{i}", f"Track {i}") for i in range(5)])
+    Database.close_connection()
+    srv = Server.Server(("127.0.0.1", 0), readers=2)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+
+# (status, decoded JSON body)
+def _request(url, body=None):
+    data = None if body is None else json.dumps(body).encode()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data)) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_bad_limit_is_a_client_error(server):
+    assert _request(f"{server}/api/iter_tracks?limit=abc")[0] == 400
+    assert _request(f"{server}/api/iter_tracks", {"limit": "abc"})[0] == 400
+    assert _request(f"{server}/api/iter_tracks", {"limit": None})[0] == 400
+    status, page = _request(f"{server}/api/iter_tracks", {"limit": 2})
+    assert status == 200
+    assert page == {"rows": [["t0", "Track 0"], ["t1", "Track 1"]], "next": "t1"}
+
+
+def test_error_statuses(server):
+    assert _request(f"{server}/api/no_such_function")[0] == 404
+    assert _request(f"{server}/api/delete_tracks")[0] == 405
+    assert _request(f"{server}/api/search_album_by_id", {"nope": 1})[0] == 400
+
+
+# A failing call in a batch gets its own error entry; the others still answer
+def test_batch_reports_each_call(server):
+    status, body = _request(f"{server}/api/batch", [
+        {"call": "iter_tracks", "args": {"limit": "abc"}},
+        {"call": "no_such_function"},
+        {"args": {}},
+        {"call": "iter_tracks", "args": {"limit": 5}},
+    ])
+    assert status == 200
+    first, missing, malformed, last = body["results"]
+    assert first["status"] == 400 and "limit" in first["error"]
+    assert missing["status"] == 404
+    assert malformed["status"] == 400
+    assert len(last["rows"]) == 5
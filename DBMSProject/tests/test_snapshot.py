@@ -0,0 +1,41 @@
+# test_snapshot.py
+import os
+
+import numpy as np
+
+import Database
+import Snapshot
+
+
+def _catalog():
+    with Database.transaction() as conn:
+        conn.execute("INSERT INTO Artist (ArtistID, Name) VALUES (1, 'Alpha')")
+        conn.executemany("INSERT INTO Track (TrackID, Name, Genre, DurationMs, Danceability, Tempo) "
+                         "VALUES (?, ?, 'pop', 1000, ?, 120.0)",
+                         [("t1", "One", 0.5), ("t2", "Two", None)])
+        conn.executemany("INSERT INTO ArtistTrack (ArtistID, TrackID) VALUES (1, ?)", [("t1",), ("t2",)])
+
+
+# A rebuild while the previous snapshot is still mapped leaves it readable
+# and the new one current; missing features come out as NaN
+def test_save_while_loaded(db_path):
+    _catalog()
+    path = Snapshot.snapshot_dir(db_path)
+    first = Snapshot.write(db_path)
+    loaded = Snapshot.Snapshot.load(path, first.fingerprint)
+    assert loaded is not None
+
+    with Database.transaction() as conn:
+        conn.execute("INSERT INTO Track (TrackID, Name, Genre, DurationMs) VALUES ('t3', 'Three', 'rock', 2000)")
+    second = Snapshot.write(db_path)
+
+    assert loaded.tracks_per_genre() == [("pop", 2)]
+    current = Snapshot.current()
+    assert current is not None and current.fingerprint == second.fingerprint
+    assert current.tracks_per_genre() == [("pop", 2), ("rock", 1)]
+    assert len([entry for entry in os.listdir(path) if entry.startswith("v")]) == 1
+
+    features = np.asarray(current.features)
+    column = Snapshot.FEATURES.index("Danceability")
+    assert features.shape == (3, len(Snapshot.FEATURES))
+    assert features[0, column] == np.float32(0.5) and np.isnan(features[1, column])
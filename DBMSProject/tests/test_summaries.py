@@ -0,0 +1,66 @@
+# test_summaries.py
+# The trigger-maintained tables (Stats, PlaylistStats, Dedup, Search) after
+# loads and writes
+import Backend
+import Database
+import Dedup
+import Ingest
+import PlaylistStats
+import Search
+import Stats
+from conftest import write_catalog
+
+
+def _load(tmp_path, db_path):
+    full = write_catalog(tmp_path / "full.csv", [
+        {"track_id": f"t{i}", "track_name": f"Song {i}", "artists": f"Artist {i % 3}",
+         "album_name": f"Album {i % 4}", "track_genre": "pop" if i % 2 else "rock", "duration_ms": 1000 * i}
+        for i in range(1, 21)
+    ])
+    Ingest.ingest(full, db_path)
+
+
+# An incremental load of changed rows goes through the triggers and leaves
+# every summary table equal to a recomputation
+def test_summaries_after_incremental_load(tmp_path, db_path):
+    _load(tmp_path, db_path)
+    Backend.create_playlist("Mix", "2024-01-01")
+    Backend.add_tracks_to_playlist(Backend.get_playlist_id_by_name("Mix"), ["t1", "t2", "t3"])
+    delta = write_catalog(tmp_path / "delta.csv", [
+        {"track_id": "t1", "track_name": "Song 1 - Remaster", "track_genre": "jazz", "duration_ms": 5},
+        {"track_id": "t21", "track_name": "Song 21", "track_genre": "pop"},
+    ])
+    Database.close_connection()
+    assert Ingest.ingest(delta, db_path, mode="incremental")["written"] == 2
+
+    assert Stats.check() == []
+    assert PlaylistStats.check() == []
+    assert [ref for _kind, ref, _name, _score in Search.search("remaster", kinds=("track",))] == ["t1"]
+
+
+# Tracks added between incremental runs are reported by the next one even
+# when a full run came in between
+def test_incremental_dedup_across_full_runs(tmp_path, db_path):
+    _load(tmp_path, db_path)
+    Dedup.find_clusters(incremental=True)
+    with Database.transaction() as conn:
+        conn.execute("INSERT INTO Track (TrackID, Name, DurationMs) VALUES ('dup', 'SONG 5', 5010)")
+    assert [c[4] for c in Dedup.find_clusters()] == [["t5", "dup"]]
+    assert [c[4] for c in Dedup.find_clusters(incremental=True)] == [["t5", "dup"]]
+    assert Dedup.find_clusters(incremental=True) == []
+
+
+# Search rows follow their track through a VACUUM, which renumbers rowids
+def test_search_after_vacuum(tmp_path, db_path):
+    _load(tmp_path, db_path)
+    conn = Database.get_connection()
+    with Database.transaction():
+        Backend.delete_tracks([f"t{i}" for i in range(1, 11)])
+    conn.execute("VACUUM")
+    with Database.transaction():
+        conn.execute("UPDATE Track SET Name = 'Zyzzyva' WHERE TrackID = 't20'")
+        Backend.delete_tracks(["t11"])
+
+    names = dict(conn.execute("SELECT TrackID, Name FROM TrackSearch"))
+    assert names == dict(conn.execute("SELECT TrackID, Name FROM Track"))
+    assert [ref for _kind, ref, _name, _score in Search.search("zyzzyva", kinds=("track",))] == ["t20"]
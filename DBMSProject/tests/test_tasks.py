@@ -0,0 +1,51 @@
+# test_tasks.py
+import threading
+import time
+
+from Tasks import TaskRunner
+
+
+# Stands in for the Tk root: after() only records, and tests poll by hand
+class Root:
+    def after(self, ms, fn):
+        return "after"
+
+    def after_cancel(self, after_id):
+        pass
+
+
+def _poll_until(runner, done, seconds=5.0):
+    deadline = time.monotonic() + seconds
+    while not done() and time.monotonic() < deadline:
+        runner._poll()
+        time.sleep(0.01)
+
+
+# A superseded task is told, and only the newer task's result is delivered
+def test_superseded_task_calls_on_cancel(db_path):
+    runner = TaskRunner(Root(), max_workers=2)
+    release = threading.Event()
+    events = []
+    try:
+        runner.submit("page", release.wait, 5, on_done=lambda r: events.append(("done", "first")),
+                      on_cancel=lambda: events.append(("cancelled", "first")))
+        runner.submit("page", lambda: "second", on_done=lambda r: events.append(("done", r)))
+        release.set()
+        _poll_until(runner, lambda: ("done", "second") in events)
+    finally:
+        runner.shutdown()
+    assert events == [("cancelled", "first"), ("done", "second")]
+
+
+def test_cancel_calls_on_cancel(db_path):
+    runner = TaskRunner(Root(), max_workers=1)
+    release = threading.Event()
+    cancelled = []
+    try:
+        runner.submit("page", release.wait, 5, on_cancel=lambda: cancelled.append(True))
+        runner.cancel("page")
+        assert cancelled == [True]
+        assert not runner.running("page")
+    finally:
+        release.set()
+        runner.shutdown()